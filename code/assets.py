@@ -0,0 +1,41 @@
+from audio import audio
+from support import import_folder, import_folder_dict, import_subfolders, load_image, load_font, load_tmx_map
+
+class Assets:
+	"""Graphics, sounds, fonts and maps kept for the whole session.
+	Game creates one and passes it to every Level, so a new game or a
+	loaded save only rebuilds the world, not what was read from disk."""
+
+	def __init__(self):
+		self.cache = {}
+
+	def get(self, key, loader, *args):
+		if key not in self.cache:
+			self.cache[key] = loader(*args)
+		return self.cache[key]
+
+	def folder(self, path):
+		return self.get(('folder', path), import_folder, path)
+
+	def folder_dict(self, path):
+		return self.get(('folder_dict', path), import_folder_dict, path)
+
+	def subfolders(self, path):
+		return self.get(('subfolders', path), import_subfolders, path)
+
+	def image(self, path, convert_alpha = False):
+		return self.get(('image', path, convert_alpha), load_image, path, convert_alpha)
+
+	def sound(self, path):
+		"""A sound effect on its own mixer channels, see audio.py"""
+		return audio.effect(path)
+
+	def font(self, path, size):
+		return self.get(('font', path, size), load_font, path, size)
+
+	def tmx_map(self, path):
+		"""The parsed map, its layers and tiles are only read by Level"""
+		return self.get(('tmx', path), load_tmx_map, path)
+
+	def clear(self):
+		self.cache.clear()
@@ -0,0 +1,142 @@
+"""
+Packs many small surfaces into a few large atlas pages.
+
+	python atlas.py
+
+loads every graphics folder with and without packing and prints the
+load time, surface count and pixel memory of both.
+"""
+import pygame
+from time import perf_counter
+from settings import *
+
+# totals over every pack_surfaces call, see report()
+stats = {'images': 0, 'pages': 0, 'image_bytes': 0, 'page_bytes': 0, 'seconds': 0.0}
+
+def shelf_pack(sizes, max_size, padding):
+	"""Place sizes on shelves, tallest first. Returns (page, x, y) per size,
+	or None for sizes that do not fit a page, and the size of every page."""
+	order = sorted(range(len(sizes)), key = lambda index: sizes[index][1], reverse = True)
+	placements = [None] * len(sizes)
+	pages = []
+	x = y = shelf_height = 0
+
+	for index in order:
+		width, height = sizes[index]
+		if width > max_size or height > max_size:
+			continue
+
+		# next shelf, or next page once the shelf would not fit
+		if x + width > max_size:
+			x, y = 0, y + shelf_height + padding
+			shelf_height = 0
+		if not pages or y + height > max_size:
+			pages.append([0, 0])
+			x = y = shelf_height = 0
+
+		placements[index] = (len(pages) - 1, x, y)
+		page = pages[-1]
+		page[0] = max(page[0], x + width)
+		page[1] = max(page[1], y + height)
+		x += width + padding
+		shelf_height = max(shelf_height, height)
+
+	return placements, pages
+
+def pack_surfaces(surfaces, max_size = ATLAS_MAX_SIZE, padding = 1):
+	"""Copy surfaces onto atlas pages and return subsurfaces of the pages,
+	in the same order. Surfaces larger than a page are returned as they are.
+	Colorkeyed surfaces get their own pages, see surface_format.py."""
+	if not ATLAS_PACKING or len(surfaces) < 2:
+		return list(surfaces)
+	start = perf_counter()
+
+	# per-pixel alpha and each colorkey packed separately
+	groups = {}
+	for index, surf in enumerate(surfaces):
+		groups.setdefault(surf.get_colorkey(), []).append(index)
+
+	packed = list(surfaces)
+	for colorkey, indices in groups.items():
+		for index, surf in zip(indices, pack_group([surfaces[index] for index in indices], colorkey, max_size, padding)):
+			packed[index] = surf
+	stats['seconds'] += perf_counter() - start
+	return packed
+
+def pack_group(surfaces, colorkey, max_size, padding):
+	placements, page_sizes = shelf_pack([surf.get_size() for surf in surfaces], max_size, padding)
+	pages = []
+	for size in page_sizes:
+		if colorkey is None:
+			page = pygame.Surface(size, pygame.SRCALPHA).convert_alpha()
+			page.fill((0,0,0,0))
+		else:
+			# the page is keyed too, so it can be uploaded as a texture whole
+			page = pygame.Surface(size).convert()
+			page.fill(colorkey)
+			page.set_colorkey(colorkey)
+		pages.append(page)
+
+	packed = []
+	for surf, placement in zip(surfaces, placements):
+		if placement is None:
+			packed.append(surf)
+			continue
+		index, x, y = placement
+
+		if colorkey is None:
+			# RGBA max onto a cleared page copies the pixels exactly, alpha included
+			pages[index].blit(surf, (x, y), special_flags = pygame.BLEND_RGBA_MAX)
+			packed.append(pages[index].subsurface((x, y), surf.get_size()))
+		else:
+			# keyed pixels are skipped and leave the key the page was filled with
+			pages[index].blit(surf, (x, y))
+			subsurface = pages[index].subsurface((x, y), surf.get_size())
+			subsurface.set_colorkey(colorkey, pygame.RLEACCEL)
+			packed.append(subsurface)
+
+	stats['images'] += sum(placement is not None for placement in placements)
+	stats['pages'] += len(pages)
+	stats['image_bytes'] += sum(surf.get_width() * surf.get_height() * 4 for surf, placement in zip(surfaces, placements) if placement)
+	stats['page_bytes'] += sum(width * height * 4 for width, height in page_sizes)
+	return packed
+
+def report():
+	"""One line summary of everything packed so far"""
+	waste = stats['page_bytes'] - stats['image_bytes']
+	return (f"{stats['images']} images on {stats['pages']} pages, "
+		f"{stats['page_bytes'] / 1024:.0f} KiB ({waste / 1024:.0f} KiB padding), "
+		f"{stats['seconds'] * 1000:.1f} ms packing")
+
+if __name__ == '__main__':
+	import os
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+	import atlas
+	import support
+
+	pygame.init()
+	pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+	def load_all():
+		start = perf_counter()
+		surfaces = []
+		for frames in support.import_subfolders('../graphics/character/').values():
+			surfaces.extend(frames)
+		for path in ['../graphics/fruit/corn', '../graphics/fruit/tomato', '../graphics/water',
+				'../graphics/soil_water/', '../graphics/rain/drops/', '../graphics/rain/floor/']:
+			surfaces.extend(support.import_folder(path))
+		surfaces.extend(support.import_folder_dict('../graphics/soil/').values())
+		return surfaces, perf_counter() - start
+
+	# the packer module support.py uses, not this script
+	for packing in (False, True):
+		atlas.ATLAS_PACKING = packing
+		surfaces, seconds = load_all()
+		buffers = {}
+		for surf in surfaces:
+			owner = surf.get_parent() or surf
+			buffers[id(owner)] = owner.get_width() * owner.get_height() * 4
+		print(f"{'atlas' if packing else 'separate':<10}{seconds * 1000:8.1f} ms"
+			f"{len(surfaces):6} surfaces{len(buffers):6} pixel buffers{sum(buffers.values()) / 1024:8.0f} KiB")
+	print(atlas.report())
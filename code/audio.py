@@ -0,0 +1,93 @@
+"""
+Music and sound effects.
+
+Music is streamed from disk by pygame.mixer.music instead of being decoded
+into memory. Effects stay loaded as Sounds and each one plays on its own
+reserved mixer channels, so a spammed tool sound never takes a channel from
+another effect and never stacks up more than its cap.
+"""
+import pygame
+from pathlib import Path
+from settings import *
+from support import load_sound, resolve_path
+
+class Effect:
+	"""A short sound with a fixed set of channels to play on"""
+
+	def __init__(self, sound, channels):
+		self.sound = sound
+		self.channels = channels
+		self.volume = 1
+
+		# the channel restarted next once all of them are busy
+		self.oldest = 0
+
+	def set_volume(self, volume):
+		self.sound.set_volume(volume)
+
+	def set_master_volume(self, volume):
+		self.volume = volume
+		for channel in self.channels:
+			channel.set_volume(volume)
+
+	def play(self):
+		for channel in self.channels:
+			if not channel.get_busy():
+				break
+		else:
+			# at the cap, cut off the one that started first
+			channel = self.channels[self.oldest]
+			self.oldest = (self.oldest + 1) % len(self.channels)
+		channel.play(self.sound)
+		channel.set_volume(self.volume)
+		return channel
+
+class AudioManager:
+	"""Owns the mixer channels, the music stream and the master volumes"""
+
+	def __init__(self):
+		# source path -> Effect
+		self.effects = {}
+		self.reserved = 0
+		self.music_path = None
+		self.music_volume = 1
+		self.sound_volume = 1
+
+	def reserve(self, count):
+		"""The next count mixer channels, kept away from plain Sound.play()"""
+		needed = self.reserved + count + FREE_SOUND_CHANNELS
+		if pygame.mixer.get_num_channels() < needed:
+			pygame.mixer.set_num_channels(needed)
+		channels = [pygame.mixer.Channel(index) for index in range(self.reserved, self.reserved + count)]
+		self.reserved += count
+		pygame.mixer.set_reserved(self.reserved)
+		return channels
+
+	def effect(self, path):
+		"""The Effect for a sound file, its channel cap comes from SOUND_CHANNELS"""
+		if path not in self.effects:
+			sound = load_sound(path)
+			effect = Effect(sound, self.reserve(SOUND_CHANNELS.get(Path(path).stem, 1)))
+			effect.set_master_volume(self.sound_volume)
+			self.effects[path] = effect
+		return self.effects[path]
+
+	def play_music(self, path, loops = -1):
+		"""Stream a track from the start, replacing whatever was playing"""
+		if path != self.music_path:
+			pygame.mixer.music.load(str(resolve_path(path)))
+			self.music_path = path
+		pygame.mixer.music.play(loops)
+		pygame.mixer.music.set_volume(self.music_volume)
+
+	def stop_music(self):
+		pygame.mixer.music.stop()
+
+	def set_volume(self, music, sound):
+		self.music_volume = music
+		self.sound_volume = sound
+		pygame.mixer.music.set_volume(music)
+		for effect in self.effects.values():
+			effect.set_master_volume(sound)
+
+audio = AudioManager()
@@ -0,0 +1,338 @@
+"""
+Headless benchmarks for the hot paths of Meow Valley.
+
+	python benchmark.py --output results.json
+	python benchmark.py --compare results.json --threshold 0.15
+	python benchmark.py --memory --scales 4 --props 20000 --only
+
+Runs under SDL's dummy video and audio drivers, so no window is opened.
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import pygame
+from settings import *
+
+BENCHMARKS = []
+
+def benchmark(name):
+	"""Register a function as a benchmark, it returns a list of timings"""
+	def decorator(func):
+		BENCHMARKS.append((name, func))
+		return func
+	return decorator
+
+def timed(func, repeat, setup = None):
+	"""Time repeat calls of func, setup runs untimed before each call"""
+	timings = []
+	for _ in range(repeat):
+		if setup:
+			setup()
+		start = perf_counter()
+		func()
+		timings.append(perf_counter() - start)
+	return timings
+
+def summarize(timings):
+	ordered = sorted(timings)
+	count = len(ordered)
+	return {
+		'n': count,
+		'min': ordered[0] * 1000,
+		'median': ordered[count // 2] * 1000,
+		'mean': sum(ordered) / count * 1000,
+		'p95': ordered[min(count - 1, int(count * 0.95))] * 1000}
+
+def scatter_props(level, props, rng):
+	"""Spread extra decorations over the map to raise the sprite count.
+	They stream in and out with their chunk like the map decorations."""
+	from sprites import WildFlower
+
+	flower = pygame.Surface((32, 32), pygame.SRCALPHA)
+	flower.fill((200, 60, 60, 255))
+	width, height = level.world_size
+	for _ in range(props):
+		pos = (rng.randint(0, width), rng.randint(0, height))
+		level.chunks.add(pos, WildFlower, pos, flower, [level.all_sprites, level.collision_sprites])
+
+class World:
+	"""A level built for benchmarking, seeded so runs are comparable"""
+
+	def __init__(self, save_dir, map_path, farmed, planted, props, seed):
+		from audio import audio
+		from level import Level
+		from game_state import GameState
+		from replay import frame_input
+		from rng import rng
+		from scheduler import scheduler
+		from sprites import particles
+		from worldgen import prefarm
+
+		rng.seed(seed)
+		scheduler.clear()
+		particles.clear()
+		frame_input.start_fixed_clock()
+		self.game_state = GameState(save_dir)
+		self.level = Level(map_path = map_path)
+		audio.stop_music()
+		self.player = self.level.player
+		prefarm(self.level, farmed, planted, rng)
+		scatter_props(self.level, props, rng)
+
+def traced_bytes(calls):
+	"""Mean bytes each call leaves allocated, with what it returns kept alive"""
+	tracemalloc.start()
+	before = tracemalloc.get_traced_memory()[0]
+	kept = [call() for call in calls]
+	after = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return (after - before) / len(kept)
+
+def level_memory(world_args):
+	"""A World built with tracemalloc running, and the bytes it keeps allocated:
+	its map, chunk and soil state and the sprites around the player. Surface
+	pixels are allocated by SDL and not counted."""
+	gc.collect()
+	tracemalloc.start()
+	world = World(*world_args)
+	gc.collect()
+	kept = tracemalloc.get_traced_memory()[0]
+	tracemalloc.stop()
+	return world, kept
+
+def without_groups(args, tiles):
+	"""Constructor arguments with the sprite groups left out, and tiles instead
+	of the camera's dict of tiles"""
+	def is_groups(arg):
+		if isinstance(arg, list) and arg:
+			arg = arg[0]
+		return isinstance(arg, pygame.sprite.AbstractGroup)
+	return tuple(() if is_groups(arg) else tiles if isinstance(arg, dict) else arg for arg in args)
+
+def entity_memory(world):
+	"""Bytes per sprite class: every sprite of every chunk of the map made
+	again without groups, plus rain drops and the planted crops. Tiles count
+	their entry in a dict like the camera's. pygame's Sprite has no __slots__,
+	so every Sprite subclass keeps a __dict__ even with slots of its own"""
+	from sky import Drop
+	from soil import Plant
+
+	calls = {}
+	tiles = {}
+	chunks = world.level.chunks
+	for key in chunks.keys():
+		for factory, args, release in chunks.calls(key):
+			if isinstance(factory, type):
+				args = without_groups(args, tiles)
+				calls.setdefault(factory.__name__, []).append(lambda factory = factory, args = args: factory(*args))
+
+	drops = world.level.rain.rain_drops
+	calls['Drop'] = [lambda: Drop(drops[0], (0,0), True, (), LAYERS['rain drops'])] * 1000
+	calls['Plant'] = [
+		lambda plant = plant: Plant(plant.plant_type, (), plant.soil_rect, plant.check_watered, plant.frames)
+		for plant in world.level.soil_layer.plant_sprites]
+
+	return {name: {'count': len(made), 'bytes': traced_bytes(made), 'dict': hasattr(made[0](), '__dict__')}
+		for name, made in calls.items() if made}
+
+@benchmark('custom_draw')
+def bench_draw(world, repeat):
+	return timed(lambda: world.level.all_sprites.custom_draw(world.player), repeat)
+
+@benchmark('draw_world')
+def bench_draw_world(world, repeat):
+	# custom_draw plus clearing the render target and scaling it to the window
+	return timed(world.level.draw_world, repeat)
+
+@benchmark('player_collision')
+def bench_collision(world, repeat):
+	player = world.player
+	def collide():
+		player.collision('horizontal')
+		player.collision('vertical')
+	return timed(collide, repeat)
+
+@benchmark('create_soil_tiles')
+def bench_create_soil_tiles(world, repeat):
+	return timed(world.level.soil_layer.create_soil_tiles, repeat)
+
+@benchmark('get_hit')
+def bench_get_hit(world, repeat):
+	soil_layer = world.level.soil_layer
+	rect = soil_layer.hit_rects[-1]
+	x, y = rect.x // TILE_SIZE, rect.y // TILE_SIZE
+	original = soil_layer.grid.get(x, y)
+	def reset():
+		soil_layer.grid.set(x, y, original)
+	timings = timed(lambda: soil_layer.get_hit(rect.center), repeat, reset)
+	reset()
+	soil_layer.create_soil_tiles()
+	return timings
+
+@benchmark('water_all')
+def bench_water_all(world, repeat):
+	soil_layer = world.level.soil_layer
+	return timed(soil_layer.water_all, repeat, soil_layer.remove_water)
+
+@benchmark('plant_collision')
+def bench_plant_collision(world, repeat):
+	return timed(world.level.plant_collision, repeat)
+
+@benchmark('rain')
+def bench_rain(world, repeat):
+	from replay import frame_input
+	level = world.level
+	dt = 1 / 60
+
+	def frame():
+		frame_input.next_frame(dt, [])
+		level.rain.update()
+		level.all_sprites.update(dt)
+
+	# warm up until drops expire as fast as they are created
+	for _ in range(60):
+		frame()
+	return timed(frame, repeat)
+
+@benchmark('save_game')
+def bench_save(world, repeat):
+	return timed(lambda: world.game_state.save_game(world.player, world.level), repeat)
+
+@benchmark('load_game')
+def bench_load(world, repeat):
+	game_state = world.game_state
+	game_state.save_game(world.player, world.level)
+	def load():
+		game_data = game_state.load_game()
+		game_state.apply_loaded_data(game_data, world.player, world.level)
+	return timed(load, repeat)
+
+def run(args):
+	pygame.init()
+	pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+	from render_target import render_target
+	render_target.scale = args.render_scale
+	render_target.zoom = args.zoom
+
+	results = {}
+	memory = {}
+	with tempfile.TemporaryDirectory(prefix = 'meow-bench-') as save_dir:
+
+		# one run on the given map, or one per generated map size
+		maps = [('', args.map)]
+		if args.scales:
+			from worldgen import generate_map
+			maps = []
+			for scale in args.scales:
+				map_path = os.path.join(save_dir, f'world_{scale:g}x.tmx')
+				generate_map(map_path, scale, args.seed)
+				maps.append((f'@{scale:g}x', map_path))
+
+		for suffix, map_path in maps:
+			for name, func in BENCHMARKS:
+				if args.only is not None and name not in args.only:
+					continue
+				# every benchmark gets a fresh world so they do not affect each other
+				world_args = (save_dir, map_path, args.farmed, args.planted, args.props, args.seed)
+				world = World(*world_args)
+				key = name + suffix
+				results[key] = summarize(func(world, args.repeat))
+				print(f'{key:<28}{results[key]["median"]:>10.3f} ms median  {results[key]["p95"]:>10.3f} ms p95')
+
+				# how the memory of the level grows with the map, next to the draw time.
+				# Measured on a second world, the first one made the imports and caches
+				if name == 'custom_draw':
+					del world
+					world, kept = level_memory(world_args)
+					memory['level' + suffix] = kept
+					print(f'{"level memory" + suffix:<28}{kept / 1e6:>10.2f} MB kept')
+
+			if args.memory:
+				world = World(save_dir, map_path, args.farmed, args.planted, args.props, args.seed)
+				classes = memory['entities' + suffix] = entity_memory(world)
+				for name, entry in sorted(classes.items(), key = lambda item: -item[1]['count']):
+					has_dict = '  with __dict__' if entry['dict'] else ''
+					print(f'{name + suffix:<28}{entry["count"]:>10} instances  {entry["bytes"]:>10.0f} bytes each{has_dict}')
+
+	return {
+		'meta': {
+			'python': platform.python_version(),
+			'pygame': pygame.version.ver,
+			'map': args.map,
+			'scales': args.scales,
+			'farmed': args.farmed,
+			'planted': args.planted,
+			'props': args.props,
+			'repeat': args.repeat,
+			'seed': args.seed,
+			'render_scale': args.render_scale,
+			'zoom': args.zoom},
+		'results': results,
+		'memory': memory}
+
+def compare(report, baseline, threshold):
+	"""Print the change per benchmark, returns the names that regressed"""
+	regressions = []
+	for name, result in report['results'].items():
+		if name not in baseline['results']:
+			continue
+		before = baseline['results'][name]['median']
+		after = result['median']
+		change = (after - before) / before if before else 0
+		flag = ''
+		if change > threshold:
+			flag = '  REGRESSION'
+			regressions.append(name)
+		print(f'{name:<28}{before:>10.3f} -> {after:>10.3f} ms  {change * 100:+7.1f}%{flag}')
+	return regressions
+
+def parse_args():
+	parser = argparse.ArgumentParser(description = 'Meow Valley headless benchmarks')
+	parser.add_argument('--map', default = '../data/map.tmx', help = 'TMX map to benchmark on')
+	parser.add_argument('--scales', type = float, nargs = '*',
+		help = 'benchmark generated maps of these sizes (area relative to the original map)')
+	parser.add_argument('--farmed', type = float, default = 0.5,
+		help = 'fraction of farmable tiles that are tilled')
+	parser.add_argument('--planted', type = float, default = 0.5,
+		help = 'fraction of tilled tiles that get a plant')
+	parser.add_argument('--props', type = int, default = 0,
+		help = 'extra decoration sprites scattered over the map')
+	parser.add_argument('--repeat', type = int, default = 200,
+		help = 'timed calls per benchmark')
+	parser.add_argument('--seed', type = int, default = 1)
+	parser.add_argument('--render-scale', type = int, default = RENDER_SCALE,
+		help = 'draw the world this many times smaller and scale it up, see render_target.py')
+	parser.add_argument('--zoom', type = float, default = ZOOM_LEVELS[0],
+		help = 'target pixels per world pixel')
+	parser.add_argument('--only', nargs = '*', help = 'run only these benchmarks, none without names')
+	parser.add_argument('--memory', action = 'store_true', help = 'report the memory per sprite class')
+	parser.add_argument('--output', metavar = 'FILE', help = 'write results as JSON')
+	parser.add_argument('--compare', metavar = 'FILE', help = 'baseline JSON to compare against')
+	parser.add_argument('--threshold', type = float, default = 0.1,
+		help = 'allowed slowdown of the median before flagging, 0.1 = 10%%')
+	return parser.parse_args()
+
+if __name__ == '__main__':
+	args = parse_args()
+	report = run(args)
+
+	if args.output:
+		with open(args.output, 'w') as f:
+			json.dump(report, f, indent = 4)
+
+	if args.compare:
+		with open(args.compare, 'r') as f:
+			baseline = json.load(f)
+		print()
+		if compare(report, baseline, args.threshold):
+			sys.exit(1)
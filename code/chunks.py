@@ -0,0 +1,156 @@
+import pygame
+from settings import *
+
+class Chunk:
+	"""A square of the map and its sprites while it is loaded"""
+
+	def __init__(self, key):
+		self.key = key
+		self.sprites = []
+		self.loaded = False
+
+	def spawn(self, factory, args, release):
+		self.sprites.append((factory(*args), args, release))
+
+	def load(self, calls):
+		for factory, args, release in calls:
+			self.spawn(factory, args, release)
+		self.loaded = True
+
+	def unload(self):
+		for sprite, args, release in self.sprites:
+			if release:
+				release(sprite, *args)
+			else:
+				sprite.kill()
+		self.sprites.clear()
+		self.loaded = False
+
+class TileLayer:
+	"""A TMX tile layer, made into sprites one chunk at a time. Only the tile ids
+	of the layer are kept: factory(pos, image, *args) is called for each tile
+	of a chunk as it loads, or factory(pos, *args) with images = False."""
+
+	def __init__(self, tmx_data, name, factory, args, images):
+		self.data = tmx_data.get_layer_by_name(name).data
+		self.images = tmx_data.images
+		self.factory = factory
+		self.args = args
+		self.with_images = images
+
+	def calls(self, key, chunk_size):
+		cx, cy = key
+		for y in range(cy * chunk_size, min(len(self.data), (cy + 1) * chunk_size)):
+			row = self.data[y]
+			for x in range(cx * chunk_size, min(len(row), (cx + 1) * chunk_size)):
+				gid = row[x]
+				if gid:
+					pos = (x * TILE_SIZE, y * TILE_SIZE)
+					args = (pos, self.images[gid]) if self.with_images else (pos,)
+					yield self.factory, args + self.args, None
+
+class Placed:
+	"""Sprites registered one at a time with ChunkManager.add, by chunk"""
+
+	def __init__(self):
+		self.spawns = {}
+
+	def calls(self, key, chunk_size):
+		return self.spawns.get(key, ())
+
+class ChunkManager:
+	"""Creates the sprites of the chunks near the player and releases the rest.
+	Chunks within radius are loaded, and stay loaded until they are more than
+	radius + 1 away, so walking along a chunk border does not reload them."""
+
+	def __init__(self, world_size, chunk_size = CHUNK_SIZE, radius = CHUNK_RADIUS):
+		self.chunk_size = chunk_size
+		self.size = chunk_size * TILE_SIZE
+		self.radius = radius
+		self.columns = -(-world_size[0] // self.size)
+		self.rows = -(-world_size[1] // self.size)
+		self.world_rect = pygame.Rect((0,0), world_size)
+
+		# tile layers and placed sprites, made in this order when a chunk loads
+		self.sources = []
+
+		self.chunks = {}
+		self.loaded = set()
+		self.center = None
+
+	def key(self, pos):
+		return (int(pos[0]) // self.size, int(pos[1]) // self.size)
+
+	def keys(self):
+		"""Key of every chunk of the map"""
+		return [(x, y) for y in range(self.rows) for x in range(self.columns)]
+
+	def chunk(self, key):
+		if key not in self.chunks:
+			self.chunks[key] = Chunk(key)
+		return self.chunks[key]
+
+	def calls(self, key):
+		"""factory, args and release of every sprite of chunk key, in the order they are made"""
+		for source in self.sources:
+			yield from source.calls(key, self.chunk_size)
+
+	def add_layer(self, tmx_data, name, factory, *args, images = True):
+		"""Register the tile layer name of a map, see TileLayer. Its sprites are
+		killed when their chunk unloads."""
+		layer = TileLayer(tmx_data, name, factory, args, images)
+		self.sources.append(layer)
+		for key in self.loaded:
+			for factory, args, release in layer.calls(key, self.chunk_size):
+				self.chunk(key).spawn(factory, args, release)
+
+	def add(self, pos, factory, *args, release = None):
+		"""Register a sprite to be made with factory(*args) while its chunk is loaded.
+		On unload the sprite is killed, or passed to release(sprite, *args)."""
+		if not self.sources or not isinstance(self.sources[-1], Placed):
+			self.sources.append(Placed())
+		key = self.key(pos)
+		self.sources[-1].spawns.setdefault(key, []).append((factory, args, release))
+		if key in self.loaded:
+			self.chunk(key).spawn(factory, args, release)
+
+	def update(self, pos):
+		"""Stream chunks around pos, returns True when the loaded set changed"""
+		before = set(self.loaded)
+		for _ in self.steps(pos):
+			pass
+		return self.loaded != before
+
+	def steps(self, pos):
+		"""Like update, but yields the key of every chunk after loading it"""
+		center = self.key(pos)
+		if center == self.center:
+			return
+		self.center = center
+		cx, cy = center
+		r = self.radius
+
+		for key in list(self.loaded):
+			if max(abs(key[0] - cx), abs(key[1] - cy)) > r + 1:
+				self.loaded.discard(key)
+				self.chunk(key).unload()
+
+		for x in range(max(0, cx - r), min(self.columns, cx + r + 1)):
+			for y in range(max(0, cy - r), min(self.rows, cy + r + 1)):
+				if (x,y) not in self.loaded:
+					self.loaded.add((x,y))
+					self.chunk((x,y)).load(self.calls((x,y)))
+					yield (x,y)
+
+	def is_loaded(self, pos):
+		return self.key(pos) in self.loaded
+
+	def area(self):
+		"""Rect around all loaded chunks, in world pixels"""
+		rects = [pygame.Rect(x * self.size, y * self.size, self.size, self.size) for x, y in self.loaded]
+		if not rects:
+			return pygame.Rect(0,0,0,0)
+		return rects[0].unionall(rects[1:]).clip(self.world_rect)
+
+	def sprite_count(self):
+		return sum(len(self.chunks[key].sprites) for key in self.loaded)
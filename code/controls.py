@@ -0,0 +1,79 @@
+from collections import Counter
+from settings import KEY_BINDINGS, KEY_REPEAT
+from scheduler import Scheduler
+
+class Controls:
+	"""Turns the key events of a frame into actions.
+
+	Every input context ('game', 'player', 'menu', 'shop') has its own bindings in
+	KEY_BINDINGS and the active state only asks for its own context. A press
+	counts for the frame its KEYDOWN arrived in, even if the key was already
+	released again, and held keys are kept in a table between frames, so
+	nothing has to poll the keyboard or debounce. Every KEYDOWN counts: an
+	action pressed twice in one frame is pressed again the next frame, if it
+	was asked for."""
+
+	def __init__(self, bindings = KEY_BINDINGS, repeat = KEY_REPEAT):
+		# context -> action -> keys bound to it
+		self.keys = {}
+		for context, keys in bindings.items():
+			actions = self.keys[context] = {}
+			for key, action in keys.items():
+				actions.setdefault(action, set()).add(key)
+
+		# key -> times pressed this frame, and keys held down
+		self.pressed_keys = Counter()
+		self.held_keys = set()
+
+		# (context, action) -> presses not used up yet, counted when the action
+		# is first asked for in a frame. What is left over goes to the next frame
+		self.unused = {}
+		self.carried = {}
+
+		# held keys repeat after a delay, for pressed(..., repeat = True).
+		# Menus run while the gameplay scheduler is paused, so these have their own
+		self.repeat_delay, self.repeat_interval = repeat
+		self.clock = Scheduler()
+		self.repeats = {}
+		self.repeated_keys = set()
+
+	def next_frame(self, dt, keydowns, held_keys):
+		"""Take the keys of a new frame from frame_input"""
+		self.pressed_keys = Counter(keydowns)
+		self.held_keys = held_keys
+		self.carried = {action: count for action, count in self.unused.items() if count}
+		self.unused = {}
+
+		self.repeated_keys = set()
+		for key in list(self.repeats):
+			if key not in held_keys or key in self.pressed_keys:
+				self.clock.cancel(self.repeats.pop(key))
+		self.clock.advance(dt)
+		for key in self.pressed_keys.keys() & held_keys:
+			self.repeats[key] = self.clock.call_later(self.repeat_delay, self.repeat, key)
+
+	def repeat(self, key):
+		self.repeated_keys.add(key)
+		self.repeats[key] = self.clock.call_later(self.repeat_interval, self.repeat, key)
+
+	def count(self, context, action):
+		"""Times a key bound to action was pressed this frame"""
+		return sum(self.pressed_keys[key] for key in self.keys[context].get(action, ()))
+
+	def pressed(self, context, action, repeat = False):
+		"""Whether action was pressed, or repeated by a held key. Every True
+		for a press uses it up"""
+		unused = self.unused.get((context, action))
+		if unused is None:
+			unused = self.carried.get((context, action), 0) + self.count(context, action)
+		self.unused[(context, action)] = max(0, unused - 1)
+		if unused:
+			return True
+		return repeat and not self.repeated_keys.isdisjoint(self.keys[context].get(action, ()))
+
+	def held(self, context, action):
+		"""Whether a key bound to action is down"""
+		return not self.held_keys.isdisjoint(self.keys[context].get(action, ()))
+
+# fed by Game.run, read by the player and the menus
+controls = Controls()
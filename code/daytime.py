@@ -0,0 +1,51 @@
+from settings import DAY_MINUTES_PER_SECOND, DAY_START, DAY_END, DAY_PHASES, SKY_STEP
+
+DAY_MINUTES = 24 * 60
+
+# (start hour, name, tint) of every phase, in order
+PHASES = sorted((start, name, color) for name, (start, color) in DAY_PHASES.items())
+
+class DayClock:
+	"""In-game time, in minutes since midnight of the current day.
+
+	It runs while the level plays and jumps to the next morning when the
+	player sleeps. Past midnight the minutes go on counting beyond 24 hours,
+	so the day only ends at DAY_END."""
+
+	def __init__(self):
+		self.day = 1
+		self.minutes = DAY_START
+
+	def advance(self, dt):
+		self.minutes += dt * DAY_MINUTES_PER_SECOND
+
+	def next_day(self):
+		self.day += 1
+		self.minutes = DAY_START
+
+	def over(self):
+		"""Whether the player has stayed up until DAY_END"""
+		return self.minutes >= DAY_END
+
+	def hour(self):
+		return self.minutes % DAY_MINUTES / 60
+
+	def phase(self):
+		"""'dawn', 'day', 'dusk' or 'night'"""
+		hour = self.hour()
+		current = PHASES[-1][1]
+		for start, name, _ in PHASES:
+			if hour >= start:
+				current = name
+		return current
+
+	def step(self):
+		"""Index of the time of day in steps of SKY_STEP minutes"""
+		return int(self.minutes % DAY_MINUTES // SKY_STEP)
+
+	def get_state(self):
+		return {'day': self.day, 'minutes': self.minutes}
+
+	def set_state(self, state):
+		self.day = state['day']
+		self.minutes = state['minutes']
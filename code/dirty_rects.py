@@ -0,0 +1,97 @@
+import pygame
+from collections import deque
+from settings import *
+
+SCREEN_RECT = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+class DirtyRects:
+	"""Presents only the parts of the screen that changed since the last frame.
+
+	Everything is still drawn every frame, only pygame.display.update() is
+	limited. Drawing code reports what it drew with mark(key, state, rect);
+	a key that shows another state, moves or disappears makes its old and new
+	rect dirty. A camera scroll or full-screen tint change calls full()."""
+
+	def __init__(self, enabled = DIRTY_RECTS, history = 120):
+		self.enabled = enabled
+		self.full_frame = True
+		self.rects = []
+
+		# key -> (state, rect) drawn last frame and this frame
+		self.previous = {}
+		self.current = {}
+
+		# fraction of the screen presented, per frame
+		self.fractions = deque(maxlen = history)
+
+	def full(self):
+		"""Present the whole screen this frame"""
+		self.full_frame = True
+
+	def add(self, rect):
+		"""Present rect this frame, for things drawn anew every frame"""
+		if self.enabled:
+			self.rects.append(pygame.Rect(rect))
+
+	def mark(self, key, state, rect):
+		"""key was drawn at rect looking like state, anything comparable"""
+		if not self.enabled:
+			return
+		rect = tuple(rect)
+		self.current[key] = (state, rect)
+		if self.full_frame:
+			return
+		last = self.previous.get(key)
+		if last != (state, rect):
+			self.rects.append(pygame.Rect(rect))
+			if last:
+				self.rects.append(pygame.Rect(last[1]))
+
+	def merge(self):
+		"""The dirty rects clipped to the screen, overlapping ones joined"""
+		for key in self.previous.keys() - self.current.keys():
+			self.rects.append(pygame.Rect(self.previous[key][1]))
+
+		merged = []
+		for rect in self.rects:
+			rect = rect.clip(SCREEN_RECT)
+			if not rect.width or not rect.height:
+				continue
+			index = rect.collidelist(merged)
+			while index != -1:
+				rect.union_ip(merged.pop(index))
+				index = rect.collidelist(merged)
+			merged.append(rect)
+		return merged
+
+	def present(self):
+		"""pygame.display.update() for what changed, or for everything"""
+		if not self.enabled:
+			pygame.display.update()
+			return
+
+		rects = [] if self.full_frame else self.merge()
+		area = sum(rect.width * rect.height for rect in rects)
+		if self.full_frame or area > SCREEN_RECT.width * SCREEN_RECT.height * DIRTY_RECT_LIMIT:
+			pygame.display.update()
+			self.fractions.append(1.0)
+		else:
+			if rects:
+				pygame.display.update(rects)
+			self.fractions.append(area / (SCREEN_RECT.width * SCREEN_RECT.height))
+		self.end_frame()
+
+	def end_frame(self):
+		"""Start collecting the next frame, for frames presented some other way too"""
+		self.previous, self.current = self.current, {}
+		self.rects = []
+		self.full_frame = False
+
+	def fraction(self):
+		"""Mean fraction of the screen presented over the recent frames"""
+		if not self.fractions:
+			return 0.0
+		return sum(self.fractions) / len(self.fractions)
+
+# fed by the drawing code, presented by Game.run
+dirty_rects = DirtyRects()
@@ -0,0 +1,192 @@
+"""
+Draw back-ends: how the world, the HUD and the screen tints get to the window.
+
+SoftwareBackend blits surfaces onto the display surface, as the game always
+did. RendererBackend uploads every image as an SDL texture the first time it
+is drawn, and after that only submits draw calls to a pygame._sdl2 Renderer.
+With RENDERER_ACCELERATED = 0 (or SDL_RENDER_DRIVER=software) it runs on
+SDL's software renderer.
+
+	python main.py --backend renderer
+
+The menus and the loading screen are not drawn through a back-end. They draw
+on the display surface as before, and the renderer shows that surface as a
+whole while one of them is up.
+"""
+import pygame
+from weakref import WeakKeyDictionary
+from settings import *
+from render_target import render_target
+from dirty_rects import dirty_rects
+
+SCREEN_SIZE = (SCREEN_WIDTH, SCREEN_HEIGHT)
+
+class SoftwareBackend:
+	"""Surface.blit onto the display surface, or the render target for the world"""
+
+	def __init__(self):
+		# full screen surface in the last tint color
+		self.tint_surf = None
+		self.tint_color = None
+
+	def open(self, title):
+		"""Open the window, returns the display surface"""
+		screen = pygame.display.set_mode(SCREEN_SIZE)
+		pygame.display.set_caption(title)
+		return screen
+
+	def begin_frame(self, canvas):
+		"""canvas is True for frames drawn on the display surface by the menus"""
+
+	def begin_world(self):
+		render_target.get_surface().fill('black')
+
+	def world_blit(self):
+		"""blit(image, rect) for the sprites of the world, rects on the render target"""
+		return render_target.get_surface().blit
+
+	def end_world(self):
+		render_target.present()
+
+	def blit(self, surf, rect):
+		"""Draw surf on the screen, over the world"""
+		pygame.display.get_surface().blit(surf, rect)
+
+	def tint(self, color):
+		"""Multiply the whole screen by color"""
+		if color != self.tint_color:
+			if self.tint_surf is None:
+				self.tint_surf = pygame.Surface(SCREEN_SIZE)
+			self.tint_surf.fill(color)
+			self.tint_color = color
+		pygame.display.get_surface().blit(self.tint_surf, (0,0), special_flags = pygame.BLEND_RGBA_MULT)
+
+	def forget(self, image):
+		"""image was drawn on since it was last shown"""
+
+	def present(self):
+		dirty_rects.present()
+
+	def screenshot(self):
+		"""A copy of the frame drawn so far"""
+		return pygame.display.get_surface().copy()
+
+class RendererBackend:
+	"""Textures submitted to a pygame._sdl2 Renderer.
+
+	Atlas subsurfaces are drawn as regions of their page, so a page is uploaded
+	once for all of its images. Frames the menus draw go through the software
+	back-end onto the display surface, which present() then uploads whole."""
+
+	def __init__(self, accelerated = RENDERER_ACCELERATED):
+		self.accelerated = accelerated
+		self.software = SoftwareBackend()
+		self.window = None
+		self.renderer = None
+		self.canvas = False
+
+		# image -> (texture, region of the texture), dropped with the image
+		self.textures = WeakKeyDictionary()
+
+		# low resolution world for render_target.scale, and the uploaded display surface
+		self.world_texture = None
+		self.canvas_texture = None
+
+	def open(self, title):
+		from pygame._sdl2.video import Window, Renderer
+
+		# a renderer cannot share the window of the display module, which is
+		# kept hidden: convert() needs its pixel format and the menus draw on it
+		screen = pygame.display.set_mode(SCREEN_SIZE, pygame.HIDDEN)
+		self.window = Window(title, SCREEN_SIZE)
+		self.renderer = Renderer(self.window, accelerated = self.accelerated, target_texture = True)
+		return screen
+
+	def begin_frame(self, canvas):
+		self.canvas = canvas
+
+	def begin_world(self):
+		if self.canvas:
+			self.software.begin_world()
+			return
+		renderer = self.renderer
+		if render_target.scale != 1:
+			size = (SCREEN_WIDTH // render_target.scale, SCREEN_HEIGHT // render_target.scale)
+			if self.world_texture is None or self.world_texture.get_rect().size != size:
+				from pygame._sdl2.video import Texture
+				self.world_texture = Texture(renderer, size, target = True)
+			renderer.target = self.world_texture
+		renderer.draw_color = (0, 0, 0, 255)
+		renderer.clear()
+
+	def world_blit(self):
+		if self.canvas:
+			return self.software.world_blit()
+		return self.draw
+
+	def end_world(self):
+		if self.canvas:
+			self.software.end_world()
+		elif render_target.scale != 1:
+			self.renderer.target = None
+			self.world_texture.draw(dstrect = pygame.Rect((0,0), SCREEN_SIZE))
+
+	def texture(self, image):
+		"""(texture, region) to draw image from, uploaded on first use"""
+		entry = self.textures.get(image)
+		if entry is None:
+			from pygame._sdl2.video import Texture
+			page = image.get_abs_parent()
+			if page is not image and page.get_colorkey() == image.get_colorkey():
+				texture = self.texture(page)[0]
+				region = pygame.Rect(image.get_abs_offset(), image.get_size())
+			else:
+				texture = Texture.from_surface(self.renderer, image)
+				region = image.get_rect()
+			entry = self.textures[image] = (texture, region)
+		return entry
+
+	def draw(self, image, rect):
+		texture, region = self.texture(image)
+		texture.draw(region, (rect[0], rect[1], region.width, region.height))
+
+	def blit(self, surf, rect):
+		if self.canvas:
+			self.software.blit(surf, rect)
+			return
+		texture, region = self.texture(surf)
+		alpha = surf.get_alpha()
+		texture.alpha = 255 if alpha is None else alpha
+		texture.draw(region, (rect[0], rect[1], region.width, region.height))
+
+	def tint(self, color):
+		if self.canvas:
+			self.software.tint(color)
+			return
+		renderer = self.renderer
+		renderer.draw_blend_mode = pygame.BLENDMODE_MOD
+		renderer.draw_color = (*color[:3], 255)
+		renderer.fill_rect(pygame.Rect((0,0), SCREEN_SIZE))
+		renderer.draw_blend_mode = pygame.BLENDMODE_NONE
+
+	def forget(self, image):
+		self.textures.pop(image, None)
+
+	def present(self):
+		if self.canvas:
+			if self.canvas_texture is None:
+				from pygame._sdl2.video import Texture
+				self.canvas_texture = Texture(self.renderer, SCREEN_SIZE, streaming = True)
+			self.canvas_texture.update(pygame.display.get_surface())
+			self.canvas_texture.draw()
+		self.renderer.present()
+		dirty_rects.end_frame()
+
+	def screenshot(self):
+		if self.canvas:
+			return self.software.screenshot()
+		return self.renderer.to_surface()
+
+BACKENDS = {
+	'software': SoftwareBackend,
+	'renderer': RendererBackend}
@@ -1,13 +1,16 @@
 import json
 import os
 import pygame
-from settings import LAYERS, TILE_SIZE
+from settings import TILE_SIZE
+from soil import WATERED
+from replay import frame_input
+from tracing import traced
 
 class GameState:
 	"""Manages saving and loading game state"""
 	
-	def __init__(self):
-		self.save_dir = '../saves'
+	def __init__(self, save_dir = '../saves'):
+		self.save_dir = save_dir
 		self.save_file = 'savegame.json'
 		self.ensure_save_directory()
 	
@@ -16,42 +19,47 @@ class GameState:
 		if not os.path.exists(self.save_dir):
 			os.makedirs(self.save_dir)
 	
+	def collect_game_data(self, player, level):
+		"""Gather the current game state into a serializable dict"""
+		return {
+			'player': {
+				'pos': [player.pos.x, player.pos.y],
+				'direction': [player.direction.x, player.direction.y],
+				'status': player.status,
+				'frame_index': player.frame_index,
+				'money': player.money,
+				'item_inventory': player.item_inventory,
+				'seed_inventory': player.seed_inventory,
+				'selected_tool': player.selected_tool,
+				'selected_seed': player.selected_seed,
+				'tool_index': player.tool_index,
+				'seed_index': player.seed_index,
+				'sleep': player.sleep,
+				'timers': self.serialize_timers(player.timers),
+			},
+			'level': {
+				'raining': level.raining,
+				'daytime': level.daytime.get_state(),
+				'soil_grid': self.serialize_soil_grid(level.soil_layer),
+				'plants': self.serialize_plants(level.soil_layer),
+				'trees': self.serialize_trees(level.tree_records),
+				'water_tiles': self.serialize_water_tiles(level.soil_layer),
+				'transition': {
+					'color': level.transition.color,
+					'speed': level.transition.speed
+				}
+			},
+			'meta': {
+				'save_time': frame_input.get_ticks(),
+				'version': '1.0'
+			}
+		}
+	
+	@traced('GameState.save_game')
 	def save_game(self, player, level):
 		"""Save current game state"""
 		try:
-			game_data = {
-				'player': {
-					'pos': [player.pos.x, player.pos.y],
-					'direction': [player.direction.x, player.direction.y],
-					'status': player.status,
-					'frame_index': player.frame_index,
-					'money': player.money,
-					'item_inventory': player.item_inventory,
-					'seed_inventory': player.seed_inventory,
-					'selected_tool': player.selected_tool,
-					'selected_seed': player.selected_seed,
-					'tool_index': player.tool_index,
-					'seed_index': player.seed_index,
-					'sleep': player.sleep,
-					'timers': self.serialize_timers(player.timers),
-				},
-				'level': {
-					'raining': level.raining,
-					'sky_color': level.sky.start_color,
-					'soil_grid': self.serialize_soil_grid(level.soil_layer),
-					'plants': self.serialize_plants(level.soil_layer.plant_sprites),
-					'trees': self.serialize_trees(level.tree_sprites),
-					'water_tiles': self.serialize_water_tiles(level.soil_layer.water_sprites),
-					'transition': {
-						'color': level.transition.color,
-						'speed': level.transition.speed
-					}
-				},
-				'meta': {
-					'save_time': pygame.time.get_ticks(),
-					'version': '1.0'
-				}
-			}
+			game_data = self.collect_game_data(player, level)
 			
 			save_path = os.path.join(self.save_dir, self.save_file)
 			with open(save_path, 'w') as f:
@@ -64,6 +72,7 @@ class GameState:
 			traceback.print_exc()
 			return False
 	
+	@traced('GameState.load_game')
 	def load_game(self):
 		"""Load saved game state"""
 		try:
@@ -89,47 +98,27 @@ class GameState:
 	
 	def serialize_soil_grid(self, soil_layer):
 		"""Convert soil grid to serializable format"""
-		serialized = []
-		for row in soil_layer.grid:
-			serialized_row = []
-			for cell in row:
-				if cell and len(cell) > 0:
-					# cell is a list in the original code
-					serialized_row.append(cell if isinstance(cell, list) else list(cell))
-				else:
-					serialized_row.append([])
-			serialized.append(serialized_row)
-		return serialized
+		return soil_layer.grid.to_lists()
 	
-	def serialize_plants(self, plant_sprites):
-		"""Convert plant sprites to serializable format"""
-		plants = []
-		if plant_sprites:
-			for plant in plant_sprites.sprites():
-				plant_data = {
-					'plant_type': plant.plant_type,
-					'pos': [plant.rect.x, plant.rect.y],
-					'age': plant.age,
-					'harvestable': plant.harvestable,
-					'soil_pos': [plant.soil.rect.x, plant.soil.rect.y]
-				}
-				plants.append(plant_data)
+	def serialize_plants(self, soil_layer):
+		"""Convert plant sprites and dormant plants to serializable format"""
+		plants = [plant.get_state() for plant in soil_layer.plant_sprites.sprites()]
+		plants.extend(dict(plant_data) for plant_data in soil_layer.dormant_plants)
 		return plants
 	
-	def serialize_trees(self, tree_sprites):
-		"""Convert tree sprites to serializable format"""
+	def serialize_trees(self, tree_records):
+		"""Convert trees to serializable format, loaded or not"""
 		trees = []
-		if tree_sprites:
-			for tree in tree_sprites.sprites():
-				# Check if it's actually a Tree object (not WildFlower or other sprites)
-				if hasattr(tree, 'health') and hasattr(tree, 'alive'):
-					tree_data = {
-						'pos': [tree.rect.x, tree.rect.y],
-						'health': tree.health,
-						'alive': tree.alive,
-						'apple_count': len(tree.apple_sprites.sprites()) if hasattr(tree, 'apple_sprites') else 0
-					}
-					trees.append(tree_data)
+		for record in tree_records:
+			if record['sprite']:
+				tree_data = record['sprite'].get_state()
+			elif record['state']:
+				tree_data = dict(record['state'])
+			else:
+				# never loaded yet, it grows its fruit when it first appears
+				tree_data = {'health': 5, 'alive': True}
+			tree_data['pos'] = list(record['pos'])
+			trees.append(tree_data)
 		return trees
 	
 	def serialize_timers(self, timers):
@@ -138,19 +127,20 @@ class GameState:
 		for name, timer in timers.items():
 			serialized[name] = {
 				'active': timer.active,
-				'start_time': timer.start_time,
+				'remaining': timer.remaining(),
 				'duration': timer.duration
 			}
 		return serialized
 	
-	def serialize_water_tiles(self, water_sprites):
-		"""Convert water tiles to serializable format"""
+	def serialize_water_tiles(self, soil_layer):
+		"""Position and water variant of the watered tiles, including those not loaded"""
 		water_tiles = []
-		if water_sprites:
-			for water in water_sprites.sprites():
-				water_tiles.append([water.rect.x, water.rect.y])
+		for x, y, cell in soil_layer.grid.cells():
+			if cell & WATERED:
+				water_tiles.append([x * TILE_SIZE, y * TILE_SIZE, soil_layer.grid.variant(x, y) or 0])
 		return water_tiles
 	
+	@traced('GameState.apply_loaded_data')
 	def apply_loaded_data(self, game_data, player, level):
 		"""Apply loaded data to game objects"""
 		try:
@@ -190,9 +180,9 @@ class GameState:
 			level.raining = level_data['raining']
 			level.soil_layer.raining = level_data['raining']
 			
-			# Restore sky color
-			if 'sky_color' in level_data:
-				level.sky.start_color = level_data['sky_color']
+			# Restore the time of day, older saves start in the morning
+			if 'daytime' in level_data:
+				level.daytime.set_state(level_data['daytime'])
 			
 			# Restore transition state
 			if 'transition' in level_data:
@@ -202,12 +192,12 @@ class GameState:
 			# Restore soil grid
 			self.restore_soil_grid(level.soil_layer, level_data['soil_grid'])
 			
-			# Recreate soil tiles first
-			level.soil_layer.create_soil_tiles()
-			
 			# Restore water tiles
 			if 'water_tiles' in level_data:
-				self.restore_water_tiles(level, level_data['water_tiles'])
+				self.restore_water_tiles(level.soil_layer, level_data['water_tiles'])
+			
+			# Redraw the farm with both
+			level.soil_layer.create_soil_tiles()
 			
 			# Restore plants
 			self.restore_plants(level, level_data['plants'])
@@ -225,123 +215,47 @@ class GameState:
 	
 	def restore_soil_grid(self, soil_layer, grid_data):
 		"""Restore soil grid from saved data"""
-		for y, row in enumerate(grid_data):
-			for x, cell in enumerate(row):
-				if cell and len(cell) > 0:
-					# Keep it as a list, not a set
-					soil_layer.grid[y][x] = cell if isinstance(cell, list) else list(cell)
-				else:
-					soil_layer.grid[y][x] = []
+		soil_layer.grid.from_lists(grid_data)
 	
 	def restore_plants(self, level, plants_data):
 		"""Restore plants from saved data"""
-		from soil import Plant
+		soil_layer = level.soil_layer
 		
 		# Clear existing plants
-		if level.soil_layer.plant_sprites:
-			for plant in level.soil_layer.plant_sprites.sprites():
-				plant.kill()
+		for plant in soil_layer.plant_sprites.sprites():
+			plant.kill()
+		soil_layer.dormant_plants = []
 		
-		# Recreate plants from saved data
-		for plant_data in plants_data:
-			# Find the soil sprite at the saved position
-			soil_pos = plant_data['soil_pos']
-			soil_sprite = None
-			
-			for sprite in level.soil_layer.soil_sprites.sprites():
-				if sprite.rect.x == soil_pos[0] and sprite.rect.y == soil_pos[1]:
-					soil_sprite = sprite
-					break
-			
-			if soil_sprite:
-				# Create the plant
-				plant = Plant(
-					plant_type=plant_data['plant_type'],
-					groups=[level.all_sprites, level.soil_layer.plant_sprites, level.collision_sprites],
-					soil=soil_sprite,
-					check_watered=level.soil_layer.check_watered
-				)
-				
-				# Restore plant state
-				plant.age = plant_data['age']
-				plant.harvestable = plant_data['harvestable']
-				
-				# Update plant image and position based on age
-				if int(plant.age) > 0:
-					plant.z = LAYERS['main']
-					plant.hitbox = plant.rect.copy().inflate(-26, -plant.rect.height * 0.4)
-				
-				if plant.age >= plant.max_age:
-					plant.age = plant.max_age
-					plant.harvestable = True
-				
-				plant.image = plant.frames[int(plant.age)]
-				plant.rect = plant.image.get_rect(midbottom=soil_sprite.rect.midbottom + pygame.math.Vector2(0, plant.y_offset))
+		# Recreate plants in loaded chunks, the rest stay dormant
+		soil_layer.load_plants([dict(plant_data) for plant_data in plants_data])
 	
 	def restore_trees(self, level, trees_data):
 		"""Restore tree health and state from saved data"""
-		tree_index = 0
-		
-		if level.tree_sprites:
-			for tree in level.tree_sprites.sprites():
-				# Check if it's actually a Tree object
-				if hasattr(tree, 'health') and hasattr(tree, 'alive') and tree_index < len(trees_data):
-					tree_data = trees_data[tree_index]
-					
-					# Restore tree health and state
-					tree.health = tree_data['health']
-					tree.alive = tree_data['alive']
-					
-					# If tree is dead, update its appearance
-					if not tree.alive:
-						tree.image = tree.stump_surf
-						tree.rect = tree.image.get_rect(midbottom=tree.rect.midbottom)
-						tree.hitbox = tree.rect.copy().inflate(-10, -tree.rect.height * 0.6)
-					
-					# Update apple count (remove excess or keep current if less)
-					current_apples = len(tree.apple_sprites.sprites()) if hasattr(tree, 'apple_sprites') else 0
-					saved_apples = tree_data['apple_count']
-					
-					# Remove excess apples
-					while current_apples > saved_apples and current_apples > 0:
-						apple = tree.apple_sprites.sprites()[0]
-						apple.kill()
-						current_apples -= 1
-					
-					tree_index += 1
+		for record, tree_data in zip(level.tree_records, trees_data):
+			if record['sprite']:
+				record['sprite'].set_state(tree_data)
+			else:
+				record['state'] = dict(tree_data)
 	
 	def restore_timers(self, timers, timer_data):
-		"""Restore player timers from saved data"""
-		current_time = pygame.time.get_ticks()
-		
+		"""Restore player timers from saved data, active ones carry on where they stopped"""
 		for name, data in timer_data.items():
 			if name in timers:
 				timer = timers[name]
-				timer.active = data['active']
 				timer.duration = data['duration']
 				
-				# Adjust start_time based on current time
-				if data['active'] and data['start_time'] > 0:
-					# Keep the timer active with adjusted start time
-					timer.start_time = current_time - (data['start_time'] % data['duration'])
+				if not data['active']:
+					timer.deactivate()
+				elif 'remaining' in data:
+					timer.activate(data['remaining'])
 				else:
-					timer.start_time = data['start_time']
+					# older saves only kept the start time
+					timer.activate(data['duration'] - data['start_time'] % data['duration'])
 	
-	def restore_water_tiles(self, level, water_tiles_data):
-		"""Restore water tiles from saved data"""
-		from random import choice
-		from soil import WaterTile
-		
-		# Clear existing water sprites
-		for sprite in level.soil_layer.water_sprites.sprites():
-			sprite.kill()
-		
-		# Recreate water tiles
+	def restore_water_tiles(self, soil_layer, water_tiles_data):
+		"""Restore the water variants, the grid already has the watered tiles"""
 		for pos in water_tiles_data:
-			surf = choice(level.soil_layer.water_surfs)
-			WaterTile(
-				pos=(pos[0], pos[1]),
-				surf=surf,
-				groups=[level.all_sprites, level.soil_layer.water_sprites]
-			)
+			# older saves only kept the position, those tiles pick a variant when drawn
+			if len(pos) > 2:
+				soil_layer.grid.set_variant(pos[0] // TILE_SIZE, pos[1] // TILE_SIZE, pos[2])
 
@@ -2,84 +2,132 @@ import pygame
 from settings import *
 from player import Player
 from overlay import Overlay
-from sprites import Generic, Water, WildFlower, Tree, Interaction, Particle
+from itertools import chain
+from sprites import Generic, Tile, CollisionGroup, Water, WildFlower, Tree, Interaction, particles
 from support import *
 from transition import Transition
-from soil import SoilLayer
+from soil import SoilLayer, PLANTED
+from chunks import ChunkManager
+from assets import Assets
+from audio import audio
 from sky import Rain, Sky
-from random import randint
+from daytime import DayClock
+from rng import rng
 from menu import Menu
+from profiler import profiler
+from dirty_rects import dirty_rects
+from render_target import render_target
+from draw_backend import SoftwareBackend
+from tracing import traced
 
 class Level:
-	def __init__(self):
+	def __init__(self, on_reset = None, map_path = '../data/map.tmx', build = True, assets = None, backend = None):
+		self.map_path = map_path
+
+		# loaded files, shared with other levels of the same session
+		self.assets = assets or Assets()
+
+		# where the world and the HUD are drawn, see draw_backend.py
+		self.backend = backend or SoftwareBackend()
+
+		# called after every new day, e.g. to take a snapshot
+		self.on_reset = on_reset
+
+		# build = False leaves the construction to the caller, see build()
+		if build:
+			for _ in self.build():
+				pass
+
+	def build(self):
+		"""Construct the level one step at a time, yields the progress from 0 to 1.
+		A loading screen can spread the steps over several frames."""
 
 		# get the display surface
 		self.display_surface = pygame.display.get_surface()
 
+		# map
+		self.tmx_data = self.assets.tmx_map(self.map_path)
+		self.world_size = (self.tmx_data.width * TILE_SIZE, self.tmx_data.height * TILE_SIZE)
+		yield 0.2
+
 		# sprite groups
-		self.all_sprites = CameraGroup()
-		self.collision_sprites = pygame.sprite.Group()
+		self.all_sprites = CameraGroup(self.backend)
+		self.collision_sprites = CollisionGroup()
 		self.tree_sprites = pygame.sprite.Group()
 		self.interaction_sprites = pygame.sprite.Group()
 
-		self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites)
-		self.setup()
-		self.overlay = Overlay(self.player)
-		self.transition = Transition(self.reset, self.player)
+		# map sprites only exist in the chunks around the player
+		self.chunks = ChunkManager(self.world_size)
+		self.tree_records = []
+
+		self.soil_layer = SoilLayer(self.all_sprites, self.collision_sprites, self.tmx_data, self.assets, self.backend)
+		yield 0.3
+		for _ in self.setup():
+			yield 0.35
+		yield 0.4
+		self.overlay = Overlay(self.player, self.assets, self.backend)
+		self.transition = Transition(self.reset, self.player, self.backend)
+		yield 0.45
 
 		# sky
-		self.rain = Rain(self.all_sprites)
-		self.raining = randint(0,10) > 7
+		self.rain = Rain(self.all_sprites, self.world_size, self.assets)
+		self.raining = rng.randint(0,10) > 7
 		self.soil_layer.raining = self.raining
-		self.sky = Sky()
+		self.sky = Sky(self.backend)
+		self.daytime = DayClock()
+		yield 0.5
+
+		# sprites of the chunks around the player
+		expected = (2 * CHUNK_RADIUS + 1) ** 2
+		for count, _ in enumerate(self.stream_steps(), 1):
+			yield 0.5 + 0.35 * min(count, expected) / expected
 
 		# shop
-		self.menu = Menu(self.player, self.toggle_shop)
+		self.menu = Menu(self.player, self.toggle_shop, self.assets, self.backend)
 		self.shop_active = False
+		yield 0.9
 
-		# music
-		self.success = load_sound('../audio/success.wav')
+		# sounds and music
+		self.success = self.assets.sound('../audio/success.wav')
 		self.success.set_volume(0.3)
-		self.music = load_sound('../audio/music.mp3')
-		self.music.play(loops = -1)
+		audio.play_music('../audio/music.mp3')
+		yield 1
 
 	def setup(self):
-		tmx_data = load_tmx_map('../data/map.tmx')
+		"""Register the map with the chunk manager and create the player,
+		yields between the slower parts"""
+		tmx_data = self.tmx_data
+		chunks = self.chunks
 
 		# house 
+		tiles = self.all_sprites.tiles
 		for layer in ['HouseFloor', 'HouseFurnitureBottom']:
-			for x, y, surf in tmx_data.get_layer_by_name(layer).tiles():
-				Generic((x * TILE_SIZE,y * TILE_SIZE), surf, self.all_sprites, LAYERS['house bottom'])
+			chunks.add_layer(tmx_data, layer, Tile, tiles, LAYERS['house bottom'])
 
 		for layer in ['HouseWalls', 'HouseFurnitureTop']:
-			for x, y, surf in tmx_data.get_layer_by_name(layer).tiles():
-				Generic((x * TILE_SIZE,y * TILE_SIZE), surf, self.all_sprites)
+			chunks.add_layer(tmx_data, layer, Tile, tiles)
 
 		# Fence
-		for x, y, surf in tmx_data.get_layer_by_name('Fence').tiles():
-			Generic((x * TILE_SIZE,y * TILE_SIZE), surf, [self.all_sprites, self.collision_sprites])
+		chunks.add_layer(tmx_data, 'Fence', Generic, [self.all_sprites, self.collision_sprites])
 
 		# water 
-		water_frames = import_folder('../graphics/water')
-		for x, y, surf in tmx_data.get_layer_by_name('Water').tiles():
-			Water((x * TILE_SIZE,y * TILE_SIZE), water_frames, self.all_sprites)
+		water_frames = self.assets.folder('../graphics/water')
+		chunks.add_layer(tmx_data, 'Water', Water, water_frames, self.all_sprites, images = False)
 
-		# trees 
+		# trees, their state is kept in the record while the chunk is not loaded
 		for obj in tmx_data.get_layer_by_name('Trees'):
-			Tree(
-				pos = (obj.x, obj.y), 
-				surf = obj.image, 
-				groups = [self.all_sprites, self.collision_sprites, self.tree_sprites], 
-				name = obj.name,
-				player_add = self.player_add)
+			record = {'pos': (obj.x, obj.y), 'surf': obj.image, 'name': obj.name, 'state': None, 'sprite': None}
+			self.tree_records.append(record)
+			chunks.add(record['pos'], self.spawn_tree, record, release = self.release_tree)
 
 		# wildflowers 
 		for obj in tmx_data.get_layer_by_name('Decoration'):
-			WildFlower((obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites])
+			chunks.add((obj.x, obj.y), WildFlower, (obj.x, obj.y), obj.image, [self.all_sprites, self.collision_sprites])
 
 		# collion tiles
-		for x, y, surf in tmx_data.get_layer_by_name('Collision').tiles():
-			Generic((x * TILE_SIZE, y * TILE_SIZE), pygame.Surface((TILE_SIZE, TILE_SIZE)), self.collision_sprites)
+		collision_surf = pygame.Surface((TILE_SIZE, TILE_SIZE))
+		chunks.add_layer(tmx_data, 'Collision', Generic, collision_surf, self.collision_sprites, images = False)
+		yield
 
 		# Player 
 		for obj in tmx_data.get_layer_by_name('Player'):
@@ -91,20 +139,56 @@ class Level:
 					tree_sprites = self.tree_sprites,
 					interaction = self.interaction_sprites,
 					soil_layer = self.soil_layer,
-					toggle_shop = self.toggle_shop)
+					toggle_shop = self.toggle_shop,
+					assets = self.assets)
 			
 			if obj.name == 'Bed':
 				Interaction((obj.x,obj.y), (obj.width,obj.height), self.interaction_sprites, obj.name)
 
 			if obj.name == 'Trader':
 				Interaction((obj.x,obj.y), (obj.width,obj.height), self.interaction_sprites, obj.name)
+		yield
 
-
-		Generic(
-			pos = (0,0),
-			surf = load_image('../graphics/world/ground.png', convert_alpha=True),
-			groups = self.all_sprites,
-			z = LAYERS['ground'])
+		# ground: one painted image, or the Ground tile layer for generated maps
+		if tmx_data.properties.get('ground') == 'tiles':
+			chunks.add_layer(tmx_data, 'Ground', Tile, tiles, LAYERS['ground'])
+		else:
+			Tile(
+				pos = (0,0),
+				surf = self.assets.image('../graphics/world/ground.png', convert_alpha=True),
+				tiles = tiles,
+				z = LAYERS['ground'])
+
+	def spawn_tree(self, record):
+		record['sprite'] = Tree(
+			pos = record['pos'], 
+			surf = record['surf'], 
+			groups = [self.all_sprites, self.collision_sprites, self.tree_sprites], 
+			name = record['name'],
+			player_add = self.player_add,
+			assets = self.assets,
+			state = record['state'])
+		return record['sprite']
+
+	def release_tree(self, tree, record):
+		record['state'] = tree.get_state()
+		record['sprite'] = None
+		tree.remove()
+
+	def stream_steps(self):
+		"""Load the chunks around the player and release the ones far away,
+		yields after every chunk that is loaded"""
+		before = set(self.chunks.loaded)
+		for key in self.chunks.steps(self.player.rect.center):
+			render_target.prescale(sprite for sprite, _, __ in self.chunks.chunks[key].sprites)
+			yield key
+		if self.chunks.loaded != before:
+			self.soil_layer.set_loaded(self.chunks.loaded)
+			self.rain.area = self.chunks.area()
+
+	def stream(self):
+		for _ in self.stream_steps():
+			pass
 
 	def player_add(self,item):
 
@@ -115,26 +199,34 @@ class Level:
 
 		self.shop_active = not self.shop_active
 
+	@traced('Level.reset')
 	def reset(self):
 		# plants
 		self.soil_layer.update_plants()
 
 		# soil
 		self.soil_layer.remove_water()
-		self.raining = randint(0,10) > 7
+		self.raining = rng.randint(0,10) > 7
 		self.soil_layer.raining = self.raining
 		if self.raining:
 			self.soil_layer.water_all()
 
 		# apples on the trees
-		for tree in self.tree_sprites.sprites():
-			if isinstance(tree, Tree):
+		for record in self.tree_records:
+			tree = record['sprite']
+			if tree:
 				for apple in tree.apple_sprites.sprites():
 					apple.kill()
 				tree.create_fruit()
+			elif record['state']:
+				# without saved apples the tree grows new fruit when it loads
+				record['state'] = {'health': record['state']['health'], 'alive': record['state']['alive']}
 
-		# sky
-		self.sky.start_color = [255,255,255]
+		# a new morning
+		self.daytime.next_day()
+
+		if self.on_reset:
+			self.on_reset()
 
 	def plant_collision(self):
 		if self.soil_layer.plant_sprites:
@@ -142,56 +234,130 @@ class Level:
 				if plant.harvestable and plant.rect.colliderect(self.player.hitbox):
 					self.player_add(plant.plant_type)
 					plant.kill()
-					Particle(plant.rect.topleft, plant.image, self.all_sprites, z = LAYERS['main'])
-					self.soil_layer.grid[plant.rect.centery // TILE_SIZE][plant.rect.centerx // TILE_SIZE].remove('P')
+					particles.spawn(plant.rect.topleft, plant.image, self.all_sprites, z = LAYERS['main'])
+					self.soil_layer.grid.remove(plant.rect.centerx // TILE_SIZE, plant.rect.centery // TILE_SIZE, PLANTED)
+
+	def draw_world(self):
+		"""Draw the sprites on the render target and bring them to the window"""
+		self.backend.begin_world()
+		self.all_sprites.custom_draw(self.player)
+		self.backend.end_world()
+
+	def draw(self):
+		"""Draw the frame as it stands, without advancing anything"""
+		self.draw_world()
+		self.overlay.display()
+		self.sky.display(self.daytime)
+		if self.player.sleep:
+			self.transition.draw()
 
 	def run(self,dt):
+
+		# world streaming
+		profiler.begin('stream')
+		self.stream()
+		profiler.end('stream')
 		
 		# drawing logic
-		self.display_surface.fill('black')
-		self.all_sprites.custom_draw(self.player)
+		profiler.begin('draw')
+		self.draw_world()
+		profiler.end('draw')
 		
 		# updates
 		if self.shop_active:
+			profiler.begin('menu')
 			self.menu.update()
+			profiler.end('menu')
 		else:
+			profiler.begin('update')
 			self.all_sprites.update(dt)
+			profiler.end('update')
+			profiler.begin('plant collision')
 			self.plant_collision()
+			profiler.end('plant collision')
 
 		# weather
+		profiler.begin('overlay')
 		self.overlay.display()
+		profiler.end('overlay')
 		if self.raining and not self.shop_active:
+			profiler.begin('rain')
 			self.rain.update()
-		self.sky.display(dt)
+			profiler.end('rain')
+		profiler.begin('sky')
+		if not self.player.sleep:
+			self.daytime.advance(dt)
+		self.sky.display(self.daytime)
+		profiler.end('sky')
+
+		# staying up too late ends the day as well
+		if self.daytime.over():
+			self.player.sleep = True
 
 		# transition overlay
 		if self.player.sleep:
 			self.transition.play()
 
+		if profiler.enabled:
+			profiler.count('all', len(self.all_sprites))
+			profiler.count('tiles', len(self.all_sprites.tiles))
+			profiler.count('chunks', len(self.chunks.loaded))
+			profiler.count('collision', len(self.collision_sprites))
+			profiler.count('trees', len(self.tree_sprites))
+			profiler.count('farm blocks', len(self.soil_layer.farm_blocks))
+			profiler.count('plants', len(self.soil_layer.plant_sprites))
+
 class CameraGroup(pygame.sprite.Group):
-	def __init__(self):
+	def __init__(self, backend):
 		super().__init__()
-		self.display_surface = pygame.display.get_surface()
+		self.backend = backend
 		self.offset = pygame.math.Vector2()
 
+		# map tiles that are only drawn, see sprites.Tile
+		self.tiles = {}
+
+	def drawables(self):
+		"""The sprites and then the tiles"""
+		return chain(self.sprites(), self.tiles)
+
 	def custom_draw(self, player):
-		self.offset.x = player.rect.centerx - SCREEN_WIDTH / 2
-		self.offset.y = player.rect.centery - SCREEN_HEIGHT / 2
+		blit = self.backend.world_blit()
+		zoom = render_target.zoom
+		view_width, view_height = render_target.view_size()
+
+		last_offset = self.offset.copy()
+		self.offset.x = player.rect.centerx - view_width / 2
+		self.offset.y = player.rect.centery - view_height / 2
+
+		# a scroll moves everything on screen
+		mark = dirty_rects.mark if dirty_rects.enabled else None
+		if mark and self.offset != last_offset:
+			dirty_rects.full()
+
+		# sorted once, then drawn layer by layer
+		layers = {}
+		for sprite in sorted(self.drawables(), key = lambda sprite: sprite.rect.centery):
+			layers.setdefault(sprite.z, []).append(sprite)
 
 		for layer in LAYERS.values():
-			for sprite in sorted(self.sprites(), key = lambda sprite: sprite.rect.centery):
-				if sprite.z == layer:
-					offset_rect = sprite.rect.copy()
-					offset_rect.center -= self.offset
-					self.display_surface.blit(sprite.image, offset_rect)
-
-					# # anaytics
-					# if sprite == player:
-					# 	pygame.draw.rect(self.display_surface,'red',offset_rect,5)
-					# 	hitbox_rect = player.hitbox.copy()
-					# 	hitbox_rect.center = offset_rect.center
-					# 	pygame.draw.rect(self.display_surface,'green',hitbox_rect,5)
-					# 	target_pos = offset_rect.center + PLAYER_TOOL_OFFSET[player.status.split('_')[0]]
-					# 	pygame.draw.circle(self.display_surface,'blue',target_pos,5)
+			for sprite in layers.get(layer, ()):
+				offset_rect = sprite.rect.copy()
+				offset_rect.center -= self.offset
+				image = sprite.image
+				if zoom != 1:
+					image = render_target.scaled(image)
+					offset_rect = image.get_rect(topleft = (round(offset_rect.x * zoom), round(offset_rect.y * zoom)))
+				blit(image, offset_rect)
+				if mark:
+					mark(sprite, image, render_target.screen_rect(offset_rect))
+
+				# # anaytics
+				# if sprite == player:
+				# 	pygame.draw.rect(self.display_surface,'red',offset_rect,5)
+				# 	hitbox_rect = player.hitbox.copy()
+				# 	hitbox_rect.center = offset_rect.center
+				# 	pygame.draw.rect(self.display_surface,'green',hitbox_rect,5)
+				# 	target_pos = offset_rect.center + PLAYER_TOOL_OFFSET[player.status.split('_')[0]]
+				# 	pygame.draw.circle(self.display_surface,'blue',target_pos,5)
 class saved_game:
 	pass
\ No newline at end of file
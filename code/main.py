@@ -1,43 +1,79 @@
 import pygame, sys
+import os
+import random
+import argparse
+import cProfile
+import pstats
 from settings import *
 from level import Level
-from menu import MainMenu, SettingsMenu, PauseMenu, Notification
+from menu import MainMenu, SettingsMenu, PauseMenu, Notification, LoadingScreen
 from game_state import GameState
+from snapshot import SnapshotBuffer
+from preload import Preloader
+from assets import Assets
+from audio import audio
+from profiler import profiler
+from tracing import tracer
+from replay import frame_input, state_digest
+from controls import controls
+from scheduler import scheduler
+from sprites import particles
+from dirty_rects import dirty_rects
+from render_target import render_target
+from draw_backend import BACKENDS
+from rng import rng
 
 class Game:
-	def __init__(self):
+	def __init__(self, backend = DRAW_BACKEND):
 		pygame.init()
-		self.screen = pygame.display.set_mode((SCREEN_WIDTH,SCREEN_HEIGHT))
-		pygame.display.set_caption('Meow Valley')
+		# draws the world and the HUD, see draw_backend.py
+		self.backend = BACKENDS[backend]()
+		self.screen = self.backend.open('Meow Valley')
 		self.clock = pygame.time.Clock()
 		
 		# Game states
-		self.state = 'main_menu'  # main_menu, playing, settings, paused
+		self.state = 'main_menu'  # main_menu, loading, playing, settings, paused
 		self.level = None
+		self.map_path = '../data/map.tmx'
 		
 		# Menus
 		self.main_menu = MainMenu()
 		self.settings_menu = SettingsMenu()
 		self.pause_menu = PauseMenu()
-		self.notification = Notification()
+		self.notification = Notification(self.backend)
+		self.loading_screen = LoadingScreen()
+		
+		# build levels over several frames, off for recording and replay
+		# so the frame count does not depend on the speed of the machine
+		self.progressive_loading = True
+		
+		# decodes level assets in the background while the main menu is up
+		self.preloader = Preloader()
+		
+		# files loaded by the first level are reused by the later ones
+		self.assets = Assets()
 		
 		# Save system
 		self.game_state = GameState()
+		self.snapshots = SnapshotBuffer(self.game_state)
 		
 		# Sound settings
 		self.music_volume = 0.5
 		self.sound_volume = 0.5
 		
-		# Input tracking
-		self.esc_pressed = False
-		self.esc_timer = 0
-		self.input_cooldown = 0.2  # seconds
+		# state of the previous frame, a change redraws the whole screen
+		self.last_state = None
+		
+		# last gameplay frame, dimmed, shown under the pause and settings menus
+		self.frozen_frame = None
+		self.dim = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+		self.dim.set_alpha(128)
+		self.dim.fill('black')
+
 	
 	def start_new_game(self):
 		"""Start a new game"""
-		self.level = Level()
-		self.apply_sound_settings()
-		self.state = 'playing'
+		self.start_loading(self.build_level())
 	
 	def load_game(self):
 		"""Load a saved game"""
@@ -47,15 +83,47 @@ class Game:
 		
 		game_data = self.game_state.load_game()
 		if game_data:
-			self.level = Level()
-			self.game_state.apply_loaded_data(game_data, self.level.player, self.level)
-			self.apply_sound_settings()
-			self.state = 'playing'
-			self.notification.show("Game loaded successfully!")
+			self.start_loading(self.build_level(game_data))
 			return True
 		self.notification.show("Failed to load game!")
 		return False
 	
+	def build_level(self, game_data = None):
+		"""Steps that build a new level and apply game_data to it, yields the progress"""
+		# timers of the previous level must not fire into the new one,
+		# and its particles go back to the pool
+		scheduler.clear()
+		particles.clear()
+		level = Level(self.capture_day_snapshot, self.map_path, build = False, assets = self.assets, backend = self.backend)
+		for progress in level.build():
+			yield progress * 0.9
+		
+		if game_data:
+			self.game_state.apply_loaded_data(game_data, level.player, level)
+			yield 0.95
+			
+			# chunks around the loaded player position
+			for _ in level.stream_steps():
+				yield 0.95
+		
+		self.level = level
+		self.preloader.stop()
+		self.apply_sound_settings()
+		self.state = 'playing'
+		scheduler.resume()
+		self.snapshots.clear()
+		self.capture_day_snapshot()
+		if game_data:
+			self.notification.show("Game loaded successfully!")
+		yield 1
+	
+	def start_loading(self, steps):
+		"""Show the loading screen while steps run, or run them at once"""
+		self.state = 'loading'
+		self.loading_screen.start(steps)
+		if not self.progressive_loading:
+			self.loading_screen.finish()
+	
 	def save_game(self):
 		"""Save current game"""
 		if self.level:
@@ -67,15 +135,46 @@ class Game:
 			return success
 		return False
 	
+	def capture_day_snapshot(self):
+		"""Keep the state at the start of every day for rewinding"""
+		self.snapshots.capture(self.level.player, self.level, 'day')
+	
+	def quick_save(self):
+		"""Take an in-memory snapshot without touching the save file"""
+		self.snapshots.capture(self.level.player, self.level)
+		self.notification.show("Quick saved!")
+	
+	def quick_load(self, label = 'manual'):
+		"""Restore the newest snapshot with the given label"""
+		snapshot = self.snapshots.latest(label)
+		if snapshot is None:
+			self.notification.show("No snapshot to restore!")
+			return False
+		if self.snapshots.restore(snapshot, self.level.player, self.level) is None:
+			self.notification.show("Failed to restore snapshot!")
+			return False
+		self.notification.show("Rewound to start of day!" if label == 'day' else "Quick loaded!")
+		return True
+	
+	def handle_snapshot_keys(self):
+		"""Quick-save (F6), quick-load (F9) and rewind the day (F7)"""
+		if controls.pressed('game', 'quick save'):
+			self.quick_save()
+		elif controls.pressed('game', 'quick load'):
+			self.quick_load()
+		elif controls.pressed('game', 'rewind'):
+			self.quick_load('day')
+	
 	def apply_sound_settings(self):
 		"""Apply sound settings to the game"""
-		if self.level and hasattr(self.level, 'music'):
-			self.level.music.set_volume(self.music_volume)
-		if self.level and hasattr(self.level, 'success'):
-			self.level.success.set_volume(self.sound_volume)
+		audio.set_volume(self.music_volume, self.sound_volume)
 	
 	def handle_main_menu(self):
 		"""Handle main menu logic"""
+		# after the first level everything is already in self.assets
+		if not self.level:
+			self.preloader.start(self.map_path)
+			self.preloader.poll()
 		action = self.main_menu.update()
 		
 		if action == 'New Game':
@@ -94,12 +193,12 @@ class Game:
 			self.main_menu.selected_action = None
 		
 		elif action == 'Quit':
-			pygame.quit()
-			sys.exit()
+			self.quit()
 	
 	def handle_settings_menu(self):
 		"""Handle settings menu logic"""
-		music_vol, sound_vol = self.settings_menu.update()
+		background = self.frozen_frame if self.state == 'settings_from_pause' else None
+		music_vol, sound_vol = self.settings_menu.update(background)
 		self.music_volume = music_vol
 		self.sound_volume = sound_vol
 		
@@ -115,54 +214,45 @@ class Game:
 	
 	def handle_playing(self, dt):
 		"""Handle gameplay logic"""
-		self.esc_timer += dt
-		keys = pygame.key.get_pressed()
-		
-		# Check ESC key with proper debouncing
-		if keys[pygame.K_ESCAPE]:
-			if not self.esc_pressed and self.esc_timer > self.input_cooldown:
-				if not self.level.shop_active:
-					self.state = 'paused'
-					self.pause_menu.active = True
-					self.pause_menu.esc_was_pressed = True  # Prevent immediate close
-					self.esc_pressed = True
-					self.esc_timer = 0
-					return
-		else:
-			self.esc_pressed = False
+		# ESC closes the shop instead while it is open
+		if controls.pressed('game', 'pause') and not self.level.shop_active:
+			self.state = 'paused'
+			scheduler.pause()
+			self.freeze_frame()
+			self.pause_menu.active = True
+			return
 		
 		# Save game with F5
-		if keys[pygame.K_F5]:
+		if controls.pressed('game', 'save'):
 			self.save_game()
 		
+		# F2 zooms the camera in and out
+		if controls.pressed('game', 'zoom'):
+			render_target.next_zoom(self.level.all_sprites.drawables())
+		
 		self.level.run(dt)
 		self.notification.update(dt)
 	
+	def freeze_frame(self):
+		"""Draw the level once more and keep it, dimmed, for the menus shown
+		while paused. Notifications and the profiler are drawn over it later"""
+		self.level.draw()
+		self.frozen_frame = self.backend.screenshot()
+		self.frozen_frame.blit(self.dim, (0, 0))
+	
 	def handle_paused(self, dt):
 		"""Handle pause menu logic"""
-		self.esc_timer += dt
-		
-		# Draw the game underneath
-		self.level.display_surface.fill('black')
-		self.level.all_sprites.custom_draw(self.level.player)
-		self.level.overlay.display()
-		
-		# Draw pause menu on top
-		action = self.pause_menu.update()
+		# Draw pause menu over the frozen game
+		action = self.pause_menu.update(self.frozen_frame)
 		
 		# Update and show notifications
 		self.notification.update(dt)
 		
-		# Reset ESC press state when key is released
-		keys = pygame.key.get_pressed()
-		if not keys[pygame.K_ESCAPE]:
-			self.esc_pressed = False
-		
 		if action == 'Resume':
 			self.state = 'playing'
+			scheduler.resume()
 			self.pause_menu.active = False
-			self.esc_timer = 0
-			self.esc_pressed = True  # Prevent immediate re-pause
+			self.frozen_frame = None
 		
 		elif action == 'Save Game':
 			self.save_game()
@@ -176,31 +266,163 @@ class Game:
 			self.save_game()
 			self.state = 'main_menu'
 			self.pause_menu.active = False
-			self.esc_pressed = False
+			self.frozen_frame = None
 
-	def run(self):
-		while True:
-			for event in pygame.event.get():
-				if event.type == pygame.QUIT:
+	def state_digest(self):
+		"""Fingerprint of the current world, equal for identical runs"""
+		return state_digest(self.game_state, self.level.player, self.level)
+	
+	def quit(self, status = 0):
+		"""Write any pending trace and close the game"""
+		self.preloader.stop()
+		if tracer.enabled:
+			tracer.save()
+		if frame_input.mode == 'record' and self.level:
+			frame_input.save_recording(self.state_digest())
+		pygame.quit()
+		sys.exit(status)
+	
+	def run(self, max_frames = None):
+		frame = 0
+		while max_frames is None or frame < max_frames:
+			frame += 1
+			profiler.begin('frame')
+			events = pygame.event.get()
+			for event in events:
+				# a renderer window closing does not quit SDL by itself
+				if event.type in (pygame.QUIT, pygame.WINDOWCLOSE):
 					# Auto-save on quit
 					if self.state == 'playing':
 						self.save_game()
-					pygame.quit()
-					sys.exit()
+					self.quit()
+				elif event.type == pygame.WINDOWEXPOSED:
+					dirty_rects.full()
+			
+			# another state draws another screen
+			if self.state != self.last_state:
+				dirty_rects.full()
+				self.last_state = self.state
+			# the menus draw on the display surface, the level through the back-end
+			self.backend.begin_frame(canvas = self.state != 'playing')
   
-			dt = self.clock.tick() / 1000
+			# key state and dt come from the recording when replaying, which never waits
+			idle = self.frozen_frame is not None and frame_input.mode != 'replay'
+			dt = frame_input.next_frame(self.clock.tick(IDLE_FPS if idle else 0) / 1000, events)
+			controls.next_frame(dt, frame_input.keydowns, frame_input.held)
+			
+			# fires the gameplay timers that came due, nothing while paused
+			scheduler.advance(dt)
+			
+			if self.state == 'playing' and not self.level.shop_active:
+				self.handle_snapshot_keys()
+			
+			# frame profiler overlay
+			if controls.pressed('game', 'profiler'):
+				profiler.toggle()
 			
 			if self.state == 'main_menu':
+				profiler.begin('main menu')
 				self.handle_main_menu()
+				profiler.end('main menu')
+			elif self.state == 'loading':
+				profiler.begin('loading')
+				self.loading_screen.update()
+				profiler.end('loading')
 			elif self.state == 'settings' or self.state == 'settings_from_pause':
+				profiler.begin('settings')
 				self.handle_settings_menu()
+				profiler.end('settings')
 			elif self.state == 'playing':
 				self.handle_playing(dt)
 			elif self.state == 'paused':
+				profiler.begin('pause menu')
 				self.handle_paused(dt)
+				profiler.end('pause menu')
 			
-			pygame.display.update()
+			profiler.display(self.backend)
+			profiler.begin('display update')
+			self.backend.present()
+			profiler.end('display update')
+			profiler.end('frame')
+
+def parse_args():
+	parser = argparse.ArgumentParser(description = 'Meow Valley')
+	parser.add_argument('--trace', metavar = 'FILE',
+		help = 'record spans and write them to FILE in Chrome trace format on exit')
+	parser.add_argument('--profile-frames', metavar = 'N', type = int,
+		help = 'run cProfile for N frames, print the hottest functions and exit')
+	parser.add_argument('--profile-output', metavar = 'FILE',
+		help = 'also dump the raw cProfile stats to FILE')
+	parser.add_argument('--new-game', action = 'store_true',
+		help = 'skip the main menu and start a new game')
+	parser.add_argument('--record', metavar = 'FILE',
+		help = 'start a new game and record its input to FILE on exit')
+	parser.add_argument('--seed', type = int,
+		help = 'random seed for --record (default: pick one)')
+	parser.add_argument('--fixed-dt', metavar = 'SECONDS', type = float,
+		help = 'use a constant frame time while recording')
+	parser.add_argument('--replay', metavar = 'FILE',
+		help = 'replay a recording and print the end state digest')
+	parser.add_argument('--headless', action = 'store_true',
+		help = 'use the SDL dummy video and audio drivers')
+	parser.add_argument('--dirty-rects', action = 'store_true',
+		help = 'present only the changed parts of the screen, see DIRTY_RECTS in settings.py')
+	parser.add_argument('--render-scale', metavar = 'N', type = int,
+		help = 'draw the world N times smaller and scale it up, see RENDER_SCALE in settings.py')
+	parser.add_argument('--backend', choices = sorted(BACKENDS), default = DRAW_BACKEND,
+		help = 'draw with software blits or an SDL renderer, see draw_backend.py')
+	parser.add_argument('--map', metavar = 'FILE',
+		help = 'play on another TMX map, e.g. one made by worldgen.py')
+	return parser.parse_args()
 
 if __name__ == '__main__':
-	game = Game()
-	game.run()
\ No newline at end of file
+	args = parse_args()
+	if args.trace:
+		tracer.start(args.trace)
+	if args.headless:
+		os.environ['SDL_VIDEODRIVER'] = 'dummy'
+		os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+	game = Game(args.backend)
+	if args.dirty_rects:
+		dirty_rects.enabled = True
+	if args.render_scale:
+		render_target.scale = args.render_scale
+	if args.map:
+		game.map_path = args.map
+
+	if args.replay:
+		try:
+			frames = frame_input.load_replay(args.replay)
+		except ValueError as e:
+			print(e)
+			game.quit(1)
+		rng.seed(frame_input.seed)
+		game.progressive_loading = False
+		game.start_new_game()
+		game.run(frames)
+		digest = game.state_digest()
+		print(f'Replayed {frames} frames, end state {digest}')
+		matches = frame_input.expected_digest in (None, digest)
+		if frame_input.expected_digest:
+			print('Matches recording' if matches else 'DIFFERS from recording')
+		game.quit(0 if matches else 1)
+
+	if args.record:
+		seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+		frame_input.start_recording(args.record, seed, args.fixed_dt)
+		rng.seed(seed)
+		game.progressive_loading = False
+		game.start_new_game()
+	elif args.new_game:
+		game.start_new_game()
+
+	if args.profile_frames:
+		profile = cProfile.Profile()
+		profile.runcall(game.run, args.profile_frames)
+		if args.profile_output:
+			profile.dump_stats(args.profile_output)
+		pstats.Stats(profile).sort_stats('cumulative').print_stats(30)
+		game.quit()
+	else:
+		game.run()
\ No newline at end of file
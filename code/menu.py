@@ -1,16 +1,23 @@
 import pygame
+from time import perf_counter
 from settings import *
-from timer import Timer
 from support import load_font
+from controls import controls
+from text import text_cache
+from dirty_rects import dirty_rects, SCREEN_RECT
 
 class Menu:
-	def __init__(self, player, toggle_menu):
+	def __init__(self, player, toggle_menu, assets, backend):
 
 		# general setup
 		self.player = player
 		self.toggle_menu = toggle_menu
-		self.display_surface = pygame.display.get_surface()
-		self.font = load_font('../font/LycheeSoda.ttf', 30)
+		self.backend = backend
+		self.font = assets.font('../font/LycheeSoda.ttf', 30)
+
+		# the money label, composed again when the amount changes
+		self.money = None
+		self.money_surf = None
 
 		# options
 		self.width = 400
@@ -24,14 +31,19 @@ class Menu:
 
 		# movement
 		self.index = 0
-		self.timer = Timer(200)
 
 	def display_money(self):
-		text_surf = self.font.render(f'${self.player.money}', False, 'Black')
+		text_surf = text_cache.render(self.font, f'${self.player.money}', 'Black')
 		text_rect = text_surf.get_rect(midbottom = (SCREEN_WIDTH / 2,SCREEN_HEIGHT - 20))
+		bg_rect = text_rect.inflate(10,10)
 
-		pygame.draw.rect(self.display_surface,'White',text_rect.inflate(10,10),0,4)
-		self.display_surface.blit(text_surf,text_rect)
+		if self.player.money != self.money:
+			self.money = self.player.money
+			self.money_surf = pygame.Surface(bg_rect.size, pygame.SRCALPHA)
+			pygame.draw.rect(self.money_surf,'White',self.money_surf.get_rect(),0,4)
+			self.money_surf.blit(text_surf,(text_rect.x - bg_rect.x, text_rect.y - bg_rect.y))
+		self.backend.blit(self.money_surf,bg_rect)
+		dirty_rects.mark('money', self.money_surf, bg_rect)
 
 	def setup(self):
 
@@ -48,44 +60,44 @@ class Menu:
 		self.menu_top = SCREEN_HEIGHT / 2 - self.total_height / 2
 		self.main_rect = pygame.Rect(SCREEN_WIDTH / 2 - self.width / 2,self.menu_top,self.width,self.total_height)
 
+		# the entries are drawn onto the canvas once and again only when the selection
+		# or an amount changes, then copied to a run-length encoded panel that blits fast
+		self.canvas = pygame.Surface(self.main_rect.size).convert()
+		self.panel = None
+		self.panel_state = None
+
 		# buy / sell text surface
 		self.buy_text = self.font.render('buy',False,'Black')
 		self.sell_text =  self.font.render('sell',False,'Black')
 
 	def input(self):
-		keys = pygame.key.get_pressed()
-		self.timer.update()
-
-		if keys[pygame.K_ESCAPE]:
+		if controls.pressed('shop', 'back'):
 			self.toggle_menu()
 
-		if not self.timer.active:
-			if keys[pygame.K_UP]:
-				self.index -= 1
-				self.timer.activate()
+		if controls.pressed('shop', 'up', repeat = True):
+			self.index -= 1
 
-			if keys[pygame.K_DOWN]:
-				self.index += 1
-				self.timer.activate()
+		if controls.pressed('shop', 'down', repeat = True):
+			self.index += 1
 
-			if keys[pygame.K_SPACE]:
-				self.timer.activate()
+		# held down it keeps buying or selling
+		if controls.pressed('shop', 'select', repeat = True):
 
-				# get item
-				current_item = self.options[self.index]
+			# get item
+			current_item = self.options[self.index]
 
-				# sell
-				if self.index <= self.sell_border:
-					if self.player.item_inventory[current_item] > 0:
-						self.player.item_inventory[current_item] -= 1
-						self.player.money += SALE_PRICES[current_item]
+			# sell
+			if self.index <= self.sell_border:
+				if self.player.item_inventory[current_item] > 0:
+					self.player.item_inventory[current_item] -= 1
+					self.player.money += SALE_PRICES[current_item]
 
-				# buy
-				else:
-					seed_price = PURCHASE_PRICES[current_item]
-					if self.player.money >= seed_price:
-						self.player.seed_inventory[current_item] += 1
-						self.player.money -= PURCHASE_PRICES[current_item]
+			# buy
+			else:
+				seed_price = PURCHASE_PRICES[current_item]
+				if self.player.money >= seed_price:
+					self.player.seed_inventory[current_item] += 1
+					self.player.money -= PURCHASE_PRICES[current_item]
 
 		# clamo the values
 		if self.index < 0:
@@ -94,39 +106,51 @@ class Menu:
 			self.index = 0
 
 	def show_entry(self, text_surf, amount, top, selected):
+		"""Draw one entry onto the canvas, top is relative to the panel"""
 
 		# background
-		bg_rect = pygame.Rect(self.main_rect.left,top,self.width,text_surf.get_height() + (self.padding * 2))
-		pygame.draw.rect(self.display_surface, 'White',bg_rect, 0, 4)
+		bg_rect = pygame.Rect(0,top,self.width,text_surf.get_height() + (self.padding * 2))
+		pygame.draw.rect(self.canvas, 'White',bg_rect, 0, 4)
 
 		# text
-		text_rect = text_surf.get_rect(midleft = (self.main_rect.left + 20,bg_rect.centery))
-		self.display_surface.blit(text_surf, text_rect)
+		text_rect = text_surf.get_rect(midleft = (20,bg_rect.centery))
+		self.canvas.blit(text_surf, text_rect)
 
 		# amount
-		amount_surf = self.font.render(str(amount), False, 'Black')
-		amount_rect = amount_surf.get_rect(midright = (self.main_rect.right - 20,bg_rect.centery))
-		self.display_surface.blit(amount_surf, amount_rect)
+		amount_surf = text_cache.render(self.font, str(amount), 'Black')
+		amount_rect = amount_surf.get_rect(midright = (self.width - 20,bg_rect.centery))
+		self.canvas.blit(amount_surf, amount_rect)
 
 		# selected
 		if selected:
-			pygame.draw.rect(self.display_surface,'black',bg_rect,4,4)
+			pygame.draw.rect(self.canvas,'black',bg_rect,4,4)
 			if self.index <= self.sell_border: # sell
-				pos_rect = self.sell_text.get_rect(midleft = (self.main_rect.left + 150,bg_rect.centery))
-				self.display_surface.blit(self.sell_text,pos_rect)
+				pos_rect = self.sell_text.get_rect(midleft = (150,bg_rect.centery))
+				self.canvas.blit(self.sell_text,pos_rect)
 			else: # buy
-				pos_rect = self.buy_text.get_rect(midleft = (self.main_rect.left + 150,bg_rect.centery))
-				self.display_surface.blit(self.buy_text,pos_rect)
+				pos_rect = self.buy_text.get_rect(midleft = (150,bg_rect.centery))
+				self.canvas.blit(self.buy_text,pos_rect)
+
+	def compose(self, amounts):
+		# KEY_COLOR is never drawn by the shop, it marks the corners of its panel
+		self.canvas.fill(KEY_COLOR)
+		for text_index, text_surf in enumerate(self.text_surfs):
+			top = text_index * (text_surf.get_height() + (self.padding * 2) + self.space)
+			self.show_entry(text_surf, amounts[text_index], top, self.index == text_index)
+		self.panel = self.canvas.copy()
+		self.panel.set_colorkey(KEY_COLOR, pygame.RLEACCEL)
 
 	def update(self):
 		self.input()
 		self.display_money()
 
-		for text_index, text_surf in enumerate(self.text_surfs):
-			top = self.main_rect.top + text_index * (text_surf.get_height() + (self.padding * 2) + self.space)
-			amount_list = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
-			amount = amount_list[text_index]
-			self.show_entry(text_surf, amount, top, self.index == text_index)
+		amounts = list(self.player.item_inventory.values()) + list(self.player.seed_inventory.values())
+		state = (self.index, amounts)
+		if state != self.panel_state:
+			self.compose(amounts)
+			self.panel_state = state
+		self.backend.blit(self.panel, self.main_rect)
+		dirty_rects.mark('shop', self.panel, self.main_rect)
 
 class MainMenu:
 	def __init__(self):
@@ -138,7 +162,6 @@ class MainMenu:
 		# menu options
 		self.options = ['New Game', 'Load Game', 'Settings', 'Quit']
 		self.index = 0
-		self.timer = Timer(200)
 		
 		# states
 		self.active = True
@@ -150,25 +173,17 @@ class MainMenu:
 		self.music_volume = 0.5
 		
 	def input(self):
-		keys = pygame.key.get_pressed()
-		self.timer.update()
+		if controls.pressed('menu', 'up', repeat = True):
+			self.index = (self.index - 1) % len(self.options)
 		
-		if not self.timer.active:
-			if keys[pygame.K_UP]:
-				self.index = (self.index - 1) % len(self.options)
-				self.timer.activate()
-			
-			if keys[pygame.K_DOWN]:
-				self.index = (self.index + 1) % len(self.options)
-				self.timer.activate()
+		if controls.pressed('menu', 'down', repeat = True):
+			self.index = (self.index + 1) % len(self.options)
+		
+		if controls.pressed('menu', 'select'):
+			self.selected_action = self.options[self.index]
 			
-			if keys[pygame.K_RETURN] or keys[pygame.K_SPACE]:
-				self.timer.activate()
-				self.selected_action = self.options[self.index]
-				
-			if keys[pygame.K_ESCAPE] and self.in_settings:
-				self.in_settings = False
-				self.timer.activate()
+		if controls.pressed('menu', 'back') and self.in_settings:
+			self.in_settings = False
 	
 	def draw_title(self):
 		title = self.font_large.render('Meow Valley', False, 'White')
@@ -196,6 +211,7 @@ class MainMenu:
 			self.display_surface.fill('black')
 			self.draw_title()
 			self.draw_menu_options()
+			dirty_rects.mark('main menu', self.index, SCREEN_RECT)
 		
 		return self.selected_action
 
@@ -212,47 +228,36 @@ class SettingsMenu:
 		# menu
 		self.options = ['Music Volume', 'Sound Volume', 'Back']
 		self.index = 0
-		self.timer = Timer(200)
 		self.active = False
 	
 	def input(self):
-		keys = pygame.key.get_pressed()
-		self.timer.update()
+		if controls.pressed('menu', 'up', repeat = True):
+			self.index = (self.index - 1) % len(self.options)
 		
-		if not self.timer.active:
-			if keys[pygame.K_UP]:
-				self.index = (self.index - 1) % len(self.options)
-				self.timer.activate()
-			
-			if keys[pygame.K_DOWN]:
-				self.index = (self.index + 1) % len(self.options)
-				self.timer.activate()
-			
-			# Adjust volumes
-			if self.index == 0:  # Music Volume
-				if keys[pygame.K_LEFT] and self.music_volume > 0:
-					self.music_volume -= 5
-					self.timer.activate()
-				if keys[pygame.K_RIGHT] and self.music_volume < 100:
-					self.music_volume += 5
-					self.timer.activate()
-			
-			elif self.index == 1:  # Sound Volume
-				if keys[pygame.K_LEFT] and self.sound_volume > 0:
-					self.sound_volume -= 5
-					self.timer.activate()
-				if keys[pygame.K_RIGHT] and self.sound_volume < 100:
-					self.sound_volume += 5
-					self.timer.activate()
-			
-			if keys[pygame.K_RETURN] or keys[pygame.K_SPACE]:
-				if self.index == 2:  # Back
-					self.active = False
-					self.timer.activate()
-			
-			if keys[pygame.K_ESCAPE]:
+		if controls.pressed('menu', 'down', repeat = True):
+			self.index = (self.index + 1) % len(self.options)
+		
+		# Adjust volumes
+		left = controls.pressed('menu', 'left', repeat = True)
+		right = controls.pressed('menu', 'right', repeat = True)
+		if self.index == 0:  # Music Volume
+			if left and self.music_volume > 0:
+				self.music_volume -= 5
+			if right and self.music_volume < 100:
+				self.music_volume += 5
+		
+		elif self.index == 1:  # Sound Volume
+			if left and self.sound_volume > 0:
+				self.sound_volume -= 5
+			if right and self.sound_volume < 100:
+				self.sound_volume += 5
+		
+		if controls.pressed('menu', 'select'):
+			if self.index == 2:  # Back
 				self.active = False
-				self.timer.activate()
+		
+		if controls.pressed('menu', 'back'):
+			self.active = False
 	
 	def draw_volume_bar(self, y_pos, volume):
 		bar_width = 200
@@ -276,9 +281,13 @@ class SettingsMenu:
 		vol_rect = vol_text.get_rect(midleft=(bar_x + bar_width + 20, y_pos))
 		self.display_surface.blit(vol_text, vol_rect)
 	
-	def update(self):
+	def update(self, background = None):
+		"""Draw the menu over background, or over black without one"""
 		self.input()
-		self.display_surface.fill('black')
+		if background is not None:
+			self.display_surface.blit(background, (0, 0))
+		else:
+			self.display_surface.fill('black')
 		
 		# Title
 		title = self.font.render('Settings', False, 'White')
@@ -311,6 +320,7 @@ class SettingsMenu:
 				hint_rect = hint.get_rect(center=(SCREEN_WIDTH / 2, start_y + i * 60 + 30))
 				self.display_surface.blit(hint, hint_rect)
 		
+		dirty_rects.mark('settings', (self.index, self.music_volume, self.sound_volume, background), SCREEN_RECT)
 		return self.music_volume / 100, self.sound_volume / 100
 
 class PauseMenu:
@@ -318,54 +328,34 @@ class PauseMenu:
 		self.display_surface = pygame.display.get_surface()
 		self.font_large = load_font('../font/LycheeSoda.ttf', 50)
 		self.font = load_font('../font/LycheeSoda.ttf', 30)
+		self.font_hint = pygame.font.Font(None, 24)
 		
 		# menu options
 		self.options = ['Resume', 'Save Game', 'Settings', 'Main Menu']
 		self.index = 0
-		self.timer = Timer(150)  # Reduced timer for better responsiveness
 		self.active = False
 		self.selected_action = None
-		
-		# Track ESC key state
-		self.esc_was_pressed = True  # Start as True to prevent immediate close
 	
 	def input(self):
-		keys = pygame.key.get_pressed()
-		self.timer.update()
+		if controls.pressed('menu', 'up', repeat = True):
+			self.index = (self.index - 1) % len(self.options)
 		
-		if not self.timer.active:
-			if keys[pygame.K_UP]:
-				self.index = (self.index - 1) % len(self.options)
-				self.timer.activate()
-			
-			if keys[pygame.K_DOWN]:
-				self.index = (self.index + 1) % len(self.options)
-				self.timer.activate()
-			
-			if keys[pygame.K_RETURN] or keys[pygame.K_SPACE]:
-				self.timer.activate()
-				self.selected_action = self.options[self.index]
-			
-			# Only trigger ESC if it was released and pressed again
-			if keys[pygame.K_ESCAPE]:
-				if not self.esc_was_pressed:
-					self.selected_action = 'Resume'
-					self.timer.activate()
-					self.esc_was_pressed = True
-			else:
-				self.esc_was_pressed = False
+		if controls.pressed('menu', 'down', repeat = True):
+			self.index = (self.index + 1) % len(self.options)
+		
+		if controls.pressed('menu', 'select'):
+			self.selected_action = self.options[self.index]
+		
+		if controls.pressed('menu', 'back'):
+			self.selected_action = 'Resume'
 	
-	def update(self):
+	def update(self, background):
+		"""Draw the menu over background, the dimmed frame the game was paused on"""
 		self.input()
-		
-		# Semi-transparent overlay
-		overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
-		overlay.set_alpha(128)
-		overlay.fill('black')
-		self.display_surface.blit(overlay, (0, 0))
+		self.display_surface.blit(background, (0, 0))
 		
 		# Title
-		title = self.font_large.render('Paused', False, 'White')
+		title = text_cache.render(self.font_large, 'Paused', 'White')
 		title_rect = title.get_rect(center=(SCREEN_WIDTH / 2, 150))
 		self.display_surface.blit(title, title_rect)
 		
@@ -374,7 +364,7 @@ class PauseMenu:
 		
 		for i, option in enumerate(self.options):
 			color = 'Yellow' if i == self.index else 'White'
-			text = self.font.render(option, False, color)
+			text = text_cache.render(self.font, option, color)
 			text_rect = text.get_rect(center=(SCREEN_WIDTH / 2, start_y + i * 50))
 			
 			# Draw selection indicator
@@ -385,9 +375,10 @@ class PauseMenu:
 			self.display_surface.blit(text, text_rect)
 		
 		# Instructions
-		hint = pygame.font.Font(None, 24).render('Press ESC to resume', False, 'Gray')
+		hint = text_cache.render(self.font_hint, 'Press ESC to resume', 'Gray')
 		hint_rect = hint.get_rect(center=(SCREEN_WIDTH / 2, SCREEN_HEIGHT - 30))
 		self.display_surface.blit(hint, hint_rect)
+		dirty_rects.mark('pause', (self.index, background), SCREEN_RECT)
 		
 		action = self.selected_action
 		self.selected_action = None
@@ -395,39 +386,92 @@ class PauseMenu:
 
 class Notification:
 	"""Shows temporary notifications to the player"""
-	def __init__(self):
-		self.display_surface = pygame.display.get_surface()
+	def __init__(self, backend):
+		self.backend = backend
 		self.font = load_font('../font/LycheeSoda.ttf', 25)
-		self.messages = []  # List of (message, time_remaining)
+		self.messages = []  # List of (message, time_remaining, surface)
 		self.message_duration = 2.0  # seconds
 	
 	def show(self, message):
 		"""Add a new notification message"""
-		self.messages.append([message, self.message_duration])
+		self.messages.append([message, self.message_duration, self.compose(message)])
+	
+	def compose(self, message):
+		"""The message on its half transparent background, faded as a whole later"""
+		text_surf = text_cache.render(self.font, message, 'White')
+		surf = pygame.Surface(text_surf.get_rect().inflate(20, 10).size, pygame.SRCALPHA)
+		surf.fill((0, 0, 0, 128))
+		surf.blit(text_surf, text_surf.get_rect(center = surf.get_rect().center))
+		return surf
 	
 	def update(self, dt):
 		"""Update and display notifications"""
 		# Update timers
-		self.messages = [[msg, time - dt] for msg, time in self.messages if time > 0]
+		self.messages = [[msg, time - dt, surf] for msg, time, surf in self.messages if time > 0]
 		
 		# Display messages
 		y_offset = 50
-		for message, time_remaining in self.messages:
+		for message, time_remaining, surf in self.messages:
 			# Fade out effect
 			alpha = min(255, int(255 * (time_remaining / self.message_duration)))
-			
-			text_surf = self.font.render(message, False, 'White')
-			text_surf.set_alpha(alpha)
-			text_rect = text_surf.get_rect(center=(SCREEN_WIDTH / 2, y_offset))
-			
-			# Background
-			bg_rect = text_rect.inflate(20, 10)
-			bg_surf = pygame.Surface(bg_rect.size)
-			bg_surf.set_alpha(alpha // 2)
-			bg_surf.fill('black')
-			
-			self.display_surface.blit(bg_surf, bg_rect)
-			self.display_surface.blit(text_surf, text_rect)
+			surf.set_alpha(alpha)
+			rect = surf.get_rect(center=(SCREEN_WIDTH / 2, y_offset))
+			self.backend.blit(surf, rect)
+			dirty_rects.mark(surf, alpha, rect)
 			
 			y_offset += 40
 
+class LoadingScreen:
+	"""Runs construction steps within a time budget per frame and shows their progress"""
+	def __init__(self):
+		self.display_surface = pygame.display.get_surface()
+		self.font_large = load_font('../font/LycheeSoda.ttf', 50)
+		self.font = load_font('../font/LycheeSoda.ttf', 30)
+		self.steps = None
+		self.progress = 0
+	
+	def start(self, steps):
+		"""Begin running steps, a generator that yields its progress from 0 to 1"""
+		self.steps = steps
+		self.progress = 0
+	
+	def run_steps(self, budget):
+		"""Advance the steps for about budget seconds, returns True once all are done"""
+		deadline = perf_counter() + budget
+		for progress in self.steps:
+			self.progress = progress
+			if perf_counter() >= deadline:
+				return False
+		self.steps = None
+		self.progress = 1
+		return True
+	
+	def finish(self):
+		"""Run all remaining steps at once"""
+		self.run_steps(float('inf'))
+	
+	def draw(self):
+		self.display_surface.fill('black')
+		title = self.font_large.render('Meow Valley', False, 'White')
+		self.display_surface.blit(title, title.get_rect(center=(SCREEN_WIDTH / 2, 100)))
+		
+		# progress bar
+		bar_width = 400
+		bar_height = 24
+		bg_rect = pygame.Rect(0, 0, bar_width, bar_height)
+		bg_rect.center = (SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2)
+		pygame.draw.rect(self.display_surface, 'Gray', bg_rect, 0, 3)
+		fill_rect = pygame.Rect(bg_rect.left, bg_rect.top, bar_width * self.progress, bar_height)
+		pygame.draw.rect(self.display_surface, 'Green', fill_rect, 0, 3)
+		pygame.draw.rect(self.display_surface, 'White', bg_rect, 2, 3)
+		
+		text = self.font.render(f'Loading... {int(self.progress * 100)}%', False, 'White')
+		self.display_surface.blit(text, text.get_rect(midtop=(SCREEN_WIDTH / 2, bg_rect.bottom + 20)))
+		dirty_rects.mark('loading', fill_rect.width, SCREEN_RECT)
+	
+	def update(self, budget = LOADING_BUDGET):
+		"""Run one frame worth of steps and draw the screen, returns True when done"""
+		done = self.run_steps(budget)
+		self.draw()
+		return done
+
@@ -1,27 +1,28 @@
-import pygame
 from settings import *
-from support import load_image
+from dirty_rects import dirty_rects
 
 class Overlay:
-	def __init__(self,player):
+	def __init__(self,player,assets,backend):
 
 		# general setup
-		self.display_surface = pygame.display.get_surface()
+		self.backend = backend
 		self.player = player
 
 		# imports 
 		overlay_path = '../graphics/overlay/'
-		self.tools_surf = {tool: load_image(f'{overlay_path}{tool}.png', convert_alpha=True) for tool in player.tools}
-		self.seeds_surf = {seed: load_image(f'{overlay_path}{seed}.png', convert_alpha=True) for seed in player.seeds}
+		self.tools_surf = {tool: assets.image(f'{overlay_path}{tool}.png', convert_alpha=True) for tool in player.tools}
+		self.seeds_surf = {seed: assets.image(f'{overlay_path}{seed}.png', convert_alpha=True) for seed in player.seeds}
 
 	def display(self):
 
 		# tool
 		tool_surf = self.tools_surf[self.player.selected_tool]
 		tool_rect = tool_surf.get_rect(midbottom = OVERLAY_POSITIONS['tool'])
-		self.display_surface.blit(tool_surf,tool_rect)
+		self.backend.blit(tool_surf,tool_rect)
+		dirty_rects.mark('tool', tool_surf, tool_rect)
 
 		# seeds
 		seed_surf = self.seeds_surf[self.player.selected_seed]
 		seed_rect = seed_surf.get_rect(midbottom = OVERLAY_POSITIONS['seed'])
-		self.display_surface.blit(seed_surf,seed_rect)
\ No newline at end of file
+		self.backend.blit(seed_surf,seed_rect)
+		dirty_rects.mark('seed', seed_surf, seed_rect)
\ No newline at end of file
@@ -2,12 +2,13 @@ import pygame
 from settings import *
 from support import *
 from timer import Timer
+from controls import controls
 
 class Player(pygame.sprite.Sprite):
-	def __init__(self, pos, group, collision_sprites, tree_sprites, interaction, soil_layer, toggle_shop):
+	def __init__(self, pos, group, collision_sprites, tree_sprites, interaction, soil_layer, toggle_shop, assets):
 		super().__init__(group)
 
-		self.import_assets()
+		self.import_assets(assets)
 		self.status = 'down_idle'
 		self.frame_index = 0
 
@@ -28,9 +29,7 @@ class Player(pygame.sprite.Sprite):
 		# timers 
 		self.timers = {
 			'tool use': Timer(350,self.use_tool),
-			'tool switch': Timer(200),
 			'seed use': Timer(350,self.use_seed),
-			'seed switch': Timer(200),
 		}
 
 		# tools 
@@ -64,7 +63,7 @@ class Player(pygame.sprite.Sprite):
 		self.toggle_shop = toggle_shop
 
 		# sound
-		self.watering = load_sound('../audio/water.mp3')
+		self.watering = assets.sound('../audio/water.mp3')
 		self.watering.set_volume(0.2)
 
 	def use_tool(self):
@@ -89,16 +88,17 @@ class Player(pygame.sprite.Sprite):
 			self.soil_layer.plant_seed(self.target_pos, self.selected_seed)
 			self.seed_inventory[self.selected_seed] -= 1
 
-	def import_assets(self):
+	def import_assets(self, assets):
 		self.animations = {'up': [],'down': [],'left': [],'right': [],
 						   'right_idle':[],'left_idle':[],'up_idle':[],'down_idle':[],
 						   'right_hoe':[],'left_hoe':[],'up_hoe':[],'down_hoe':[],
 						   'right_axe':[],'left_axe':[],'up_axe':[],'down_axe':[],
 						   'right_water':[],'left_water':[],'up_water':[],'down_water':[]}
 
+		# all animations share one atlas
+		folders = assets.subfolders('../graphics/character/')
 		for animation in self.animations.keys():
-			full_path = '../graphics/character/' + animation
-			self.animations[animation] = import_folder(full_path)
+			self.animations[animation] = folders[animation]
 
 	def animate(self,dt):
 		self.frame_index += 4 * dt
@@ -108,55 +108,51 @@ class Player(pygame.sprite.Sprite):
 		self.image = self.animations[self.status][int(self.frame_index)]
 
 	def input(self):
-		keys = pygame.key.get_pressed()
-
 		if not self.timers['tool use'].active and not self.sleep:
 			# directions 
-			if keys[pygame.K_w]:
+			if controls.held('player', 'up'):
 				self.direction.y = -1
 				self.status = 'up'
-			elif keys[pygame.K_s]:
+			elif controls.held('player', 'down'):
 				self.direction.y = 1
 				self.status = 'down'
 			else:
 				self.direction.y = 0
 
-			if keys[pygame.K_d]:
+			if controls.held('player', 'right'):
 				self.direction.x = 1
 				self.status = 'right'
-			elif keys[pygame.K_a]:
+			elif controls.held('player', 'left'):
 				self.direction.x = -1
 				self.status = 'left'
 			else:
 				self.direction.x = 0
 
-			# tool use
-			if keys[pygame.K_SPACE]:
+			# tool use, again and again while held
+			if controls.pressed('player', 'use tool') or controls.held('player', 'use tool'):
 				self.timers['tool use'].activate()
 				self.direction = pygame.math.Vector2()
 				self.frame_index = 0
 
 			# change tool
-			if keys[pygame.K_q] and not self.timers['tool switch'].active:
-				self.timers['tool switch'].activate()
+			if controls.pressed('player', 'switch tool'):
 				self.tool_index += 1
 				self.tool_index = self.tool_index if self.tool_index < len(self.tools) else 0
 				self.selected_tool = self.tools[self.tool_index]
 
 			# seed use
-			if keys[pygame.K_LCTRL]:
+			if controls.pressed('player', 'use seed') or controls.held('player', 'use seed'):
 				self.timers['seed use'].activate()
 				self.direction = pygame.math.Vector2()
 				self.frame_index = 0
 
 			# change seed 
-			if keys[pygame.K_e] and not self.timers['seed switch'].active:
-				self.timers['seed switch'].activate()
+			if controls.pressed('player', 'switch seed'):
 				self.seed_index += 1
 				self.seed_index = self.seed_index if self.seed_index < len(self.seeds) else 0
 				self.selected_seed = self.seeds[self.seed_index]
 
-			if keys[pygame.K_RETURN]:
+			if controls.pressed('player', 'interact'):
 				collided_interaction_sprite = pygame.sprite.spritecollide(self,self.interaction,False)
 				if collided_interaction_sprite:
 					if collided_interaction_sprite[0].name == 'Trader':
@@ -175,10 +171,6 @@ class Player(pygame.sprite.Sprite):
 		if self.timers['tool use'].active:
 			self.status = self.status.split('_')[0] + '_' + self.selected_tool
 
-	def update_timers(self):
-		for timer in self.timers.values():
-			timer.update()
-
 	def collision(self, direction):
 		for sprite in self.collision_sprites.sprites():
 			if hasattr(sprite, 'hitbox'):
@@ -220,7 +212,6 @@ class Player(pygame.sprite.Sprite):
 	def update(self, dt):
 		self.input()
 		self.get_status()
-		self.update_timers()
 		self.get_target_pos()
 
 		self.move(dt)
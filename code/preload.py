@@ -0,0 +1,114 @@
+import pygame
+import support
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from settings import *
+from support import decode_image, convert_image, decode_folder, convert_folder, convert_folder_dict, decode_subfolders, convert_subfolders, decode_tmx_map, convert_tmx_map, resolve_path, read_image
+
+# everything a level loads, as (kind, path) with the path spelled like the caller does
+LEVEL_ASSETS = [
+	('folder', '../graphics/water'),
+	('folder', '../graphics/soil_water/'),
+	('folder', '../graphics/rain/drops/'),
+	('folder', '../graphics/rain/floor/'),
+	('folder', '../graphics/fruit/corn'),
+	('folder', '../graphics/fruit/tomato'),
+	('folder_dict', '../graphics/soil/'),
+	('image_alpha', '../graphics/world/ground.png'),
+	('image_alpha', '../graphics/stumps/small.png'),
+	('image_alpha', '../graphics/stumps/large.png'),
+	('image', '../graphics/fruit/apple.png'),
+	('image_alpha', '../graphics/overlay/hoe.png'),
+	('image_alpha', '../graphics/overlay/axe.png'),
+	('image_alpha', '../graphics/overlay/water.png'),
+	('image_alpha', '../graphics/overlay/corn.png'),
+	('image_alpha', '../graphics/overlay/tomato.png'),
+	('sound', '../audio/success.wav'),
+	('sound', '../audio/hoe.wav'),
+	('sound', '../audio/plant.wav'),
+	('sound', '../audio/axe.mp3'),
+	('sound', '../audio/water.mp3'),
+	('subfolders', '../graphics/character/')]
+
+def decode_plain_image(path):
+	return read_image(resolve_path(path))
+
+def decode_sound(path):
+	return pygame.mixer.Sound(str(resolve_path(path)))
+
+# kind -> (decode on a worker thread, finish on the main thread)
+LOADERS = {
+	'folder': (decode_folder, convert_folder),
+	'folder_dict': (decode_folder, convert_folder_dict),
+	'subfolders': (decode_subfolders, convert_subfolders),
+	'image': (decode_plain_image, lambda image: image),
+	'image_alpha': (decode_image, convert_image),
+	'sound': (decode_sound, lambda sound: sound),
+	'tmx': (decode_tmx_map, convert_tmx_map),
+}
+
+class Preloader:
+	"""Decodes the level assets on worker threads while the main menu is up.
+	Finished assets are converted on the main thread by poll() and handed out
+	once to the loaders in support.py. An asset that is asked for before it is
+	ready is waited for, one that failed is loaded again by the caller."""
+
+	def __init__(self, workers = 4):
+		self.workers = workers
+		self.executor = None
+
+		# (kind, path) -> future of the decoded asset
+		self.pending = {}
+
+		# (kind, path) -> asset ready to use
+		self.ready = {}
+
+	def start(self, map_path):
+		"""Queue the map and every level asset, does nothing if already running"""
+		if self.executor:
+			return
+		self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix = 'preload')
+		support.preloader = self
+
+		# the map first, it takes the longest
+		for kind, path in [('tmx', map_path)] + LEVEL_ASSETS:
+			decode = LOADERS[kind][0]
+			self.pending[(kind, path)] = self.executor.submit(decode, path)
+
+	def finish(self, key, future):
+		try:
+			return LOADERS[key[0]][1](future.result())
+		except Exception as e:
+			print(f"Could not preload {key[1]}: {e}")
+			return None
+
+	def poll(self, budget = LOADING_BUDGET):
+		"""Convert finished assets on the main thread for about budget seconds"""
+		deadline = perf_counter() + budget
+		for key, future in list(self.pending.items()):
+			if perf_counter() >= deadline:
+				break
+			if future.done():
+				del self.pending[key]
+				asset = self.finish(key, future)
+				if asset is not None:
+					self.ready[key] = asset
+
+	def take(self, kind, path):
+		"""Hand out a preloaded asset, waiting for it if it is still decoding"""
+		key = (kind, path)
+		if key in self.ready:
+			return self.ready.pop(key)
+		if key in self.pending:
+			return self.finish(key, self.pending.pop(key))
+		return None
+
+	def stop(self):
+		"""Drop whatever was not handed out, start() can run again afterwards"""
+		if self.executor:
+			self.executor.shutdown(wait = False, cancel_futures = True)
+			self.executor = None
+		self.pending.clear()
+		self.ready.clear()
+		if support.preloader is self:
+			support.preloader = None
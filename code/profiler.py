@@ -0,0 +1,103 @@
+import pygame
+from collections import deque
+from time import perf_counter
+from tracing import tracer
+from dirty_rects import dirty_rects
+
+class Profiler:
+	"""Times the phases of a frame and shows rolling percentiles on screen"""
+
+	def __init__(self, history = 120):
+		self.enabled = False
+		self.history = history
+
+		# phase name -> rolling frame times in seconds
+		self.samples = {}
+		self.starts = {}
+
+		# group name -> sprite count of the last frame
+		self.counts = {}
+
+		self.font = None
+
+	def toggle(self):
+		self.enabled = not self.enabled
+		self.samples.clear()
+		self.starts.clear()
+		self.counts.clear()
+
+	def begin(self, name):
+		if not (self.enabled or tracer.enabled):
+			return
+		self.starts[name] = perf_counter()
+
+	def end(self, name):
+		if not (self.enabled or tracer.enabled):
+			return
+		start = self.starts.pop(name, None)
+		if start is None:
+			return
+		now = perf_counter()
+
+		# phases also become spans when a trace is being recorded
+		if tracer.enabled:
+			tracer.record(name, start, now)
+
+		if self.enabled:
+			if name not in self.samples:
+				self.samples[name] = deque(maxlen = self.history)
+			self.samples[name].append(now - start)
+
+	def count(self, name, value):
+		if not self.enabled:
+			return
+		self.counts[name] = value
+
+	def percentile(self, name, pct):
+		"""Frame time in ms below which pct percent of the samples fall"""
+		samples = self.samples.get(name)
+		if not samples:
+			return 0
+		ordered = sorted(samples)
+		index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+		return ordered[index] * 1000
+
+	def report(self):
+		"""Rows of (phase, p50, p95, max) in milliseconds, slowest first"""
+		rows = [
+			(name, self.percentile(name, 50), self.percentile(name, 95), max(samples) * 1000)
+			for name, samples in self.samples.items() if samples]
+		return sorted(rows, key = lambda row: row[2], reverse = True)
+
+	def display(self, backend):
+		if not self.enabled:
+			return
+		if self.font is None:
+			self.font = pygame.font.Font(None, 20)
+
+		rows = [('phase', 'p50', 'p95', 'max ms')]
+		for name, p50, p95, peak in self.report():
+			rows.append((name, f'{p50:.2f}', f'{p95:.2f}', f'{peak:.2f}'))
+		if dirty_rects.enabled:
+			rows.append(('screen updated', f'{dirty_rects.fraction() * 100:.0f}%', '', ''))
+		if self.counts:
+			rows.append(('', '', '', ''))
+			rows.append(('sprites', '', '', ''))
+			for name, value in self.counts.items():
+				rows.append((name, str(value), '', ''))
+
+		columns = (0, 130, 180, 230)
+		line_height = self.font.get_linesize()
+		panel = pygame.Surface((300, len(rows) * line_height + 12), pygame.SRCALPHA)
+		panel.fill((0, 0, 0, 180))
+		for index, row in enumerate(rows):
+			for x, text in zip(columns, row):
+				if text:
+					text_surf = self.font.render(text, False, 'White')
+					panel.blit(text_surf, (8 + x, 6 + index * line_height))
+
+		backend.blit(panel, (8, 8))
+		dirty_rects.add(panel.get_rect(topleft = (8, 8)))
+
+# shared by Game and Level, toggled with F3
+profiler = Profiler()
@@ -0,0 +1,82 @@
+import pygame
+from weakref import WeakKeyDictionary
+from settings import *
+from dirty_rects import dirty_rects
+
+class RenderTarget:
+	"""The surface the world is drawn on, and how it gets to the window.
+
+	At scale 1 the world is drawn straight onto the display surface. A larger
+	scale draws it into a surface scale times smaller each way, which present()
+	blows up to the window with nearest-neighbour scaling once per frame, so
+	filling the world costs about scale squared less. zoom is target pixels
+	per world pixel; at any other zoom than 1 sprites are drawn from scaled
+	copies of their images, made once per source image."""
+
+	def __init__(self, scale = RENDER_SCALE, zooms = ZOOM_LEVELS):
+		self.scale = scale
+		self.zooms = zooms
+		self.zoom = zooms[0]
+		self.surface = None
+
+		# source image -> copy at the current zoom, dropped with the source
+		self.scaled_images = WeakKeyDictionary()
+
+	def get_surface(self):
+		"""The surface to draw the world on this frame"""
+		if self.scale == 1:
+			return pygame.display.get_surface()
+		size = (SCREEN_WIDTH // self.scale, SCREEN_HEIGHT // self.scale)
+		if self.surface is None or self.surface.get_size() != size:
+			self.surface = pygame.Surface(size).convert()
+		return self.surface
+
+	def view_size(self):
+		"""Width and height of the world on screen, in world pixels"""
+		return SCREEN_WIDTH / self.scale / self.zoom, SCREEN_HEIGHT / self.scale / self.zoom
+
+	def scaled(self, image):
+		"""image at the current zoom"""
+		if self.zoom == 1:
+			return image
+		scaled = self.scaled_images.get(image)
+		if scaled is None:
+			size = (max(1, round(image.get_width() * self.zoom)), max(1, round(image.get_height() * self.zoom)))
+			scaled = pygame.transform.scale(image, size)
+			colorkey = image.get_colorkey()
+			if colorkey:
+				scaled.set_colorkey(colorkey, pygame.RLEACCEL)
+			self.scaled_images[image] = scaled
+		return scaled
+
+	def prescale(self, sprites):
+		"""Scale the images of sprites ahead of drawing them, e.g. a chunk just loaded"""
+		if self.zoom != 1:
+			for sprite in sprites:
+				self.scaled(sprite.image)
+
+	def forget(self, image):
+		"""Drop the scaled copy of an image that was drawn on since"""
+		self.scaled_images.pop(image, None)
+
+	def next_zoom(self, sprites = ()):
+		"""Switch to the next of the zoom levels and scale sprites for it"""
+		self.zoom = self.zooms[(self.zooms.index(self.zoom) + 1) % len(self.zooms)]
+		self.scaled_images = WeakKeyDictionary()
+		self.prescale(sprites)
+		dirty_rects.full()
+
+	def screen_rect(self, rect):
+		"""A rect on the target in window pixels, for dirty_rects"""
+		if self.scale == 1:
+			return rect
+		scale = self.scale
+		return pygame.Rect(rect.x * scale, rect.y * scale, rect.width * scale, rect.height * scale)
+
+	def present(self):
+		"""Scale the target up to the window, once the world is drawn"""
+		if self.scale != 1:
+			pygame.transform.scale(self.surface, (SCREEN_WIDTH, SCREEN_HEIGHT), pygame.display.get_surface())
+
+# the world is drawn by CameraGroup, zoomed from Game.handle_playing
+render_target = RenderTarget()
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import pygame
+
+# bump when the recorded frames change, older recordings then cannot be replayed
+RECORDING_VERSION = 2
+
+class FrameInput:
+	"""Key events and clock for one frame, live, recorded or replayed"""
+
+	def __init__(self):
+		self.mode = 'live'  # live, fixed, record, replay
+
+		# state of the current frame, keys are pygame key codes
+		self.held = set()
+		self.keydowns = []
+		self.ticks = 0
+
+		# recording
+		self.seed = None
+		self.fixed_dt = None
+		self.frames = []
+		self.frame_index = 0
+		self.path = None
+		self.expected_digest = None
+
+	def start_fixed_clock(self):
+		"""Drive game time from dt alone, without recording anything"""
+		self.mode = 'fixed'
+		self.ticks = 0
+
+	def start_recording(self, path, seed, fixed_dt = None):
+		self.mode = 'record'
+		self.path = path
+		self.seed = seed
+		self.fixed_dt = fixed_dt
+		self.frames = []
+		self.ticks = 0
+
+	def load_replay(self, path):
+		with open(path, 'r') as f:
+			recording = json.load(f)
+		if recording.get('version') != RECORDING_VERSION:
+			raise ValueError(f'{path} was recorded by another version of the game')
+		self.mode = 'replay'
+		self.path = path
+		self.seed = recording['seed']
+		self.frames = recording['frames']
+		self.expected_digest = recording.get('digest')
+		self.frame_index = 0
+		self.ticks = 0
+		return len(self.frames)
+
+	def next_frame(self, dt, events):
+		"""Advance to the next frame and return the dt the game should use"""
+		if self.mode == 'replay':
+			if self.frame_index < len(self.frames):
+				dt, held, keydowns = self.frames[self.frame_index]
+				self.frame_index += 1
+			else:
+				dt, held, keydowns = 0, [], []
+			self.held = set(held)
+			self.keydowns = keydowns
+		else:
+			self.keydowns = []
+			for event in events:
+				if event.type == pygame.KEYDOWN:
+					self.keydowns.append(event.key)
+					self.held.add(event.key)
+				elif event.type == pygame.KEYUP:
+					self.held.discard(event.key)
+				elif event.type == pygame.WINDOWFOCUSLOST:
+					# the key ups go to another window
+					self.held.clear()
+
+		if self.mode == 'record':
+			if self.fixed_dt is not None:
+				dt = self.fixed_dt
+			self.frames.append([dt, sorted(self.held), self.keydowns])
+
+		self.ticks += dt * 1000
+		return dt
+
+	def get_ticks(self):
+		"""Game time in ms; follows the recorded dt while recording or replaying"""
+		if self.mode == 'live':
+			return pygame.time.get_ticks()
+		return self.ticks
+
+	def save_recording(self, digest):
+		with open(self.path, 'w') as f:
+			json.dump({'version': RECORDING_VERSION, 'seed': self.seed, 'digest': digest, 'frames': self.frames}, f)
+
+def state_digest(game_state, player, level):
+	"""Hash of everything GameState would save, to compare two runs"""
+	game_data = game_state.collect_game_data(player, level)
+	game_data.pop('meta')
+	encoded = json.dumps(game_data, sort_keys = True).encode()
+	return hashlib.sha256(encoded).hexdigest()
+
+# shared by the game loop, the player and the menus
+frame_input = FrameInput()
@@ -0,0 +1,5 @@
+import random
+
+# every random decision in gameplay draws from this generator, so seeding
+# it (see replay.py) makes a session reproducible
+rng = random.Random()
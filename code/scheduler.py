@@ -0,0 +1,54 @@
+import heapq
+
+class Scheduler:
+	"""Every pending deadline in one heap, fired by advance() once per frame.
+
+	Time is in ms and only moves forward through advance(), so a paused
+	scheduler keeps every timer exactly where it was. Cancelled entries stay
+	in the heap and are skipped when they come up."""
+
+	def __init__(self):
+		self.time = 0
+		self.paused = False
+
+		# [deadline, order, callback, args], order keeps equal deadlines first come first served
+		self.heap = []
+		self.order = 0
+
+	def call_at(self, deadline, callback, *args):
+		"""Run callback(*args) once time reaches deadline, returns a handle for cancel()"""
+		self.order += 1
+		entry = [deadline, self.order, callback, args]
+		heapq.heappush(self.heap, entry)
+		return entry
+
+	def call_later(self, delay, callback, *args):
+		return self.call_at(self.time + delay, callback, *args)
+
+	def cancel(self, entry):
+		if entry:
+			entry[2] = None
+
+	def advance(self, dt):
+		"""Move time on by dt seconds and run everything that came due"""
+		if self.paused:
+			return
+		self.time += dt * 1000
+		heap = self.heap
+		while heap and heap[0][0] <= self.time:
+			_, _, callback, args = heapq.heappop(heap)
+			if callback:
+				callback(*args)
+
+	def pause(self):
+		self.paused = True
+
+	def resume(self):
+		self.paused = False
+
+	def clear(self):
+		"""Drop every pending call, the clock keeps its time"""
+		self.heap.clear()
+
+# gameplay timers: the player's tools, particles and rain drops
+scheduler = Scheduler()
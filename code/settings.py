@@ -1,9 +1,103 @@
+import pygame
 from pygame.math import Vector2
 # screen
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 640
 TILE_SIZE = 64
 
+# frame rate cap while paused, the world is a still image then
+IDLE_FPS = 30
+
+# present only the changed parts of the screen (also --dirty-rects), with a full
+# update once more than DIRTY_RECT_LIMIT of the screen changed
+DIRTY_RECTS = False
+DIRTY_RECT_LIMIT = 0.5
+
+# draw the world RENDER_SCALE times smaller (also --render-scale) and scale it
+# up to the window, see render_target.py. ZOOM_LEVELS are target pixels per
+# world pixel, F2 switches between them
+RENDER_SCALE = 1
+ZOOM_LEVELS = (1, 0.5)
+
+# how frames are drawn (also --backend): 'software' blits surfaces, 'renderer'
+# submits textures to an SDL renderer, see draw_backend.py. -1 lets SDL pick
+# the renderer, 0 asks for its software renderer
+DRAW_BACKEND = 'software'
+RENDERER_ACCELERATED = -1
+
+# world streaming, chunk size in tiles and how many chunks around the player stay loaded
+CHUNK_SIZE = 16
+CHUNK_RADIUS = 1
+
+# tilled soil and water are drawn into surfaces of this many tiles square,
+# CHUNK_SIZE has to be a multiple of it
+FARM_BLOCK_SIZE = 8
+
+# seconds per frame spent building a level behind the loading screen
+LOADING_BUDGET = 0.012
+
+# pack the frames of each graphics folder into shared atlas pages
+ATLAS_PACKING = True
+ATLAS_MAX_SIZE = 1024
+
+# keep decoded images in cache/surfaces so later starts skip PNG decoding
+SURFACE_CACHE = True
+
+# images without translucent pixels are blitted as RLE surfaces keyed on this
+# color, see surface_format.py. Images that use it keep per-pixel alpha
+SURFACE_FORMATS = True
+KEY_COLOR = (255, 0, 255)
+
+# rendered strings kept by text.text_cache
+TEXT_CACHE_SIZE = 256
+
+# mixer channels reserved per sound effect (by file name), playing one more
+# restarts its oldest; the free channels are left for anything else
+SOUND_CHANNELS = {
+	'hoe': 2,
+	'axe': 2,
+	'water': 1,
+	'plant': 2,
+	'success': 1}
+FREE_SOUND_CHANNELS = 4
+
+# keys per input context, see controls.py
+KEY_BINDINGS = {
+	'game': {
+		pygame.K_ESCAPE: 'pause',
+		pygame.K_F5: 'save',
+		pygame.K_F6: 'quick save',
+		pygame.K_F9: 'quick load',
+		pygame.K_F7: 'rewind',
+		pygame.K_F3: 'profiler',
+		pygame.K_F2: 'zoom'},
+	'player': {
+		pygame.K_w: 'up',
+		pygame.K_s: 'down',
+		pygame.K_a: 'left',
+		pygame.K_d: 'right',
+		pygame.K_SPACE: 'use tool',
+		pygame.K_q: 'switch tool',
+		pygame.K_LCTRL: 'use seed',
+		pygame.K_e: 'switch seed',
+		pygame.K_RETURN: 'interact'},
+	'menu': {
+		pygame.K_UP: 'up',
+		pygame.K_DOWN: 'down',
+		pygame.K_LEFT: 'left',
+		pygame.K_RIGHT: 'right',
+		pygame.K_RETURN: 'select',
+		pygame.K_SPACE: 'select',
+		pygame.K_ESCAPE: 'back'},
+	'shop': {
+		pygame.K_UP: 'up',
+		pygame.K_DOWN: 'down',
+		pygame.K_SPACE: 'select',
+		pygame.K_ESCAPE: 'back'}}
+
+# ms before a held menu key repeats, and between repeats
+KEY_REPEAT = (400, 120)
+
 # overlay positions 
 OVERLAY_POSITIONS = {
 	'tool' : (40, SCREEN_HEIGHT - 15), 
@@ -49,4 +143,19 @@ SALE_PRICES = {
 PURCHASE_PRICES = {
 	'corn': 4,
 	'tomato': 5
-}
\ No newline at end of file
+}
+# time of day: game minutes per second of play, when a day starts and the
+# time (past midnight) the player passes out and sleeps
+DAY_MINUTES_PER_SECOND = 6
+DAY_START = 7 * 60
+DAY_END = 26 * 60
+
+# hour each phase of the day starts and the sky tint at that moment,
+# blended in between in steps of SKY_STEP game minutes
+DAY_PHASES = {
+	'dawn': (5, (38,101,189)),
+	'day': (7, (255,255,255)),
+	'dusk': (17, (255,255,255)),
+	'night': (20, (38,101,189))
+}
+SKY_STEP = 2
@@ -1,38 +1,66 @@
 import pygame 
 from settings import *
-from support import import_folder, load_image
 from sprites import Generic
-from random import randint, choice
+from rng import rng
+from scheduler import scheduler
+from dirty_rects import dirty_rects, SCREEN_RECT
+from daytime import PHASES, DAY_MINUTES
+
+def sky_gradient(step = SKY_STEP):
+	"""Tint for every step minutes of a day, blended between the phase colors"""
+	keys = [(start * 60, color) for start, _, color in PHASES]
+
+	# the last phase carries on past midnight into the first
+	keys = [(keys[-1][0] - DAY_MINUTES, keys[-1][1])] + keys + [(keys[0][0] + DAY_MINUTES, keys[0][1])]
+
+	gradient = []
+	for minute in range(0, DAY_MINUTES, step):
+		for (start, color), (end, next_color) in zip(keys, keys[1:]):
+			if start <= minute < end:
+				blend = (minute - start) / (end - start)
+				gradient.append(tuple(round(a + (b - a) * blend) for a, b in zip(color, next_color)))
+				break
+	return gradient
 
 class Sky:
-	def __init__(self):
-		self.display_surface = pygame.display.get_surface()
-		self.full_surf = pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT))
-		self.start_color = [255,255,255]
-		self.end_color = (38,101,189)
+	"""Tints the world by the time of day of a DayClock"""
+
+	def __init__(self, backend):
+		self.backend = backend
+		self.gradient = sky_gradient()
+
+		# the tint is only looked up again when the clock reaches another step
+		self.step = None
+		self.color = None
 
-	def display(self, dt):
-		for index, value in enumerate(self.end_color):
-			if self.start_color[index] > value:
-				self.start_color[index] -= 2 * dt
+	def display(self, clock):
+		step = clock.step()
+		if step != self.step:
+			self.step = step
+			self.color = self.gradient[step]
 
-		self.full_surf.fill(self.start_color)
-		self.display_surface.blit(self.full_surf, (0,0), special_flags = pygame.BLEND_RGBA_MULT)
+		# multiplying by white changes nothing
+		if self.color != (255,255,255):
+			self.backend.tint(self.color)
+		dirty_rects.mark('sky', self.color, SCREEN_RECT)
 
 class Drop(Generic):
+	__slots__ = ('moving', 'pos', 'speed')
+
+	# every drop falls the same way, only read
+	direction = pygame.math.Vector2(-2,4)
+
 	def __init__(self, surf, pos, moving, groups, z):
 		
 		# general setup
 		super().__init__(pos, surf, groups, z)
-		self.lifetime = randint(400,500)
-		self.start_time = pygame.time.get_ticks()
+		scheduler.call_later(rng.randint(400,500), self.kill)
 
 		# moving 
 		self.moving = moving
 		if self.moving:
 			self.pos = pygame.math.Vector2(self.rect.topleft)
-			self.direction = pygame.math.Vector2(-2,4)
-			self.speed = randint(200,250)
+			self.speed = rng.randint(200,250)
 
 	def update(self,dt):
 		# movement
@@ -40,29 +68,28 @@ class Drop(Generic):
 			self.pos += self.direction * self.speed * dt
 			self.rect.topleft = (round(self.pos.x), round(self.pos.y))
 
-		# timer
-		if pygame.time.get_ticks() - self.start_time >= self.lifetime:
-			self.kill()
-
 class Rain:
-	def __init__(self, all_sprites):
+	def __init__(self, all_sprites, floor_size, assets):
 		self.all_sprites = all_sprites
-		self.rain_drops = import_folder('../graphics/rain/drops/')
-		self.rain_floor = import_folder('../graphics/rain/floor/')
-		self.floor_w, self.floor_h =  load_image('../graphics/world/ground.png').get_size()
+		self.rain_drops = assets.folder('../graphics/rain/drops/')
+		self.rain_floor = assets.folder('../graphics/rain/floor/')
+		self.floor_w, self.floor_h = floor_size
+
+		# drops only fall where the world is loaded
+		self.area = pygame.Rect((0,0), floor_size)
 
 	def create_floor(self):
 		Drop(
-			surf = choice(self.rain_floor), 
-			pos = (randint(0,self.floor_w),randint(0,self.floor_h)), 
+			surf = rng.choice(self.rain_floor), 
+			pos = (rng.randint(self.area.left,self.area.right),rng.randint(self.area.top,self.area.bottom)), 
 			moving = False, 
 			groups = self.all_sprites, 
 			z = LAYERS['rain floor'])
 
 	def create_drops(self):
 		Drop(
-			surf = choice(self.rain_drops), 
-			pos = (randint(0,self.floor_w),randint(0,self.floor_h)), 
+			surf = rng.choice(self.rain_drops), 
+			pos = (rng.randint(self.area.left,self.area.right),rng.randint(self.area.top,self.area.bottom)), 
 			moving = True, 
 			groups = self.all_sprites, 
 			z = LAYERS['rain drops'])
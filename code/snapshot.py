@@ -0,0 +1,109 @@
+import sys
+from collections import deque
+from time import perf_counter
+from types import MappingProxyType
+
+def freeze(value):
+	"""Turn nested lists and dicts into read-only tuples and mappings"""
+	if isinstance(value, dict):
+		return MappingProxyType({key: freeze(item) for key, item in value.items()})
+	if isinstance(value, (list, tuple)):
+		return tuple(freeze(item) for item in value)
+	return value
+
+def thaw(value):
+	"""Turn a frozen structure back into fresh, mutable lists and dicts"""
+	if isinstance(value, MappingProxyType):
+		return {key: thaw(item) for key, item in value.items()}
+	if isinstance(value, tuple):
+		return [thaw(item) for item in value]
+	return value
+
+def deep_sizeof(value, seen):
+	"""Approximate memory used by a frozen structure, skipping ids in seen"""
+	if id(value) in seen:
+		return 0
+	seen.add(id(value))
+	size = sys.getsizeof(value)
+	if isinstance(value, MappingProxyType):
+		size += sum(deep_sizeof(key, seen) + deep_sizeof(item, seen) for key, item in value.items())
+	elif isinstance(value, tuple):
+		size += sum(deep_sizeof(item, seen) for item in value)
+	return size
+
+class Snapshot:
+	"""A read-only copy of the game state held in memory"""
+
+	def __init__(self, label, data, grid, capture_time, nbytes):
+		self.label = label
+		self.data = data
+		self.grid = grid
+		self.capture_time = capture_time
+		self.nbytes = nbytes
+
+	def to_game_data(self):
+		"""Expand into the same dict layout GameState writes to disk"""
+		game_data = thaw(self.data)
+		game_data['level']['soil_grid'] = [[list(cell) for cell in row] for row in self.grid]
+		return game_data
+
+class SnapshotBuffer:
+	"""Bounded ring of in-memory snapshots for quick-save and rewind"""
+
+	def __init__(self, game_state, capacity = 8):
+		self.game_state = game_state
+		self.snapshots = deque(maxlen = capacity)
+
+	def compact_grid(self, soil_grid):
+		# cells become short strings ('FXW'); rows that did not change
+		# since the last snapshot are shared instead of copied
+		previous = self.snapshots[-1].grid if self.snapshots else ()
+		grid = []
+		shared = set()
+		for index, row in enumerate(soil_grid):
+			row = tuple(sys.intern(''.join(cell)) for cell in row)
+			if index < len(previous) and previous[index] == row:
+				row = previous[index]
+				shared.add(id(row))
+			grid.append(row)
+		return tuple(grid), shared
+
+	def capture(self, player, level, label = 'manual'):
+		"""Store the current state of the level as a new snapshot"""
+		start = perf_counter()
+
+		game_data = self.game_state.collect_game_data(player, level)
+		soil_grid = game_data['level'].pop('soil_grid')
+
+		# a snapshot is always restored outside of the sleep transition
+		game_data['player']['sleep'] = False
+		game_data['level']['transition'] = {'color': 255, 'speed': -2}
+
+		grid, shared = self.compact_grid(soil_grid)
+		data = freeze(game_data)
+		capture_time = perf_counter() - start
+
+		nbytes = deep_sizeof(data, set()) + deep_sizeof(grid, shared)
+		snapshot = Snapshot(label, data, grid, capture_time, nbytes)
+		self.snapshots.append(snapshot)
+		return snapshot
+
+	def latest(self, label = None):
+		"""Newest snapshot, optionally the newest one with the given label"""
+		for snapshot in reversed(self.snapshots):
+			if label is None or snapshot.label == label:
+				return snapshot
+		return None
+
+	def restore(self, snapshot, player, level):
+		"""Apply a snapshot to the running level, returns the time it took"""
+		start = perf_counter()
+		success = self.game_state.apply_loaded_data(snapshot.to_game_data(), player, level)
+		return perf_counter() - start if success else None
+
+	def stats(self):
+		"""Capture cost and memory use of every snapshot in the buffer"""
+		return [(snapshot.label, snapshot.capture_time, snapshot.nbytes) for snapshot in self.snapshots]
+
+	def clear(self):
+		self.snapshots.clear()
@@ -2,44 +2,153 @@ import pygame
 from settings import *
 from pytmx.util_pygame import load_pygame
 from support import *
-from random import choice
-
-class SoilTile(pygame.sprite.Sprite):
-	def __init__(self, pos, surf, groups):
+from rng import rng
+from tracing import traced
+from dirty_rects import dirty_rects
+from render_target import render_target
+
+# what a tile of the SoilGrid holds, the bits above keep its water variant + 1
+FARMABLE, TILLED, WATERED, PLANTED = 1, 2, 4, 8
+VARIANT_SHIFT = 4
+
+# the letters saves use for the flags, in the order they are written
+CELL_LETTERS = (('F', FARMABLE), ('X', TILLED), ('W', WATERED), ('P', PLANTED))
+
+class SoilGrid:
+	"""Soil state of the map, one byte per tile: the flags above and the water
+	variant. Only chunks with farmable tiles get a bytearray, row by row."""
+
+	def __init__(self, width, height):
+		self.width = width
+		self.height = height
+		self.chunks = {}
+
+	def inside(self, x, y):
+		return 0 <= x < self.width and 0 <= y < self.height
+
+	def get(self, x, y):
+		"""The byte of tile x, y, 0 outside the map or where nothing is farmable"""
+		chunk = self.chunks.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+		if chunk is None or not self.inside(x, y):
+			return 0
+		return chunk[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE]
+
+	def set(self, x, y, value):
+		key = (x // CHUNK_SIZE, y // CHUNK_SIZE)
+		chunk = self.chunks.get(key)
+		if chunk is None:
+			if not value:
+				return
+			chunk = self.chunks[key] = bytearray(CHUNK_SIZE * CHUNK_SIZE)
+		chunk[(y % CHUNK_SIZE) * CHUNK_SIZE + x % CHUNK_SIZE] = value
+
+	def has(self, x, y, flag):
+		return bool(self.get(x, y) & flag)
+
+	def add(self, x, y, flags):
+		self.set(x, y, self.get(x, y) | flags)
+
+	def remove(self, x, y, flags):
+		self.set(x, y, self.get(x, y) & ~flags)
+
+	def variant(self, x, y):
+		"""Water variant of tile x, y, None until one is picked"""
+		variant = self.get(x, y) >> VARIANT_SHIFT
+		return variant - 1 if variant else None
+
+	def set_variant(self, x, y, variant):
+		flags = self.get(x, y) & ((1 << VARIANT_SHIFT) - 1)
+		self.set(x, y, flags if variant is None else flags | (variant + 1) << VARIANT_SHIFT)
+
+	def cells(self):
+		"""Tile position and byte of every tile with soil state, row by row over the map"""
+		keys = sorted(self.chunks, key = lambda key: (key[1], key[0]))
+		for cy in sorted({key[1] for key in keys}):
+			row_chunks = [(cx * CHUNK_SIZE, self.chunks[(cx, y)]) for cx, y in keys if y == cy]
+			for y in range(cy * CHUNK_SIZE, min(self.height, (cy + 1) * CHUNK_SIZE)):
+				start = (y % CHUNK_SIZE) * CHUNK_SIZE
+				for left, chunk in row_chunks:
+					for index in range(start, start + CHUNK_SIZE):
+						if chunk[index]:
+							yield left + index - start, y, chunk[index]
+
+	def chunk_cells(self, cx, cy):
+		"""Tile position and byte of every tile with soil state in chunk cx, cy"""
+		chunk = self.chunks.get((cx, cy))
+		if chunk is None:
+			return
+		for index, value in enumerate(chunk):
+			if value:
+				yield cx * CHUNK_SIZE + index % CHUNK_SIZE, cy * CHUNK_SIZE + index // CHUNK_SIZE, value
+
+	def to_lists(self):
+		"""The grid in the format GameState saves: a list of letters per tile"""
+		rows = [[[] for x in range(self.width)] for y in range(self.height)]
+		for x, y, value in self.cells():
+			rows[y][x] = [letter for letter, flag in CELL_LETTERS if value & flag]
+		return rows
+
+	def from_lists(self, rows):
+		"""Restore the grid from the saved format, water variants are left unset"""
+		self.chunks = {}
+		for y, row in enumerate(rows):
+			for x, cell in enumerate(row):
+				value = 0
+				for letter, flag in CELL_LETTERS:
+					if letter in cell:
+						value |= flag
+				if value:
+					self.set(x, y, value)
+
+class FarmBlock(pygame.sprite.Sprite):
+	"""The soil and water of FARM_BLOCK_SIZE x FARM_BLOCK_SIZE tiles in one surface.
+	SoilLayer draws single cells into it when they change, the camera blits
+	the whole block."""
+
+	def __init__(self, key, groups):
 		super().__init__(groups)
-		self.image = surf
-		self.rect = self.image.get_rect(topleft = pos)
+		size = FARM_BLOCK_SIZE * TILE_SIZE
+		self.image = pygame.Surface((size, size), pygame.SRCALPHA)
+		self.rect = self.image.get_rect(topleft = (key[0] * size, key[1] * size))
 		self.z = LAYERS['soil']
 
-class WaterTile(pygame.sprite.Sprite):
-	def __init__(self, pos, surf, groups):
-		super().__init__(groups)
-		self.image = surf
-		self.rect = self.image.get_rect(topleft = pos)
-		self.z = LAYERS['soil water']
-
 class Plant(pygame.sprite.Sprite):
-	def __init__(self, plant_type, groups, soil, check_watered):
+	# no hitbox until the plant has grown out of the ground. It is not a slot:
+	# the player's hasattr() check is much slower on an empty slot
+	__slots__ = ('plant_type', 'frames', 'soil_rect', 'check_watered', 'age', 'harvestable',
+		'image', 'rect', 'z')
+
+	def __init__(self, plant_type, groups, soil_rect, check_watered, frames = None):
 		super().__init__(groups)
 		
 		# setup
 		self.plant_type = plant_type
-		self.frames = import_folder(f'../graphics/fruit/{plant_type}')
-		self.soil = soil
+		self.frames = frames or import_folder(f'../graphics/fruit/{plant_type}')
+		self.soil_rect = soil_rect
 		self.check_watered = check_watered
 
 		# plant growing 
 		self.age = 0
-		self.max_age = len(self.frames) - 1
-		self.grow_speed = GROW_SPEED[plant_type]
 		self.harvestable = False
 
 		# sprite setup
 		self.image = self.frames[self.age]
-		self.y_offset = -16 if plant_type == 'corn' else -8
-		self.rect = self.image.get_rect(midbottom = soil.rect.midbottom + pygame.math.Vector2(0,self.y_offset))
+		self.rect = self.image.get_rect(midbottom = soil_rect.midbottom + pygame.math.Vector2(0,self.y_offset))
 		self.z = LAYERS['ground plant']
 
+	# the same for every plant of a type
+	@property
+	def max_age(self):
+		return len(self.frames) - 1
+
+	@property
+	def grow_speed(self):
+		return GROW_SPEED[self.plant_type]
+
+	@property
+	def y_offset(self):
+		return -16 if self.plant_type == 'corn' else -8
+
 	def grow(self):
 		if self.check_watered(self.rect.center):
 			self.age += self.grow_speed
@@ -53,160 +162,295 @@ class Plant(pygame.sprite.Sprite):
 				self.harvestable = True
 
 			self.image = self.frames[int(self.age)]
-			self.rect = self.image.get_rect(midbottom = self.soil.rect.midbottom + pygame.math.Vector2(0,self.y_offset))
+			self.rect = self.image.get_rect(midbottom = self.soil_rect.midbottom + pygame.math.Vector2(0,self.y_offset))
+
+	def get_state(self):
+		"""Growth of this plant in the format GameState saves"""
+		return {
+			'plant_type': self.plant_type,
+			'pos': [self.rect.x, self.rect.y],
+			'age': self.age,
+			'harvestable': self.harvestable,
+			'soil_pos': [self.soil_rect.x, self.soil_rect.y]}
+
+	def set_state(self, state):
+		self.age = state['age']
+		self.harvestable = state['harvestable']
+
+		# Update plant image and position based on age
+		if int(self.age) > 0:
+			self.z = LAYERS['main']
+			self.hitbox = self.rect.copy().inflate(-26,-self.rect.height * 0.4)
+
+		if self.age >= self.max_age:
+			self.age = self.max_age
+			self.harvestable = True
+
+		self.image = self.frames[int(self.age)]
+		self.rect = self.image.get_rect(midbottom = self.soil_rect.midbottom + pygame.math.Vector2(0,self.y_offset))
 
 class SoilLayer:
-	def __init__(self, all_sprites, collision_sprites):
+	def __init__(self, all_sprites, collision_sprites, tmx_data, assets, backend):
 
 		# sprite groups
 		self.all_sprites = all_sprites
 		self.collision_sprites = collision_sprites
-		self.soil_sprites = pygame.sprite.Group()
-		self.water_sprites = pygame.sprite.Group()
 		self.plant_sprites = pygame.sprite.Group()
 
+		# soil and water are drawn into FarmBlocks, keyed by block position
+		self.farm_blocks = {}
+
 		# graphics
-		self.soil_surfs = import_folder_dict('../graphics/soil/')
-		self.water_surfs = import_folder('../graphics/soil_water/')
+		self.assets = assets
+		self.backend = backend
+		self.soil_surfs = assets.folder_dict('../graphics/soil/')
+		self.water_surfs = assets.folder('../graphics/soil_water/')
+
+		# plants in chunks that are not loaded, kept in the format GameState saves
+		self.dormant_plants = []
 
-		self.create_soil_grid()
-		self.create_hit_rects()
+		# chunks that have sprites, None while the whole map is loaded
+		self.loaded_chunks = None
+
+		self.create_soil_grid(tmx_data)
 
 		# sounds
-		self.hoe_sound = load_sound('../audio/hoe.wav')
+		self.hoe_sound = assets.sound('../audio/hoe.wav')
 		self.hoe_sound.set_volume(0.1)
 
-		self.plant_sound = load_sound('../audio/plant.wav') 
+		self.plant_sound = assets.sound('../audio/plant.wav') 
 		self.plant_sound.set_volume(0.2)
 
-	def create_soil_grid(self):
-		ground = load_image('../graphics/world/ground.png')
-		h_tiles, v_tiles = ground.get_width() // TILE_SIZE, ground.get_height() // TILE_SIZE
-		
-		self.grid = [[[] for col in range(h_tiles)] for row in range(v_tiles)]
-		for x, y, _ in load_tmx_map('../data/map.tmx').get_layer_by_name('Farmable').tiles():
-			self.grid[y][x].append('F')
-
-	def create_hit_rects(self):
-		self.hit_rects = []
-		for index_row, row in enumerate(self.grid):
-			for index_col, cell in enumerate(row):
-				if 'F' in cell:
-					x = index_col * TILE_SIZE
-					y = index_row * TILE_SIZE
-					rect = pygame.Rect(x,y,TILE_SIZE, TILE_SIZE)
-					self.hit_rects.append(rect)
+	def create_soil_grid(self, tmx_data):
+		self.grid = SoilGrid(tmx_data.width, tmx_data.height)
+		for y, row in enumerate(tmx_data.get_layer_by_name('Farmable').data):
+			for x, gid in enumerate(row):
+				if gid:
+					self.grid.set(x, y, FARMABLE)
+
+	@property
+	def hit_rects(self):
+		"""Rect of every farmable tile, made from the grid when asked for"""
+		return [pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+			for x, y, cell in self.grid.cells() if cell & FARMABLE]
+
+	def tile_at(self, point):
+		"""Tile position under point, None outside the map"""
+		x = int(point[0] // TILE_SIZE)
+		y = int(point[1] // TILE_SIZE)
+		if self.grid.inside(x, y):
+			return x, y
 
 	def get_hit(self, point):
-		for rect in self.hit_rects:
-			if rect.collidepoint(point):
-				self.hoe_sound.play()
+		tile = self.tile_at(point)
+		if tile and self.grid.has(*tile, FARMABLE):
+			self.hoe_sound.play()
 
-				x = rect.x // TILE_SIZE
-				y = rect.y // TILE_SIZE
+			x, y = tile
+			self.grid.add(x, y, TILLED)
 
-				if 'F' in self.grid[y][x]:
-					self.grid[y][x].append('X')
-					self.create_soil_tiles()
-					if self.raining:
-						self.water_all()
+			# the neighbours' tile types depend on this cell
+			for nx, ny in ((x, y), (x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y)):
+				self.draw_cell(nx, ny)
+			if self.raining:
+				self.water_all()
 
-	def water(self, target_pos):
-		for soil_sprite in self.soil_sprites.sprites():
-			if soil_sprite.rect.collidepoint(target_pos):
+	def get_plant_frames(self, plant_type):
+		return self.assets.folder(f'../graphics/fruit/{plant_type}')
 
-				x = soil_sprite.rect.x // TILE_SIZE
-				y = soil_sprite.rect.y // TILE_SIZE
-				self.grid[y][x].append('W')
+	def is_loaded(self, x, y):
+		"""Whether tile x, y lies in a loaded chunk"""
+		return self.loaded_chunks is None or (x // CHUNK_SIZE, y // CHUNK_SIZE) in self.loaded_chunks
 
-				pos = soil_sprite.rect.topleft
-				surf = choice(self.water_surfs)
-				WaterTile(pos, surf, [self.all_sprites, self.water_sprites])
+	def loaded_cells(self):
+		"""Tile position and grid byte of every tile with soil state in a loaded chunk"""
+		if self.loaded_chunks is None:
+			yield from self.grid.cells()
+			return
 
-	def water_all(self):
-		for index_row, row in enumerate(self.grid):
-			for index_col, cell in enumerate(row):
-				if 'X' in cell and 'W' not in cell:
-					cell.append('W')
-					x = index_col * TILE_SIZE
-					y = index_row * TILE_SIZE
-					WaterTile((x,y), choice(self.water_surfs), [self.all_sprites, self.water_sprites])
+		for cx, cy in self.loaded_chunks:
+			yield from self.grid.chunk_cells(cx, cy)
 
-	def remove_water(self):
+	def set_loaded(self, chunk_keys):
+		"""Update soil, water and plant sprites for a new set of loaded chunks"""
+		previous = self.loaded_chunks
+		self.loaded_chunks = set(chunk_keys)
 
-		# destroy all water sprites
-		for sprite in self.water_sprites.sprites():
-			sprite.kill()
+		# plants leaving the loaded area are kept as data only
+		for plant in self.plant_sprites.sprites():
+			if not self.is_loaded(plant.soil_rect.x // TILE_SIZE, plant.soil_rect.y // TILE_SIZE):
+				self.dormant_plants.append(plant.get_state())
+				plant.kill()
+
+		# a farm block lies inside a single chunk, so it stays or goes with it
+		for key in list(self.farm_blocks):
+			if not self.is_loaded(key[0] * FARM_BLOCK_SIZE, key[1] * FARM_BLOCK_SIZE):
+				self.farm_blocks.pop(key).kill()
+		if previous is not None:
+			for chunk in self.loaded_chunks - previous:
+				for x, y, cell in self.grid.chunk_cells(*chunk):
+					if cell & (TILLED | WATERED):
+						self.draw_cell(x, y)
+
+		dormant_plants, self.dormant_plants = self.dormant_plants, []
+		self.load_plants(dormant_plants)
+
+	def load_plants(self, plants_data):
+		"""Create sprites for the plants in loaded chunks, keep the rest dormant"""
+		for plant_data in plants_data:
+			x, y = plant_data['soil_pos']
+			if not self.is_loaded(x // TILE_SIZE, y // TILE_SIZE):
+				self.dormant_plants.append(plant_data)
+			elif self.grid.has(x // TILE_SIZE, y // TILE_SIZE, TILLED):
+				plant = Plant(
+					plant_type = plant_data['plant_type'],
+					groups = [self.all_sprites, self.plant_sprites, self.collision_sprites],
+					soil_rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE),
+					check_watered = self.check_watered,
+					frames = self.get_plant_frames(plant_data['plant_type']))
+				plant.set_state(plant_data)
+
+	def water_variant(self, x, y):
+		"""Which water surface tile x, y shows, picked on first use"""
+		variant = self.grid.variant(x, y)
+		if variant is None:
+			variant = rng.randrange(len(self.water_surfs))
+			self.grid.set_variant(x, y, variant)
+		return variant
 
-		# clean up the grid
-		for row in self.grid:
-			for cell in row:
-				if 'W' in cell:
-					cell.remove('W')
+	def water(self, target_pos):
+		tile = self.tile_at(target_pos)
+		if tile and self.is_loaded(*tile):
+			x, y = tile
+			if self.grid.get(x, y) & (TILLED | WATERED) == TILLED:
+				self.grid.add(x, y, WATERED)
+				self.draw_water(x, y)
 
-	def check_watered(self, pos):
-		x = pos[0] // TILE_SIZE
-		y = pos[1] // TILE_SIZE
-		cell = self.grid[y][x]
-		is_watered = 'W' in cell
-		return is_watered
+	def water_all(self):
+		for x, y, cell in self.grid.cells():
+			if cell & (TILLED | WATERED) == TILLED:
+				self.grid.add(x, y, WATERED)
+				self.draw_water(x, y)
 
-	def plant_seed(self, target_pos, seed):
-		for soil_sprite in self.soil_sprites.sprites():
-			if soil_sprite.rect.collidepoint(target_pos):
-				self.plant_sound.play()
+	def remove_water(self):
+		# clean up the grid and the farm blocks, the water variants go with the water
+		for x, y, cell in self.grid.cells():
+			if cell & WATERED:
+				self.grid.remove(x, y, WATERED)
+				self.grid.set_variant(x, y, None)
+				self.draw_cell(x, y)
 
-				x = soil_sprite.rect.x // TILE_SIZE
-				y = soil_sprite.rect.y // TILE_SIZE
+	def check_watered(self, pos):
+		return self.grid.has(pos[0] // TILE_SIZE, pos[1] // TILE_SIZE, WATERED)
 
-				if 'P' not in self.grid[y][x]:
-					self.grid[y][x].append('P')
-					Plant(seed, [self.all_sprites, self.plant_sprites, self.collision_sprites], soil_sprite, self.check_watered)
+	def plant_seed(self, target_pos, seed):
+		tile = self.tile_at(target_pos)
+		if tile and self.is_loaded(*tile) and self.grid.has(*tile, TILLED):
+			self.plant_sound.play()
+
+			x, y = tile
+			if not self.grid.has(x, y, PLANTED):
+				self.grid.add(x, y, PLANTED)
+				Plant(
+					seed, [self.all_sprites, self.plant_sprites, self.collision_sprites],
+					pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE),
+					self.check_watered, self.get_plant_frames(seed))
 
 	def update_plants(self):
 		for plant in self.plant_sprites.sprites():
 			plant.grow()
 
+		# plants away from the player grow the same way, without sprites
+		for plant_data in self.dormant_plants:
+			if self.check_watered(plant_data['soil_pos']):
+				max_age = len(self.get_plant_frames(plant_data['plant_type'])) - 1
+				plant_data['age'] += GROW_SPEED[plant_data['plant_type']]
+				if plant_data['age'] >= max_age:
+					plant_data['age'] = max_age
+					plant_data['harvestable'] = True
+
+	def tile_type(self, x, y):
+		"""Soil graphic for tilled tile x, y, from its tilled neighbours"""
+		t = self.grid.has(x, y - 1, TILLED)
+		b = self.grid.has(x, y + 1, TILLED)
+		r = self.grid.has(x + 1, y, TILLED)
+		l = self.grid.has(x - 1, y, TILLED)
+
+		tile_type = 'o'
+
+		# all sides
+		if all((t,r,b,l)): tile_type = 'x'
+
+		# horizontal tiles only
+		if l and not any((t,r,b)): tile_type = 'r'
+		if r and not any((t,l,b)): tile_type = 'l'
+		if r and l and not any((t,b)): tile_type = 'lr'
+
+		# vertical only 
+		if t and not any((r,l,b)): tile_type = 'b'
+		if b and not any((r,l,t)): tile_type = 't'
+		if b and t and not any((r,l)): tile_type = 'tb'
+
+		# corners 
+		if l and b and not any((t,r)): tile_type = 'tr'
+		if r and b and not any((t,l)): tile_type = 'tl'
+		if l and t and not any((b,r)): tile_type = 'br'
+		if r and t and not any((b,l)): tile_type = 'bl'
+
+		# T shapes
+		if all((t,b,r)) and not l: tile_type = 'tbr'
+		if all((t,b,l)) and not r: tile_type = 'tbl'
+		if all((l,r,t)) and not b: tile_type = 'lrb'
+		if all((l,r,b)) and not t: tile_type = 'lrt'
+
+		return tile_type
+
+	def draw_cell(self, x, y):
+		"""Redraw the soil and water of tile x, y in its farm block"""
+		if not self.grid.inside(x, y) or not self.is_loaded(x, y):
+			return
+		cell = self.grid.get(x, y)
+		key = (x // FARM_BLOCK_SIZE, y // FARM_BLOCK_SIZE)
+		block = self.farm_blocks.get(key)
+		pos = ((x % FARM_BLOCK_SIZE) * TILE_SIZE, (y % FARM_BLOCK_SIZE) * TILE_SIZE)
+		if block:
+			block.image.fill((0,0,0,0), (pos, (TILE_SIZE, TILE_SIZE)))
+		elif cell & (TILLED | WATERED):
+			block = self.farm_blocks[key] = FarmBlock(key, [self.all_sprites])
+		else:
+			return
+
+		if cell & TILLED:
+			block.image.blit(self.soil_surfs[self.tile_type(x, y)], pos)
+		if cell & WATERED:
+			block.image.blit(self.water_surfs[self.water_variant(x, y)], pos)
+
+		self.block_changed(block)
+
+	def draw_water(self, x, y):
+		"""Pick the water of newly watered tile x, y and draw it over the soil"""
+		variant = self.water_variant(x, y)
+		block = self.farm_blocks.get((x // FARM_BLOCK_SIZE, y // FARM_BLOCK_SIZE))
+		if not block or not self.is_loaded(x, y):
+			self.draw_cell(x, y)
+			return
+		pos = ((x % FARM_BLOCK_SIZE) * TILE_SIZE, (y % FARM_BLOCK_SIZE) * TILE_SIZE)
+		block.image.blit(self.water_surfs[variant], pos)
+		self.block_changed(block)
+
+	def block_changed(self, block):
+		# the block keeps its surface, so neither the camera nor the copies
+		# scaled or uploaded from it can tell it changed
+		render_target.forget(block.image)
+		self.backend.forget(block.image)
+		dirty_rects.full()
+
+	@traced('SoilLayer.create_soil_tiles')
 	def create_soil_tiles(self):
-		self.soil_sprites.empty()
-		for index_row, row in enumerate(self.grid):
-			for index_col, cell in enumerate(row):
-				if 'X' in cell:
-					
-					# tile options 
-					t = 'X' in self.grid[index_row - 1][index_col]
-					b = 'X' in self.grid[index_row + 1][index_col]
-					r = 'X' in row[index_col + 1]
-					l = 'X' in row[index_col - 1]
-
-					tile_type = 'o'
-
-					# all sides
-					if all((t,r,b,l)): tile_type = 'x'
-
-					# horizontal tiles only
-					if l and not any((t,r,b)): tile_type = 'r'
-					if r and not any((t,l,b)): tile_type = 'l'
-					if r and l and not any((t,b)): tile_type = 'lr'
-
-					# vertical only 
-					if t and not any((r,l,b)): tile_type = 'b'
-					if b and not any((r,l,t)): tile_type = 't'
-					if b and t and not any((r,l)): tile_type = 'tb'
-
-					# corners 
-					if l and b and not any((t,r)): tile_type = 'tr'
-					if r and b and not any((t,l)): tile_type = 'tl'
-					if l and t and not any((b,r)): tile_type = 'br'
-					if r and t and not any((b,l)): tile_type = 'bl'
-
-					# T shapes
-					if all((t,b,r)) and not l: tile_type = 'tbr'
-					if all((t,b,l)) and not r: tile_type = 'tbl'
-					if all((l,r,t)) and not b: tile_type = 'lrb'
-					if all((l,r,b)) and not t: tile_type = 'lrt'
-
-					SoilTile(
-						pos = (index_col * TILE_SIZE,index_row * TILE_SIZE), 
-						surf = self.soil_surfs[tile_type], 
-						groups = [self.all_sprites, self.soil_sprites])
\ No newline at end of file
+		"""Redraw the farm blocks of every loaded chunk from the grid"""
+		for block in self.farm_blocks.values():
+			block.kill()
+		self.farm_blocks = {}
+		for x, y, cell in self.loaded_cells():
+			if cell & (TILLED | WATERED):
+				self.draw_cell(x, y)
@@ -1,24 +1,57 @@
 import pygame
+from weakref import WeakKeyDictionary
 from settings import *
-from random import randint, choice
+from rng import rng
 from timer import Timer
-from support import load_image, load_sound
+from scheduler import scheduler
 
 class Generic(pygame.sprite.Sprite):
+	# hitbox is only set for sprites in a CollisionGroup. pygame's Sprite has
+	# no __slots__, so instances still get a __dict__, see Tile
+	__slots__ = ('image', 'rect', 'z', 'hitbox')
+
 	def __init__(self, pos, surf, groups, z = LAYERS['main']):
+		self.image = surf
+		self.rect = self.image.get_rect(topleft = pos)
+		self.z = z
 		super().__init__(groups)
+
+class Tile:
+	"""A map tile that is only drawn, e.g. the ground and the house. It is not
+	a Sprite: CameraGroup draws its tiles along with the sprites, so a tile has
+	no __dict__ and no group bookkeeping. tiles is the camera's, see kill"""
+	__slots__ = ('image', 'rect', 'z', 'tiles')
+
+	def __init__(self, pos, surf, tiles, z = LAYERS['main']):
 		self.image = surf
 		self.rect = self.image.get_rect(topleft = pos)
 		self.z = z
-		self.hitbox = self.rect.copy().inflate(-self.rect.width * 0.2, -self.rect.height * 0.75)
+		self.tiles = tiles
+		tiles[self] = None
+
+	def kill(self):
+		self.tiles.pop(self, None)
+
+class CollisionGroup(pygame.sprite.Group):
+	"""The sprites the player collides with. Generic sprites get their hitbox
+	when they join, so ground and decoration tiles never make one"""
+
+	def add_internal(self, sprite, layer = None):
+		super().add_internal(sprite, layer)
+		if isinstance(sprite, Generic) and not hasattr(sprite, 'hitbox'):
+			sprite.hitbox = sprite.rect.copy().inflate(-sprite.rect.width * 0.2, -sprite.rect.height * 0.75)
 
 class Interaction(Generic):
+	__slots__ = ('name',)
+
 	def __init__(self, pos, size, groups, name):
 		surf = pygame.Surface(size)
 		super().__init__(pos, surf, groups)
 		self.name = name
 
 class Water(Generic):
+	__slots__ = ('frames', 'frame_index')
+
 	def __init__(self, pos, frames, groups):
 
 		#animation setup
@@ -42,47 +75,147 @@ class Water(Generic):
 		self.animate(dt)
 
 class WildFlower(Generic):
+	__slots__ = ()
+
 	def __init__(self, pos, surf, groups):
 		super().__init__(pos, surf, groups)
 		self.hitbox = self.rect.copy().inflate(-20,-self.rect.height * 0.9)
 
-class Particle(Generic):
-	def __init__(self, pos, surf, groups, z, duration = 200):
-		super().__init__(pos, surf, groups, z)
-		self.start_time = pygame.time.get_ticks()
-		self.duration = duration
+class Particle(pygame.sprite.Sprite):
+	"""White flash of a sprite that was just removed, handed out by particles"""
+	__slots__ = ('image', 'rect', 'z', 'deadline')
 
-		# white surface 
-		mask_surf = pygame.mask.from_surface(self.image)
-		new_surf = mask_surf.to_surface()
-		new_surf.set_colorkey((0,0,0))
-		self.image = new_surf
+	def start(self, pos, surf, groups, z, duration):
+		self.image = surf
+		self.rect = self.image.get_rect(topleft = pos)
+		self.z = z
+		self.add(groups)
+		self.deadline = scheduler.time + duration
+		scheduler.call_later(duration, particles.release, self)
 
-	def update(self,dt):
-		current_time = pygame.time.get_ticks()
-		if current_time - self.start_time > self.duration:
-			self.kill()
+	def update(self, dt):
+		# the scheduled release is gone if the scheduler was cleared since
+		if scheduler.time >= self.deadline:
+			particles.release(self)
+
+class ParticlePool:
+	"""Reuses finished particles and masks every source image only once"""
+
+	def __init__(self):
+		self.free = []
+		self.live = set()
+
+		# source surface -> its white silhouette, dropped with the source
+		self.flashes = WeakKeyDictionary()
+
+	def flash(self, surf):
+		flash = self.flashes.get(surf)
+		if flash is None:
+			mask_surf = pygame.mask.from_surface(surf)
+			flash = mask_surf.to_surface().convert()
+			flash.set_colorkey((0,0,0), pygame.RLEACCEL)
+			self.flashes[surf] = flash
+		return flash
+
+	def spawn(self, pos, surf, groups, z, duration = 200):
+		"""Flash surf at pos for duration ms"""
+		particle = self.free.pop() if self.free else Particle()
+		particle.start(pos, self.flash(surf), groups, z, duration)
+		self.live.add(particle)
+		return particle
+
+	def release(self, particle):
+		if particle in self.live:
+			self.live.remove(particle)
+			particle.kill()
+			self.free.append(particle)
+
+	def clear(self):
+		"""Take back every particle still showing, e.g. when its level goes"""
+		for particle in list(self.live):
+			self.release(particle)
+
+particles = ParticlePool()
 
 class Tree(Generic):
-	def __init__(self, pos, surf, groups, name, player_add):
+	def __init__(self, pos, surf, groups, name, player_add, assets, state = None):
 		super().__init__(pos, surf, groups)
 
 		# tree attributes
 		self.health = 5
 		self.alive = True
+		self.tree_surf = surf
 		stump_path = f'../graphics/stumps/{"small" if name == "Small" else "large"}.png'
-		self.stump_surf = load_image(stump_path, convert_alpha=True)
+		self.stump_surf = assets.image(stump_path, convert_alpha=True)
 
 		# apples
-		self.apple_surf = load_image('../graphics/fruit/apple.png')
+		self.apple_surf = assets.image('../graphics/fruit/apple.png')
 		self.apple_pos = APPLE_POS[name]
 		self.apple_sprites = pygame.sprite.Group()
-		self.create_fruit()
 
 		self.player_add = player_add
 
 		# sounds
-		self.axe_sound = load_sound('../audio/axe.mp3')
+		self.axe_sound = assets.sound('../audio/axe.mp3')
+
+		if state:
+			self.set_state(state)
+		else:
+			self.create_fruit()
+
+	def get_state(self):
+		"""Health, stump and apples, enough to rebuild this tree later"""
+		apples = [[apple.rect.x, apple.rect.y] for apple in self.apple_sprites.sprites()]
+		return {
+			'health': self.health,
+			'alive': self.alive,
+			'apple_count': len(apples),
+			'apples': apples}
+
+	def set_state(self, state):
+		self.health = state['health']
+		self.alive = state['alive']
+
+		# If tree is dead, update its appearance
+		if not self.alive:
+			self.image = self.stump_surf
+			self.rect = self.image.get_rect(midbottom = self.rect.midbottom)
+			self.hitbox = self.rect.copy().inflate(-10,-self.rect.height * 0.6)
+
+		# A stump restored from an earlier state grows back
+		elif self.image is self.stump_surf:
+			self.image = self.tree_surf
+			self.rect = self.image.get_rect(midbottom = self.rect.midbottom)
+			self.hitbox = self.rect.copy().inflate(-self.rect.width * 0.2, -self.rect.height * 0.75)
+
+		apples = state.get('apples')
+		if apples is not None:
+			# Recreate the exact apples that were saved
+			for apple in self.apple_sprites.sprites():
+				apple.kill()
+			for pos in apples:
+				Generic(
+					pos = pos,
+					surf = self.apple_surf,
+					groups = [self.apple_sprites,self.groups()[0]],
+					z = LAYERS['fruit'])
+		elif 'apple_count' in state:
+			# Older saves only know the count, remove excess apples
+			if not self.apple_sprites:
+				self.create_fruit()
+			for apple in self.apple_sprites.sprites()[state['apple_count']:]:
+				apple.kill()
+		else:
+			# Fruit regrew while the tree was not loaded
+			for apple in self.apple_sprites.sprites():
+				apple.kill()
+			self.create_fruit()
+
+	def remove(self):
+		"""Take the tree and its apples out of the world"""
+		for apple in self.apple_sprites.sprites():
+			apple.kill()
+		self.kill()
 
 	def damage(self):
 		
@@ -94,8 +227,8 @@ class Tree(Generic):
 
 		# remove an apple
 		if len(self.apple_sprites.sprites()) > 0:
-			random_apple = choice(self.apple_sprites.sprites())
-			Particle(
+			random_apple = rng.choice(self.apple_sprites.sprites())
+			particles.spawn(
 				pos = random_apple.rect.topleft,
 				surf = random_apple.image, 
 				groups = self.groups()[0], 
@@ -105,7 +238,7 @@ class Tree(Generic):
 
 	def check_death(self):
 		if self.health <= 0:
-			Particle(self.rect.topleft, self.image, self.groups()[0], LAYERS['fruit'], 300)
+			particles.spawn(self.rect.topleft, self.image, self.groups()[0], LAYERS['fruit'], 300)
 			self.image = self.stump_surf
 			self.rect = self.image.get_rect(midbottom = self.rect.midbottom)
 			self.hitbox = self.rect.copy().inflate(-10,-self.rect.height * 0.6)
@@ -118,7 +251,7 @@ class Tree(Generic):
 
 	def create_fruit(self):
 		for pos in self.apple_pos:
-			if randint(0,10) < 2:
+			if rng.randint(0,10) < 2:
 				x = pos[0] + self.rect.left
 				y = pos[1] + self.rect.top
 				Generic(
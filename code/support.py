@@ -1,6 +1,13 @@
+import atexit
+from array import array
 from os import walk
 from pathlib import Path
 import pygame
+from atlas import pack_surfaces
+from surface_cache import SurfaceCache
+from surface_format import classify, convert_surface
+from settings import SURFACE_CACHE
+from tracing import traced
 
 # Get the directory where this file (support.py) is located
 BASE_DIR = Path(__file__).parent.parent
@@ -9,65 +16,189 @@ def get_asset_path(relative_path):
 	"""Convert relative path to absolute path from project root"""
 	return BASE_DIR / relative_path
 
-def import_folder(path):
-	surface_list = []
-	
-	# Convert to absolute path if it's relative
-	if isinstance(path, str) and path.startswith('..'):
-		path = get_asset_path(path[3:])  # Remove '../' prefix
-	else:
-		path = Path(path)
+# decoded images kept on disk between runs, opened by the first image load
+surface_cache = None
 
-	for _, __, img_files in walk(path):
-		for image in img_files:
-			full_path = path / image
-			image_surf = pygame.image.load(str(full_path)).convert_alpha()
-			surface_list.append(image_surf)
+def get_surface_cache():
+	"""The surface cache, or None when SURFACE_CACHE is off. It is only read
+	from disk here, so importing this module leaves cache/surfaces alone"""
+	global surface_cache
+	if surface_cache is None and SURFACE_CACHE:
+		surface_cache = SurfaceCache(get_asset_path('cache/surfaces'))
+		atexit.register(surface_cache.save)
+	return surface_cache
 
-	return surface_list
+def read_image(path):
+	"""Decode an image file, from the surface cache when it has it"""
+	cache = get_surface_cache()
+	if cache:
+		return cache.load(path)
+	return pygame.image.load(str(path))
 
-def import_folder_dict(path):
-	surface_dict = {}
-	
-	# Convert to absolute path if it's relative
+# (source path, region) -> surface format, for this session
+image_formats = {}
+
+def image_format(path, surf, region = ''):
+	"""How surf, decoded from path, blits fastest. Each image is only scanned
+	once, the surface cache keeps the result between runs"""
+	key = (str(path), region)
+	surface_format = image_formats.get(key)
+	cache = get_surface_cache()
+	if surface_format is None and cache:
+		surface_format = cache.get_format(*key)
+	if surface_format is None:
+		surface_format = classify(surf)
+		if cache:
+			cache.set_format(*key, surface_format)
+	image_formats[key] = surface_format
+	return surface_format
+
+# set by Preloader.start, hands out assets decoded while the main menu is up
+preloader = None
+
+def take_preloaded(kind, path):
+	"""The finished asset if the preloader has it, otherwise None"""
+	if preloader is None:
+		return None
+	return preloader.take(kind, path)
+
+def resolve_path(path):
 	if isinstance(path, str) and path.startswith('..'):
-		path = get_asset_path(path[3:])  # Remove '../' prefix
-	else:
-		path = Path(path)
+		return get_asset_path(path[3:])  # Remove '../' prefix
+	return Path(path)
+
+def decode_image(path):
+	"""Decode an image and find its surface format, safe on worker threads"""
+	path = resolve_path(path)
+	image = read_image(path)
+	return image, image_format(path, image)
 
+def convert_image(decoded):
+	return convert_surface(*decoded)
+
+def decode_folder(path):
+	"""Decode every image in a folder without converting, safe on worker threads.
+	Returns (file name, image, surface format) per image"""
+	path = resolve_path(path)
+	images = []
 	for _, __, img_files in walk(path):
 		for image in img_files:
-			full_path = path / image
-			image_surf = pygame.image.load(str(full_path)).convert_alpha()
-			surface_dict[image.split('.')[0]] = image_surf
+			images.append((image, *decode_image(path / image)))
+	return images
+
+def decode_subfolders(path):
+	"""decode_folder for every subfolder, keyed by the subfolder name"""
+	path = resolve_path(path)
+	return {folder.name: decode_folder(folder) for folder in sorted(path.iterdir()) if folder.is_dir()}
+
+def convert_folder(images):
+	return pack_surfaces([convert_surface(image_surf, surface_format) for _, image_surf, surface_format in images])
+
+def convert_folder_dict(images):
+	surfaces = convert_folder(images)
+	return {image.split('.')[0]: surf for (image, _, __), surf in zip(images, surfaces)}
 
+def convert_subfolders(folders):
+	# one atlas for the whole group, then split it up again per folder
+	surfaces = convert_folder([image for images in folders.values() for image in images])
+	converted = {}
+	for name, images in folders.items():
+		converted[name] = surfaces[:len(images)]
+		surfaces = surfaces[len(images):]
+	return converted
+
+def decode_tmx_map(path):
+	"""Parse a TMX map without converting its tiles, see convert_tmx_map.
+	The tile ids of the layers are kept as rows of 16 bit integers instead of lists."""
+	import pytmx
+	tmx_data = pytmx.TiledMap(str(resolve_path(path)), image_loader = deferred_image_loader)
+	for layer in tmx_data.layers:
+		if isinstance(layer, pytmx.TiledTileLayer):
+			layer.data = [array('H', row) for row in layer.data]
+	return tmx_data
+
+def deferred_image_loader(filename, colorkey, **kwargs):
+	"""pytmx image loader that only cuts and flips the tiles, which is safe on
+	worker threads. Tiles stay (surface, colorkey, pixelalpha, surface format)
+	until converted."""
+	from pytmx.util_pygame import handle_transformation
+	if colorkey:
+		colorkey = pygame.Color(f'#{colorkey}')
+	pixelalpha = kwargs.get('pixelalpha', True)
+	image = read_image(filename)
+
+	def load_image(rect = None, flags = None):
+		tile = image.subsurface(rect) if rect else image.copy()
+		# flipping a tile does not change its format
+		surface_format = image_format(filename, tile, ','.join(map(str, rect)) if rect else '')
+		if flags:
+			tile = handle_transformation(tile, flags)
+		return (tile, colorkey, pixelalpha, surface_format)
+
+	return load_image
+
+def convert_tmx_map(tmx_data):
+	"""Convert the tiles of a map parsed by decode_tmx_map, on the main thread"""
+	tmx_data.images = [convert_tile(*image) if isinstance(image, tuple) else image for image in tmx_data.images]
+	return tmx_data
+
+def convert_tile(tile, colorkey, pixelalpha, surface_format):
+	# tilesets with a colorkey or without alpha are left to pytmx
+	if colorkey or not pixelalpha:
+		from pytmx.util_pygame import smart_convert
+		return smart_convert(tile, colorkey, pixelalpha)
+	return convert_surface(tile, surface_format)
+
+@traced('import_folder', detail = 0)
+def import_folder(path):
+	surface_list = take_preloaded('folder', path)
+	if surface_list is None:
+		surface_list = convert_folder(decode_folder(path))
+	return surface_list
+
+@traced('import_folder_dict', detail = 0)
+def import_folder_dict(path):
+	surface_dict = take_preloaded('folder_dict', path)
+	if surface_dict is None:
+		surface_dict = convert_folder_dict(decode_folder(path))
 	return surface_dict
 
+@traced('import_subfolders', detail = 0)
+def import_subfolders(path):
+	"""import_folder for every subfolder of path, packed together"""
+	folders = take_preloaded('subfolders', path)
+	if folders is None:
+		folders = convert_subfolders(decode_subfolders(path))
+	return folders
+
+@traced('load_sound', detail = 0)
 def load_sound(path):
 	"""Load a sound file with automatic path resolution"""
-	if isinstance(path, str) and path.startswith('..'):
-		path = get_asset_path(path[3:])  # Remove '../' prefix
-	return pygame.mixer.Sound(str(path))
+	sound = take_preloaded('sound', path)
+	if sound is None:
+		sound = pygame.mixer.Sound(str(resolve_path(path)))
+	return sound
 
+@traced('load_image', detail = 0)
 def load_image(path, convert_alpha=False):
 	"""Load an image file with automatic path resolution"""
-	if isinstance(path, str) and path.startswith('..'):
-		path = get_asset_path(path[3:])  # Remove '../' prefix
+	image = take_preloaded('image_alpha' if convert_alpha else 'image', path)
+	if image is not None:
+		return image
 	
-	image = pygame.image.load(str(path))
 	if convert_alpha:
-		return image.convert_alpha()
-	return image
+		return convert_image(decode_image(path))
+	return read_image(resolve_path(path))
 
+@traced('load_font', detail = 0)
 def load_font(path, size):
 	"""Load a font file with automatic path resolution"""
-	if isinstance(path, str) and path.startswith('..'):
-		path = get_asset_path(path[3:])  # Remove '../' prefix
-	return pygame.font.Font(str(path), size)
+	return pygame.font.Font(str(resolve_path(path)), size)
 
+@traced('load_tmx_map', detail = 0)
 def load_tmx_map(path):
 	"""Load a TMX map file with automatic path resolution"""
-	from pytmx.util_pygame import load_pygame
-	if isinstance(path, str) and path.startswith('..'):
-		path = get_asset_path(path[3:])  # Remove '../' prefix
-	return load_pygame(str(path))
\ No newline at end of file
+	tmx_data = take_preloaded('tmx', path)
+	if tmx_data is None:
+		tmx_data = convert_tmx_map(decode_tmx_map(path))
+	return tmx_data
@@ -0,0 +1,220 @@
+"""
+On-disk cache of decoded images.
+
+Pixels are stored raw in one data file next to a JSON index, keyed by the
+source path and checked against its mtime, size and content hash. A warm
+start maps the data file once and builds every surface straight from it.
+Surfaces made from the mapping may outlive it, so a mapped data file is
+never rewritten or deleted: compacting writes the next generation of the
+file and points the index at it, and the old ones are deleted when the
+cache is opened again.
+
+	python surface_cache.py
+
+times loading the level graphics without the cache, with a cold cache and
+with a warm one.
+"""
+import hashlib
+import json
+import mmap
+import os
+import threading
+import pygame
+from pathlib import Path
+
+# bump when the stored layout changes, older caches are then ignored
+CACHE_VERSION = 2
+
+# byte order of the stored pixels, the same as convert_alpha() surfaces on
+# common displays, so converting a cached surface is a plain copy
+PIXEL_FORMAT = 'BGRA'
+
+def file_hash(path):
+	with open(path, 'rb') as f:
+		return hashlib.sha1(f.read()).hexdigest()
+
+class SurfaceCache:
+	"""Decoded images on disk, keyed by source path, mtime and content hash"""
+
+	def __init__(self, directory):
+		self.directory = Path(directory)
+		self.index_path = self.directory / 'index.json'
+		self.lock = threading.Lock()
+
+		# the data file in use is surfaces.<generation>.bin
+		self.generation = 0
+
+		# source path -> {'mtime', 'size', 'hash', 'offset', 'length', 'width', 'height', 'formats'},
+		# formats holds what surface_format.classify() found, per region of the image
+		self.entries = {}
+		self.data = None
+		self.dirty = False
+		self.hits = 0
+		self.misses = 0
+		self.open()
+
+	@property
+	def data_path(self):
+		return self.directory / f'surfaces.{self.generation}.bin'
+
+	def open(self):
+		"""Read the index, delete older data files and map the current one"""
+		try:
+			with open(self.index_path, 'r') as f:
+				index = json.load(f)
+			if index.get('version') == CACHE_VERSION and index.get('format') == PIXEL_FORMAT:
+				self.entries = index['entries']
+				self.generation = index['generation']
+		except (OSError, ValueError, KeyError):
+			self.entries = {}
+
+		for path in self.directory.glob('surfaces*.bin'):
+			if path != self.data_path or not self.entries:
+				try:
+					path.unlink()
+				except OSError:
+					# still mapped by another running game
+					pass
+		if not self.entries:
+			# an unindexed file that could not be deleted is left alone
+			while self.data_path.exists():
+				self.generation += 1
+		self.map_data()
+
+	def map_data(self):
+		# an old mapping is closed once no surface uses it any more
+		self.data = None
+		if self.data_path.exists() and self.data_path.stat().st_size > 0:
+			with open(self.data_path, 'rb') as f:
+				# copy-on-write, surfaces made from it never touch the file
+				self.data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_COPY)
+
+	def load(self, path):
+		"""The decoded image at path, from the cache when it is up to date"""
+		key = str(path)
+		stat = os.stat(key)
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry and (entry['mtime'], entry['size']) != (stat.st_mtime_ns, stat.st_size):
+				# touched but unchanged files keep their entry
+				if entry['hash'] == file_hash(key):
+					entry['mtime'] = stat.st_mtime_ns
+					self.dirty = True
+				else:
+					entry = None
+
+			if entry:
+				# written this session, the mapping has to grow first
+				if self.data is None or entry['offset'] + entry['length'] > len(self.data):
+					self.map_data()
+				self.hits += 1
+				pixels = memoryview(self.data)[entry['offset']:entry['offset'] + entry['length']]
+				return pygame.image.frombuffer(pixels, (entry['width'], entry['height']), PIXEL_FORMAT)
+
+		surf = pygame.image.load(key)
+		self.store(key, stat, surf)
+		return surf
+
+	def store(self, key, stat, surf):
+		pixels = pygame.image.tobytes(surf, PIXEL_FORMAT)
+		digest = file_hash(key)
+		with self.lock:
+			self.misses += 1
+			self.directory.mkdir(parents = True, exist_ok = True)
+			with open(self.data_path, 'ab') as f:
+				offset = f.tell()
+				f.write(pixels)
+			self.entries[key] = {
+				'mtime': stat.st_mtime_ns,
+				'size': stat.st_size,
+				'hash': digest,
+				'offset': offset,
+				'length': len(pixels),
+				'width': surf.get_width(),
+				'height': surf.get_height()}
+			self.dirty = True
+
+	def get_format(self, path, region = ''):
+		"""The stored surface format of a region of the image at path, or None"""
+		with self.lock:
+			entry = self.entries.get(str(path))
+			return entry.get('formats', {}).get(region) if entry else None
+
+	def set_format(self, path, region, surface_format):
+		with self.lock:
+			entry = self.entries.get(str(path))
+			if entry:
+				entry.setdefault('formats', {})[region] = surface_format
+				self.dirty = True
+
+	def save(self):
+		"""Write the index if anything changed, compacting stale pixels away"""
+		with self.lock:
+			if not self.dirty:
+				return
+			live = sum(entry['length'] for entry in self.entries.values())
+			if self.data_path.exists() and self.data_path.stat().st_size > live * 2:
+				self.compact()
+
+			temp_path = self.index_path.with_suffix('.tmp')
+			with open(temp_path, 'w') as f:
+				json.dump({
+					'version': CACHE_VERSION,
+					'format': PIXEL_FORMAT,
+					'generation': self.generation,
+					'entries': self.entries}, f)
+			os.replace(temp_path, self.index_path)
+			self.dirty = False
+
+	def compact(self):
+		"""Copy the live pixels into the next generation of the data file"""
+		# surfaces may still point into the old mapping, so the old file stays
+		# as it is until the cache is opened again
+		source_path = self.data_path
+		self.generation += 1
+		with open(source_path, 'rb') as source, open(self.data_path, 'wb') as target:
+			for entry in self.entries.values():
+				source.seek(entry['offset'])
+				entry['offset'] = target.tell()
+				target.write(source.read(entry['length']))
+		self.data = None
+
+	def clear(self):
+		"""Forget every entry, new ones go to a new generation of the data file"""
+		with self.lock:
+			self.entries = {}
+			self.data = None
+			self.generation += 1
+			if self.index_path.exists():
+				self.index_path.unlink()
+			self.dirty = False
+
+if __name__ == '__main__':
+	import tempfile
+	from time import perf_counter
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+	import support
+	from settings import SCREEN_WIDTH, SCREEN_HEIGHT
+
+	pygame.init()
+	pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+	def load_graphics():
+		"""Decode and convert every image a level uses, returns seconds taken"""
+		start = perf_counter()
+		for path in sorted(support.get_asset_path('graphics').rglob('*.png')):
+			support.read_image(path).convert_alpha()
+		support.convert_tmx_map(support.decode_tmx_map('../data/map.tmx'))
+		return perf_counter() - start
+
+	with tempfile.TemporaryDirectory(prefix = 'meow-surfaces-') as directory:
+		support.surface_cache = None
+		print(f'no cache    {load_graphics() * 1000:8.1f} ms')
+
+		support.surface_cache = SurfaceCache(directory)
+		print(f'cold cache  {load_graphics() * 1000:8.1f} ms')
+		support.surface_cache.save()
+
+		support.surface_cache = SurfaceCache(directory)
+		print(f'warm cache  {load_graphics() * 1000:8.1f} ms  ({support.surface_cache.hits} hits, {support.surface_cache.misses} misses)')
@@ -0,0 +1,93 @@
+"""
+Picks the cheapest way to blit each image.
+
+Most of the art has only fully opaque and fully transparent pixels, and a
+lot of it is opaque throughout. Such images are converted to the display
+format and keyed on KEY_COLOR with RLE acceleration, which blits several
+times faster than per-pixel alpha and gives the same pixels. Only images
+with translucent pixels keep per-pixel alpha.
+
+	python surface_format.py
+
+prints how many images of every asset class end up in each format and the
+blit throughput of each class with per-pixel alpha and as converted here.
+"""
+import pygame
+from settings import *
+
+OPAQUE = 'opaque'
+COLORKEY = 'colorkey'
+ALPHA = 'alpha'
+
+def classify(surf):
+	"""OPAQUE, COLORKEY or ALPHA for a decoded image, scans its alpha once"""
+	width, height = surf.get_size()
+	visible = pygame.mask.from_surface(surf, 0)
+	solid = pygame.mask.from_surface(surf, 254).count()
+	if solid != visible.count():
+		return ALPHA
+
+	# a visible pixel in the key color would vanish
+	keyed = pygame.mask.from_threshold(surf, KEY_COLOR, (1, 1, 1, 255))
+	if keyed.overlap_area(visible, (0, 0)):
+		return ALPHA
+	return OPAQUE if solid == width * height else COLORKEY
+
+def convert_surface(surf, surface_format):
+	"""surf converted for the display in the format classify() picked"""
+	if surface_format == ALPHA or not SURFACE_FORMATS:
+		return surf.convert_alpha()
+
+	if surface_format == OPAQUE:
+		image = surf.convert()
+	else:
+		# alpha is 0 or 255 throughout, so the blit copies pixels or leaves the key
+		image = pygame.Surface(surf.get_size(), 0, pygame.display.get_surface())
+		image.fill(KEY_COLOR)
+		image.blit(surf.convert_alpha(), (0, 0))
+
+	# opaque images are keyed too, nothing in them matches the key. SDL then
+	# copies them run by run, which measured faster than its plain copy
+	image.set_colorkey(KEY_COLOR, pygame.RLEACCEL)
+	return image
+
+if __name__ == '__main__':
+	import os
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+	from time import perf_counter
+	import support
+
+	pygame.init()
+	screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+	def throughput(surfaces, rounds = 20):
+		"""Megapixels per second blitting surfaces onto the screen"""
+		# SDL encodes RLE surfaces on their first blit
+		for surf in surfaces:
+			screen.blit(surf, (0, 0))
+		pixels = 0
+		start = perf_counter()
+		for _ in range(rounds):
+			for surf in surfaces:
+				screen.blit(surf, (0, 0))
+				pixels += min(surf.get_width(), SCREEN_WIDTH) * min(surf.get_height(), SCREEN_HEIGHT)
+		return pixels / (perf_counter() - start) / 1e6
+
+	# asset class -> [(decoded image, format)]
+	classes = {}
+	for path in sorted(support.get_asset_path('graphics').rglob('*.png')):
+		name = path.relative_to(support.get_asset_path('graphics')).parts[0]
+		image = support.read_image(path)
+		classes.setdefault(name, []).append((image, support.image_format(path, image)))
+	tmx_data = support.decode_tmx_map('../data/map.tmx')
+	classes['map tiles'] = [(image[0], image[3]) for image in tmx_data.images if image]
+
+	print(f"{'class':<14}{'images':>7}{'opaque':>8}{'keyed':>7}{'alpha':>7}{'alpha Mpx/s':>13}{'picked Mpx/s':>14}")
+	for name, images in classes.items():
+		counts = {surface_format: 0 for surface_format in (OPAQUE, COLORKEY, ALPHA)}
+		for _, surface_format in images:
+			counts[surface_format] += 1
+		alpha = throughput([image.convert_alpha() for image, _ in images])
+		picked = throughput([convert_surface(image, surface_format) for image, surface_format in images])
+		print(f"{name:<14}{len(images):>7}{counts[OPAQUE]:>8}{counts[COLORKEY]:>7}{counts[ALPHA]:>7}{alpha:>13.0f}{picked:>14.0f}")
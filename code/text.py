@@ -0,0 +1,34 @@
+from collections import OrderedDict
+from settings import TEXT_CACHE_SIZE
+
+class TextCache:
+	"""Rendered strings kept between frames, least recently used dropped first.
+	The surfaces are shared, so callers blit them but never change them."""
+
+	def __init__(self, size = TEXT_CACHE_SIZE):
+		self.size = size
+
+		# (font, text, antialias, color) -> surface
+		self.surfaces = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+
+	def render(self, font, text, color, antialias = False):
+		key = (font, text, antialias, color)
+		surf = self.surfaces.get(key)
+		if surf is not None:
+			self.surfaces.move_to_end(key)
+			self.hits += 1
+			return surf
+
+		self.misses += 1
+		surf = font.render(text, antialias, color)
+		self.surfaces[key] = surf
+		if len(self.surfaces) > self.size:
+			self.surfaces.popitem(last = False)
+		return surf
+
+	def clear(self):
+		self.surfaces.clear()
+
+text_cache = TextCache()
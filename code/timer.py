@@ -1,23 +1,39 @@
-import pygame 
+from scheduler import scheduler as game_scheduler
 
 class Timer:
-	def __init__(self,duration,func = None):
+	"""Runs func once duration ms after activate(), on the gameplay scheduler"""
+
+	def __init__(self,duration,func = None,scheduler = game_scheduler):
 		self.duration = duration
 		self.func = func
+		self.scheduler = scheduler
 		self.start_time = 0
 		self.active = False
+		self.handle = None
 
-	def activate(self):
+	def activate(self, remaining = None):
+		"""Start the timer, or carry on one that has remaining ms left"""
+		if remaining is None:
+			remaining = self.duration
+		self.scheduler.cancel(self.handle)
 		self.active = True
-		self.start_time = pygame.time.get_ticks()
+		self.start_time = self.scheduler.time - (self.duration - remaining)
+		self.handle = self.scheduler.call_later(remaining, self.expire)
 
 	def deactivate(self):
+		self.scheduler.cancel(self.handle)
+		self.handle = None
 		self.active = False
 		self.start_time = 0
 
-	def update(self):
-		current_time = pygame.time.get_ticks()
-		if current_time - self.start_time >= self.duration:
-			if self.func and self.start_time != 0:
-				self.func()
-			self.deactivate()
\ No newline at end of file
+	def remaining(self):
+		"""ms until the timer goes off, 0 when it is not active"""
+		if not self.active:
+			return 0
+		return max(0, self.start_time + self.duration - self.scheduler.time)
+
+	def expire(self):
+		self.handle = None
+		self.deactivate()
+		if self.func:
+			self.func()
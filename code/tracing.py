@@ -0,0 +1,91 @@
+import json
+import threading
+from functools import wraps
+from time import perf_counter
+
+class Tracer:
+	"""Records timed spans into a preallocated ring and exports Chrome trace JSON"""
+
+	def __init__(self, capacity = 65536):
+		self.enabled = False
+		self.capacity = capacity
+
+		# ring storage, allocated once so recording never grows a list
+		self.names = [None] * capacity
+		self.details = [None] * capacity
+		self.starts = [0.0] * capacity
+		self.durations = [0.0] * capacity
+		self.threads = [0] * capacity
+		self.index = 0
+		self.count = 0
+
+		self.origin = perf_counter()
+		self.path = None
+
+	def start(self, path):
+		"""Begin recording, the trace is written to path by save()"""
+		self.enabled = True
+		self.path = path
+		self.index = 0
+		self.count = 0
+		self.origin = perf_counter()
+
+	def record(self, name, start, end, detail = None):
+		index = self.index
+		self.names[index] = name
+		self.details[index] = detail
+		self.starts[index] = start
+		self.durations[index] = end - start
+		self.threads[index] = threading.get_ident()
+		self.index = (index + 1) % self.capacity
+		if self.count < self.capacity:
+			self.count += 1
+
+	def events(self):
+		"""Recorded spans as Chrome trace events, oldest first"""
+		first = (self.index - self.count) % self.capacity
+		thread_ids = {}
+		events = []
+		for offset in range(self.count):
+			index = (first + offset) % self.capacity
+			tid = thread_ids.setdefault(self.threads[index], len(thread_ids))
+			event = {
+				'name': self.names[index],
+				'ph': 'X',
+				'ts': (self.starts[index] - self.origin) * 1e6,
+				'dur': self.durations[index] * 1e6,
+				'pid': 0,
+				'tid': tid}
+			if self.details[index] is not None:
+				event['args'] = {'detail': self.details[index]}
+			events.append(event)
+		return events
+
+	def save(self, path = None):
+		"""Write the ring to disk in Chrome trace-event format"""
+		path = path or self.path
+		if not path:
+			return False
+		with open(path, 'w') as f:
+			json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, f)
+		return True
+
+# process wide tracer, started from the command line with --trace
+tracer = Tracer()
+
+def traced(name, detail = None):
+	"""Decorator that records a span per call while tracing is enabled.
+	detail is the index of a positional argument to attach to the span."""
+	def decorator(func):
+		@wraps(func)
+		def wrapper(*args, **kwargs):
+			if not tracer.enabled:
+				return func(*args, **kwargs)
+			start = perf_counter()
+			try:
+				return func(*args, **kwargs)
+			finally:
+				info = str(args[detail]) if detail is not None and detail < len(args) else None
+				tracer.record(name, start, perf_counter(), info)
+		return wrapper
+	return decorator
@@ -1,16 +1,14 @@
-import pygame
-from settings import *
+from dirty_rects import dirty_rects, SCREEN_RECT
 
 class Transition:
-	def __init__(self, reset, player):
+	def __init__(self, reset, player, backend):
 		
 		# setup
-		self.display_surface = pygame.display.get_surface()
+		self.backend = backend
 		self.reset = reset
 		self.player = player
 
-		# overlay image
-		self.image = pygame.Surface((SCREEN_WIDTH,SCREEN_HEIGHT))
+		# overlay color
 		self.color = 255
 		self.speed = -2
 
@@ -24,6 +22,8 @@ class Transition:
 			self.color = 255
 			self.player.sleep = False
 			self.speed = -2
+		self.draw()
 
-		self.image.fill((self.color,self.color,self.color))
-		self.display_surface.blit(self.image, (0,0), special_flags = pygame.BLEND_RGBA_MULT)
\ No newline at end of file
+	def draw(self):
+		self.backend.tint((self.color,self.color,self.color))
+		dirty_rects.mark('transition', self.color, SCREEN_RECT)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Visual regression check, the same for every draw back-end.
+
+	python visual_regression.py
+	python visual_regression.py --backend renderer
+	python visual_regression.py --update
+
+Draws a few fixed scenes of a seeded new game, each after the same number
+of frames of a constant length, and compares them with the reference images
+in ../visual_regression. A pixel differs when one of its channels is off by more
+than --tolerance: the renderer's alpha and modulate blends round a step or
+two away from the software blits now and then. Exits with 1 if any scene
+differs. The references are drawn by the software back-end.
+SDL_RENDER_DRIVER=software checks the renderer on SDL's software renderer,
+which is the only one under the dummy video driver anyway.
+"""
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import argparse
+import sys
+from pathlib import Path
+
+import pygame
+from draw_backend import BACKENDS
+from controls import controls
+
+REFERENCE_DIR = Path(__file__).resolve().parent.parent / 'visual_regression'
+SEED = 2024
+DT = 1 / 60
+
+def draw_frame(game, dt = DT, keys = ()):
+	"""One frame of Game.run with keys pressed in it, returns what it drew"""
+	controls.next_frame(dt, list(keys), set())
+	game.backend.begin_frame(canvas = game.state != 'playing')
+	if game.state == 'playing':
+		game.handle_playing(dt)
+	elif game.state == 'paused':
+		game.handle_paused(dt)
+	frame = game.backend.screenshot()
+	game.backend.present()
+	return frame
+
+def morning(game):
+	pass
+
+def night(game):
+	game.level.daytime.minutes = 22 * 60
+
+def zoomed_out(game):
+	from render_target import render_target
+	render_target.next_zoom(game.level.all_sprites.drawables())
+
+def render_scale(game):
+	from render_target import render_target
+	render_target.scale = 2
+
+def shop(game):
+	game.level.toggle_shop()
+
+def notification(game):
+	game.notification.show('Game saved successfully!')
+
+def sleeping(game):
+	game.level.player.sleep = True
+
+def paused(game):
+	draw_frame(game)
+	draw_frame(game, keys = [pygame.K_ESCAPE])
+
+def paused_asleep(game):
+	# the frozen frame keeps the tint of the transition
+	sleeping(game)
+	for _ in range(30):
+		draw_frame(game)
+	paused(game)
+
+def paused_notification(game):
+	# the notification goes away while paused, the frozen frame must not keep it
+	notification(game)
+	paused(game)
+
+# name -> setup on a new game, frames drawn after it
+SCENES = {
+	'morning': (morning, 30),
+	'night': (night, 30),
+	'zoomed_out': (zoomed_out, 30),
+	'render_scale': (render_scale, 30),
+	'shop': (shop, 10),
+	'notification': (notification, 10),
+	'sleeping': (sleeping, 60),
+	'paused': (paused, 10),
+	'paused_asleep': (paused_asleep, 10),
+	'paused_notification': (paused_notification, 150)}
+
+def new_game(backend):
+	"""A game on a new level, seeded and without rain"""
+	from main import Game
+	from render_target import render_target
+	from rng import rng
+
+	rng.seed(SEED)
+	render_target.scale = 1
+	while render_target.zoom != render_target.zooms[0]:
+		render_target.next_zoom()
+
+	game = Game(backend)
+	game.progressive_loading = False
+	game.start_new_game()
+	game.level.raining = False
+	game.level.soil_layer.raining = False
+	return game
+
+def draw_scene(game, name):
+	setup, frames = SCENES[name]
+	setup(game)
+	for _ in range(frames - 1):
+		draw_frame(game)
+	return draw_frame(game)
+
+def compare(frame, reference, tolerance):
+	"""Number of pixels off by more than tolerance, and the rects around them"""
+	if frame.get_size() != reference.get_size():
+		return frame.get_width() * frame.get_height(), [frame.get_rect()]
+	frame = frame.convert()
+	reference = reference.convert()
+
+	# |frame - reference| per channel, from two saturating subtractions
+	difference = frame.copy()
+	difference.blit(reference, (0, 0), special_flags = pygame.BLEND_RGB_SUB)
+	other = reference.copy()
+	other.blit(frame, (0, 0), special_flags = pygame.BLEND_RGB_SUB)
+	difference.blit(other, (0, 0), special_flags = pygame.BLEND_RGB_MAX)
+
+	limit = tolerance + 1
+	mask = pygame.mask.from_threshold(difference, (0, 0, 0), (limit, limit, limit, 255))
+	mask.invert()
+	return mask.count(), mask.get_bounding_rects()
+
+def main():
+	parser = argparse.ArgumentParser(description = __doc__.strip().splitlines()[0])
+	parser.add_argument('--backend', choices = sorted(BACKENDS), default = 'software',
+		help = 'draw back-end to check, see draw_backend.py (default: software)')
+	parser.add_argument('--tolerance', type = int, default = 2,
+		help = 'largest difference of a channel that still counts as equal (default: 2)')
+	parser.add_argument('--update', action = 'store_true',
+		help = 'write the scenes as the new references')
+	parser.add_argument('scenes', nargs = '*', metavar = 'SCENE',
+		help = f'scenes to draw: {", ".join(SCENES)} (default: all)')
+	args = parser.parse_args()
+	for name in args.scenes:
+		if name not in SCENES:
+			parser.error(f'unknown scene {name}')
+
+	REFERENCE_DIR.mkdir(exist_ok = True)
+	failed = []
+	for name in args.scenes or SCENES:
+		# every scene starts from the same new game
+		frame = draw_scene(new_game(args.backend), name)
+		path = REFERENCE_DIR / f'{name}.png'
+		if args.update:
+			pygame.image.save(frame, str(path))
+			print(f'{name:<14} written')
+			continue
+		if not path.exists():
+			print(f'{name:<14} no reference, run with --update')
+			failed.append(name)
+			continue
+
+		count, rects = compare(frame, pygame.image.load(str(path)), args.tolerance)
+		if count:
+			bounds = rects[0].unionall(rects[1:])
+			print(f'{name:<14} DIFFERS in {count} pixels, within {tuple(bounds)}')
+			pygame.image.save(frame, str(REFERENCE_DIR / f'{name}.{args.backend}.png'))
+			failed.append(name)
+		else:
+			print(f'{name:<14} ok')
+
+	pygame.quit()
+	return 1 if failed else 0
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Synthetic world generator for scaling tests.
+
+	python worldgen.py --scale 10 --output ../data/generated/world_10x.tmx
+	python main.py --map ../data/generated/world_10x.tmx
+
+The generated TMX reuses the tilesets of data/map.tmx and has every layer
+Level.setup expects. The house, bed and player start are copied from the
+original map; water, fields, trees and decorations are placed at random.
+"""
+import argparse
+import os
+import random
+import xml.etree.ElementTree as ET
+from collections import Counter
+from math import sqrt
+from settings import TILE_SIZE
+from support import get_asset_path
+
+BASE_MAP = get_asset_path('data/map.tmx')
+BASE_SIZE = (50, 40)
+
+TILE_LAYERS = [
+	'Ground', 'Water', 'Fence', 'HouseFloor', 'HouseWalls',
+	'HouseFurnitureBottom', 'HouseFurnitureTop', 'Collision', 'Farmable']
+HOUSE_LAYERS = ['HouseFloor', 'HouseWalls', 'HouseFurnitureBottom', 'HouseFurnitureTop', 'Collision']
+
+class TemplateMap:
+	"""Tilesets, layers and objects of the original map, used as building blocks"""
+
+	def __init__(self, path = BASE_MAP):
+		self.path = path
+		root = ET.parse(path).getroot()
+		self.width = int(root.get('width'))
+
+		self.tilesets = [
+			(tileset.get('firstgid'), os.path.join(os.path.dirname(path), tileset.get('source')))
+			for tileset in root.findall('tileset')]
+
+		self.layers = {}
+		for layer in root.findall('layer'):
+			data = [int(gid) for gid in layer.find('data').text.replace('\n', '').split(',') if gid]
+			self.layers[layer.get('name')] = data
+
+		self.objects = {
+			group.get('name'): [dict(obj.attrib) for obj in group.findall('object')]
+			for group in root.findall('objectgroup')}
+
+	def gid(self, layer, x, y):
+		return self.layers[layer][y * self.width + x]
+
+	def common_gid(self, layer):
+		return Counter(gid for gid in self.layers[layer] if gid).most_common(1)[0][0]
+
+	def house_area(self):
+		"""Tile bounds (left, top, right, bottom) of the house and the player start"""
+		cells = [
+			(index % self.width, index // self.width)
+			for name in HOUSE_LAYERS[:-1]
+			for index, gid in enumerate(self.layers[name]) if gid]
+		start = self.player_object('Start')
+		cells.append((int(float(start['x']) // TILE_SIZE), int(float(start['y']) // TILE_SIZE)))
+		return (
+			min(x for x, y in cells), min(y for x, y in cells),
+			max(x for x, y in cells), max(y for x, y in cells))
+
+	def player_object(self, name):
+		for obj in self.objects['Player']:
+			if obj.get('name') == name:
+				return obj
+
+	def object_kinds(self, group):
+		"""Distinct (name, gid, width, height) of the tile objects in a group"""
+		return sorted({
+			(obj.get('name'), obj['gid'], obj['width'], obj['height'])
+			for obj in self.objects[group] if 'gid' in obj})
+
+class WorldGenerator:
+	"""Lays out a random farm of the given size in tiles"""
+
+	def __init__(self, width, height, tree_density = 0.03, farmable = 0.08,
+			decoration_density = 0.02, water = 0.02, seed = 1, template = None):
+		self.width = width
+		self.height = height
+		self.tree_density = tree_density
+		self.farmable = farmable
+		self.decoration_density = decoration_density
+		self.water = water
+		self.random = random.Random(seed)
+		self.template = template or TemplateMap()
+
+		self.layers = {name: [0] * (width * height) for name in TILE_LAYERS}
+		self.objects = {'Trees': [], 'Decoration': [], 'Player': []}
+		self.occupied = [False] * (width * height)
+
+	def set_tile(self, layer, x, y, gid):
+		self.layers[layer][y * self.width + x] = gid
+
+	def is_free(self, left, top, width, height, margin = 0):
+		if left - margin < 2 or top - margin < 2:
+			return False
+		if left + width + margin > self.width - 2 or top + height + margin > self.height - 2:
+			return False
+		for y in range(top - margin, top + height + margin):
+			for x in range(left - margin, left + width + margin):
+				if self.occupied[y * self.width + x]:
+					return False
+		return True
+
+	def occupy(self, left, top, width, height):
+		for y in range(top, top + height):
+			for x in range(left, left + width):
+				self.occupied[y * self.width + x] = True
+
+	def place_border(self):
+		fence = self.template.common_gid('Fence')
+		for x in range(self.width):
+			for y in (0, self.height - 1):
+				self.set_tile('Fence', x, y, fence)
+		for y in range(self.height):
+			for x in (0, self.width - 1):
+				self.set_tile('Fence', x, y, fence)
+
+	def place_house(self):
+		"""Copy the house of the original map to the top left corner"""
+		template = self.template
+		left, top, right, bottom = template.house_area()
+		dx, dy = 3 - left, 3 - top
+		for name in HOUSE_LAYERS:
+			for y in range(top, bottom + 1):
+				for x in range(left, right + 1):
+					gid = template.gid(name, x, y)
+					if gid:
+						self.set_tile(name, x + dx, y + dy, gid)
+		self.occupy(left + dx - 1, top + dy - 1, right - left + 3, bottom - top + 3)
+
+		# player start and bed keep their place relative to the house
+		for name in ('Start', 'Bed'):
+			obj = dict(template.player_object(name))
+			obj['x'] = str(float(obj['x']) + dx * TILE_SIZE)
+			obj['y'] = str(float(obj['y']) + dy * TILE_SIZE)
+			self.objects['Player'].append(obj)
+
+		# the trader stands right next to the house
+		trader = dict(template.player_object('Trader'))
+		trader['x'] = str((right + dx + 2) * TILE_SIZE)
+		trader['y'] = str((top + dy) * TILE_SIZE)
+		self.objects['Player'].append(trader)
+		self.occupy(right + dx + 2, top + dy, 4, 3)
+
+	def place_water(self):
+		gid = self.template.common_gid('Water')
+		target = int(self.width * self.height * self.water)
+		placed = 0
+		for _ in range(target * 4):
+			if placed >= target:
+				break
+			radius = self.random.randint(1, 3)
+			size = radius * 2 + 1
+			left = self.random.randint(2, self.width - size - 2)
+			top = self.random.randint(2, self.height - size - 2)
+			if not self.is_free(left, top, size, size, 1):
+				continue
+			for y in range(size):
+				for x in range(size):
+					if (x - radius) ** 2 + (y - radius) ** 2 <= radius * radius + 1:
+						self.set_tile('Water', left + x, top + y, gid)
+						placed += 1
+			self.occupy(left, top, size, size)
+
+	def place_fields(self):
+		"""Rectangular farmable fields, kept off the map edges"""
+		gid = self.template.common_gid('Farmable')
+		target = int(self.width * self.height * self.farmable)
+		placed = 0
+		for _ in range(max(target, 50)):
+			if placed >= target:
+				break
+			width = self.random.randint(3, 8)
+			height = self.random.randint(3, 6)
+			left = self.random.randint(2, self.width - width - 2)
+			top = self.random.randint(2, self.height - height - 2)
+			if not self.is_free(left, top, width, height, 1):
+				continue
+			for y in range(top, top + height):
+				for x in range(left, left + width):
+					self.set_tile('Farmable', x, y, gid)
+			placed += width * height
+			self.occupy(left, top, width, height)
+
+	def place_objects(self, group, density, kinds):
+		for y in range(2, self.height - 3):
+			for x in range(2, self.width - 3):
+				if self.random.random() >= density or not self.is_free(x, y, 2, 2):
+					continue
+				name, gid, width, height = self.random.choice(kinds)
+				obj = {
+					'gid': gid, 'width': width, 'height': height,
+					# tile objects are anchored at their bottom left corner
+					'x': str(x * TILE_SIZE),
+					'y': str(y * TILE_SIZE + float(height))}
+				if name:
+					obj['name'] = name
+				self.objects[group].append(obj)
+				self.occupy(x, y, 2, 2)
+
+	def generate(self):
+		self.place_border()
+		self.place_house()
+		self.place_water()
+
+		# grass everywhere except over the ponds, which are drawn below the ground
+		ground = self.template.common_gid('Ground')
+		self.layers['Ground'] = [0 if water else ground for water in self.layers['Water']]
+
+		self.place_fields()
+		self.place_objects('Trees', self.tree_density, self.template.object_kinds('Trees'))
+		self.place_objects('Decoration', self.decoration_density, self.template.object_kinds('Decoration'))
+		return self
+
+	def summary(self):
+		return {
+			'width': self.width,
+			'height': self.height,
+			'farmable': sum(1 for gid in self.layers['Farmable'] if gid),
+			'water': sum(1 for gid in self.layers['Water'] if gid),
+			'trees': len(self.objects['Trees']),
+			'decorations': len(self.objects['Decoration'])}
+
+	def write(self, path):
+		"""Write the world as a TMX file Tiled and pytmx can open"""
+		directory = os.path.dirname(os.path.abspath(path))
+		os.makedirs(directory, exist_ok = True)
+
+		lines = [
+			'<?xml version="1.0" encoding="UTF-8"?>',
+			f'<map version="1.8" orientation="orthogonal" renderorder="right-down" width="{self.width}" '
+			f'height="{self.height}" tilewidth="{TILE_SIZE}" tileheight="{TILE_SIZE}" infinite="0">',
+			' <properties>',
+			# Level draws the Ground layer instead of graphics/world/ground.png
+			'  <property name="ground" value="tiles"/>',
+			' </properties>']
+		for firstgid, source in self.template.tilesets:
+			source = os.path.relpath(source, directory).replace(os.sep, '/')
+			lines.append(f' <tileset firstgid="{firstgid}" source="{source}"/>')
+
+		layer_id = 1
+		for name in TILE_LAYERS:
+			rows = [
+				','.join(str(gid) for gid in self.layers[name][y * self.width:(y + 1) * self.width])
+				for y in range(self.height)]
+			lines.append(f' <layer id="{layer_id}" name="{name}" width="{self.width}" height="{self.height}">')
+			lines.append('  <data encoding="csv">')
+			lines.append(',\n'.join(rows))
+			lines.append('</data>')
+			lines.append(' </layer>')
+			layer_id += 1
+
+		object_id = 1
+		for name, objects in self.objects.items():
+			lines.append(f' <objectgroup id="{layer_id}" name="{name}">')
+			for obj in objects:
+				attributes = ' '.join(f'{key}="{value}"' for key, value in obj.items() if key != 'id')
+				lines.append(f'  <object id="{object_id}" {attributes}/>')
+				object_id += 1
+			lines.append(' </objectgroup>')
+			layer_id += 1
+
+		lines.append('</map>')
+		with open(path, 'w') as f:
+			f.write('\n'.join(lines) + '\n')
+		return path
+
+def scaled_size(scale):
+	"""Map size in tiles with scale times the area of the original map"""
+	factor = sqrt(scale)
+	return round(BASE_SIZE[0] * factor), round(BASE_SIZE[1] * factor)
+
+def generate_map(path, scale = 1, seed = 1, **options):
+	"""Generate a world with scale times the area of the original and write it to path"""
+	width, height = scaled_size(scale)
+	generator = WorldGenerator(width, height, seed = seed, **options).generate()
+	generator.write(path)
+	return generator.summary()
+
+def prefarm(level, tilled, planted, rng):
+	"""Till, water and plant part of the farmable tiles of a built level"""
+	from soil import FARMABLE, TILLED, PLANTED
+	soil_layer = level.soil_layer
+	for x, y, cell in soil_layer.grid.cells():
+		if cell & FARMABLE and rng.random() < tilled:
+			soil_layer.grid.add(x, y, TILLED)
+	soil_layer.create_soil_tiles()
+
+	# plants outside the loaded chunks start out dormant
+	plants = []
+	for x, y, cell in soil_layer.grid.cells():
+		if cell & TILLED and rng.random() < planted:
+			soil_layer.grid.add(x, y, PLANTED)
+			pos = [x * TILE_SIZE, y * TILE_SIZE]
+			plant_type = rng.choice(level.player.seeds)
+			plants.append({'plant_type': plant_type, 'pos': pos, 'age': 0, 'harvestable': False, 'soil_pos': pos})
+	soil_layer.load_plants(plants)
+	soil_layer.water_all()
+
+def parse_args():
+	parser = argparse.ArgumentParser(description = 'Generate a synthetic Meow Valley map')
+	parser.add_argument('--output', required = True, help = 'TMX file to write')
+	parser.add_argument('--scale', type = float, default = 1,
+		help = 'area relative to the original 50x40 map')
+	parser.add_argument('--width', type = int, help = 'width in tiles, overrides --scale')
+	parser.add_argument('--height', type = int, help = 'height in tiles, overrides --scale')
+	parser.add_argument('--tree-density', type = float, default = 0.03)
+	parser.add_argument('--farmable', type = float, default = 0.08,
+		help = 'fraction of the map that is farmable')
+	parser.add_argument('--decoration-density', type = float, default = 0.02)
+	parser.add_argument('--water', type = float, default = 0.02, help = 'fraction of the map under water')
+	parser.add_argument('--seed', type = int, default = 1)
+	return parser.parse_args()
+
+if __name__ == '__main__':
+	args = parse_args()
+	width, height = scaled_size(args.scale)
+	generator = WorldGenerator(
+		args.width or width, args.height or height,
+		tree_density = args.tree_density,
+		farmable = args.farmable,
+		decoration_density = args.decoration_density,
+		water = args.water,
+		seed = args.seed).generate()
+	generator.write(args.output)
+	print(generator.summary())
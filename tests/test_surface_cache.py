@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+
+import pygame
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'code'))
+from surface_cache import SurfaceCache
+
+def write_image(path, size, color):
+	surf = pygame.Surface(size, pygame.SRCALPHA)
+	surf.fill(color)
+	pygame.draw.line(surf, (255, 255, 255, 128), (0, 0), (size[0] - 1, size[1] - 1))
+	pygame.image.save(surf, str(path))
+
+def pixels(surf):
+	return surf.get_size(), pygame.image.tobytes(surf, 'RGBA')
+
+def data_files(directory):
+	return sorted(path.name for path in directory.glob('surfaces*.bin'))
+
+def test_compact_then_reload(tmp_path):
+	directory = tmp_path / 'cache'
+	paths = [tmp_path / f'{name}.png' for name in 'abc']
+	for index, path in enumerate(paths):
+		write_image(path, (64, 64), (index * 80, 40, 200, 255))
+
+	cache = SurfaceCache(directory)
+	for path in paths:
+		cache.load(path)
+	cache.save()
+	assert cache.misses == 3
+
+	# made from the first mapping, it has to stay intact through the compaction
+	kept = cache.load(paths[0])
+	kept_pixels = pixels(kept)
+
+	# smaller replacements leave most of the data file stale
+	for path in paths[1:]:
+		write_image(path, (8, 8), (10, 220, 30, 255))
+		cache.load(path)
+	cache.save()
+	assert cache.generation == 1
+	assert pixels(kept) == kept_pixels
+
+	reloaded = SurfaceCache(directory)
+	assert data_files(directory) == ['surfaces.1.bin']
+	for path in paths:
+		assert pixels(reloaded.load(path)) == pixels(pygame.image.load(str(path)))
+	assert (reloaded.hits, reloaded.misses) == (3, 0)
+
+def test_clear_then_reload(tmp_path):
+	directory = tmp_path / 'cache'
+	path = tmp_path / 'image.png'
+	write_image(path, (16, 16), (200, 100, 0, 255))
+
+	cache = SurfaceCache(directory)
+	kept = cache.load(path)
+	cache.save()
+	kept = cache.load(path)
+	kept_pixels = pixels(kept)
+
+	cache.clear()
+	cache.load(path)
+	cache.save()
+	assert pixels(kept) == kept_pixels
+
+	reloaded = SurfaceCache(directory)
+	assert data_files(directory) == [f'surfaces.{cache.generation}.bin']
+	assert pixels(reloaded.load(path)) == pixels(pygame.image.load(str(path)))
+	assert reloaded.hits == 1